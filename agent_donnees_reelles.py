@@ -1,13 +1,22 @@
-import os
 import streamlit as st
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.prompts import ChatPromptTemplate
-from langchain.chains import LLMChain
-from langchain.memory import ConversationBufferMemory
-from langchain_community.chat_message_histories import StreamlitChatMessageHistory
-import pandas as pd
 import json
+import sys
+import time
+import uuid
 from datetime import datetime
+import index_catalogue
+import contexte_prompt
+import cache_contexte
+import cache_semantique
+import noyau_pedagogique
+import clients_llm
+import stock_cours
+import base_catalogue
+import instrumentation
+
+# La pile LLM (langchain, langchain_google_genai, et les modules qui en dépendent : cache_llm, flux_llm,
+# coalescence, historique_conversation, memoire) n'est importée qu'à la première génération : le
+# dashboard s'affiche sans l'attendre. Vérifié par profil_demarrage.py.
 
 # --- Configuration ---
 st.set_page_config(layout="wide", page_title="Agent Pédagogique - Données Réelles")
@@ -18,79 +27,78 @@ st.subheader("Basé sur des données réelles de Kaggle Learn, Python Documentat
 # CHARGEMENT DES DONNÉES RÉELLES
 # =============================================================================
 
-@st.cache_data
-def load_real_data():
-    """Charge les données réelles collectées"""
-    try:
-        # Charger les formations
-        if os.path.exists('formations_reelles.csv'):
-            formations_df = pd.read_csv('formations_reelles.csv')
-            st.success("✅ Formations réelles chargées depuis formations_reelles.csv")
-        else:
-            st.warning("⚠️ Fichier formations_reelles.csv non trouvé. Exécutez d'abord le script de collecte.")
-            return create_sample_data()
-        
-        # Charger les modules
-        if os.path.exists('modules_reels.csv'):
-            modules_df = pd.read_csv('modules_reels.csv')
-            st.success("✅ Modules réels chargés depuis modules_reels.csv")
-        else:
-            st.warning("⚠️ Fichier modules_reels.csv non trouvé.")
-            modules_df = pd.DataFrame()
-        
-        # Charger les exercices
-        if os.path.exists('exercices_reels.json'):
-            with open('exercices_reels.json', 'r', encoding='utf-8') as f:
-                exercises_data = json.load(f)
-            st.success("✅ Exercices réels chargés depuis exercices_reels.json")
+@st.cache_resource
+def obtenir_base_catalogue():
+    """Ouvre la base indexée du catalogue, partagée entre les sessions : (base, données réelles ou non)"""
+    def rapporter(niveau, message):
+        if niveau == 'succes':
+            st.success(f"✅ {message}")
         else:
-            st.warning("⚠️ Fichier exercices_reels.json non trouvé.")
-            exercises_data = []
-        
-        return formations_df, modules_df, exercises_data
+            st.warning(f"⚠️ {message}")
     
+    try:
+        base, reelles = noyau_pedagogique.ouvrir_base_catalogue(rapporter)
     except Exception as e:
         st.error(f"❌ Erreur lors du chargement des données : {e}")
-        return create_sample_data()
-
-def create_sample_data():
-    """Crée des données d'exemple si les fichiers réels ne sont pas disponibles"""
-    st.info("📝 Utilisation de données d'exemple. Pour utiliser les vraies données, exécutez le script de collecte.")
-    
-    sample_formations = pd.DataFrame([
-        {'formation_id': 1, 'titre': 'Python Basics', 'domaine': 'Programming', 'niveau': 'Beginner', 
-         'duree_heures': 8, 'prerequis': 'None', 'source': 'Sample Data'},
-        {'formation_id': 2, 'titre': 'Pandas Data Analysis', 'domaine': 'Data Science', 'niveau': 'Intermediate', 
-         'duree_heures': 6, 'prerequis': 'Python', 'source': 'Sample Data'},
-    ])
-    
-    sample_modules = pd.DataFrame([
-        {'module_id': 1, 'formation_id': 1, 'ordre': 1, 'titre': 'Variables and Types', 
-         'duree_minutes': 60, 'concepts_cles': 'int, float, string, boolean'},
-        {'module_id': 2, 'formation_id': 2, 'ordre': 1, 'titre': 'DataFrame Basics', 
-         'duree_minutes': 90, 'concepts_cles': 'read_csv, head, info, describe'},
-    ])
-    
-    sample_exercises = [
-        {'category': 'Python Basics', 'level': 'Beginner', 'exercises': [
-            {'title': 'Hello World', 'description': 'Create a program that prints Hello World'}
-        ]}
-    ]
-    
-    return sample_formations, sample_modules, sample_exercises
+        base = base_catalogue.BaseCatalogue(base_catalogue.FICHIER_CATALOGUE_EXEMPLE)
+        if base.compter() == 0:
+            base.remplacer(*noyau_pedagogique.donnees_exemple())
+        reelles = False
+    if not reelles:
+        st.info("📝 Utilisation de données d'exemple. Pour utiliser les vraies données, exécutez le script de collecte.")
+    return base, reelles
 
 # =============================================================================
 # CHARGEMENT ET AFFICHAGE DES DONNÉES
 # =============================================================================
 
-# Charger les données
-formations_df, modules_df, exercises_data = load_real_data()
+@st.cache_resource
+def charger_index_catalogue(_base, signature):
+    """Charge (ou construit) l'index de recherche du catalogue, partagé entre les sessions"""
+    return index_catalogue.charger_ou_construire_index_base(_base)
+
+# Ouvrir le catalogue : seuls des comptages et des recherches indexées sont faits au démarrage
+debut_chargement = time.perf_counter()
+catalogue, donnees_reelles = obtenir_base_catalogue()
+signature_catalogue = catalogue.signature()
+index_modules = charger_index_catalogue(catalogue, signature_catalogue)
+stats_catalogue = catalogue.statistiques()
+duree_chargement_donnees = time.perf_counter() - debut_chargement
+
+# Export des métriques au format Prometheus si INSTRUMENTATION_PORT est défini
+instrumentation.demarrer_serveur_prometheus()
+
+@st.cache_resource
+def obtenir_cache_contexte():
+    """Cache LRU des contextes de prompt, partagé entre les sessions"""
+    return cache_contexte.CacheLRU()
+
+cache_contexte_prompt = obtenir_cache_contexte()
+
+@st.cache_resource
+def obtenir_stockage_historique():
+    """Historique des conversations persistant (SQLite), partagé entre les sessions"""
+    import historique_conversation
+    return historique_conversation.StockageHistorique()
+
+# Identifiant de session conservé dans l'URL : l'historique est retrouvé après un rechargement ou un redémarrage
+if "session" not in st.query_params:
+    st.query_params["session"] = uuid.uuid4().hex
+
+@st.cache_resource
+def obtenir_stock_cours():
+    """Stock persistant des contenus générés (corps compressés), partagé entre les sessions"""
+    return stock_cours.StockCours()
+
+stock_contenus = obtenir_stock_cours()
 
-# Initialisation session state
-if "chat_history" not in st.session_state:
-    st.session_state.chat_history = StreamlitChatMessageHistory()
+# Seules les entrées légères (métadonnées + aperçu) des derniers contenus restent en mémoire
 if "generated_courses" not in st.session_state:
-    st.session_state.generated_courses = []
+    st.session_state.generated_courses = list(reversed(
+        stock_contenus.rechercher(session=st.query_params["session"], limite=5)
+    ))
+if "metriques_generation" not in st.session_state:
+    st.session_state.metriques_generation = []
 
 # Configuration API
 try:
@@ -115,8 +123,8 @@ with col1:
     )
     
     # Filtres basés sur les vraies données
-    domaines_disponibles = formations_df['domaine'].unique().tolist() if not formations_df.empty else ['Programming']
-    niveaux_disponibles = formations_df['niveau'].unique().tolist() if not formations_df.empty else ['Beginner']
+    domaines_disponibles = catalogue.valeurs('domaine') or ['Programming']
+    niveaux_disponibles = catalogue.valeurs('niveau') or ['Beginner']
     
     with st.expander("⚙️ Paramètres de génération"):
         col_a, col_b = st.columns(2)
@@ -126,115 +134,88 @@ with col1:
         with col_b:
             duree = st.slider("Durée souhaitée (heures):", 1, 20, 6)
             format_sortie = st.selectbox("Format:", ["Texte structuré", "JSON", "Markdown"])
+        seuil_semantique = st.slider(
+            "Seuil de similarité du cache sémantique:", 0.5, 1.0, cache_semantique.SEUIL_DEFAUT, 0.01,
+            help="Une demande équivalente à une demande passée avec les mêmes paramètres réutilise le contenu déjà généré"
+        )
 
 with col2:
     st.write("### 📊 Base de données réelle")
     
     # Statistiques des données
-    if not formations_df.empty:
-        st.metric("Formations disponibles", len(formations_df))
-        st.metric("Modules documentés", len(modules_df) if not modules_df.empty else 0)
-        st.metric("Sources de données", len(formations_df['source'].unique()) if 'source' in formations_df.columns else 1)
+    if stats_catalogue['formations']:
+        st.metric("Formations disponibles", stats_catalogue['formations'])
+        st.metric("Modules documentés", stats_catalogue['modules'])
+        st.metric("Sources de données", stats_catalogue['sources'] or 1)
         
         # Répartition par source
-        if 'source' in formations_df.columns:
-            st.write("**Répartition par source:**")
-            source_counts = formations_df['source'].value_counts()
-            for source, count in source_counts.items():
-                st.write(f"• {source}: {count}")
+        st.write("**Répartition par source:**")
+        for source, count in catalogue.repartition('source').items():
+            st.write(f"• {source}: {count}")
         
         # Aperçu des formations
         st.write("**Formations disponibles:**")
-        display_cols = ['titre', 'niveau', 'duree_heures']
-        if 'source' in formations_df.columns:
-            display_cols.append('source')
-        st.dataframe(formations_df[display_cols].head(8), use_container_width=True)
+        st.dataframe(catalogue.formations(limite=8)[['titre', 'niveau', 'duree_heures', 'source']], use_container_width=True)
     else:
         st.warning("Aucune formation chargée")
 
-# =============================================================================
-# TEMPLATE POUR L'AGENT AVEC VRAIES DONNÉES
-# =============================================================================
-
-pedagogical_template_real = """
-Tu es un expert pédagogique qui génère des contenus de formation de haute qualité à partir de tes données.
-
-DONNÉES RÉELLES DISPONIBLES:
-=== FORMATIONS ===
-{formations_data}
-
-=== MODULES DÉTAILLÉS ===
-{modules_data}
-
-=== EXERCICES PRATIQUES ===
-{exercises_data}
-
-PARAMÈTRES DE GÉNÉRATION:
-- Type de contenu: {generation_type}
-- Domaine: {domaine}
-- Niveau: {niveau}
-- Durée: {duree}h
-- Format: {format_sortie}
-
-HISTORIQUE: {chat_history}
-
-DEMANDE UTILISATEUR: {user_input}
-
-INSTRUCTIONS SPÉCIALES:
-1. Utilise tes données pour générer un contenu pédagogique précis et structuré.
-2. Cite les sources exactes (Kaggle Learn, Python Documentation, etc.)
-3. Intègre les exercices et exemples de code fournis
-4. Respecte les durées réelles des modules
-5. Mentionne les prérequis exacts des formations réelles
-6. Si tu génères un cours, base-toi sur les vrais modules de la base de données
-
-Si tu génères un COURS COMPLET, structure ainsi:
-# titre du cours basé sur les vraies données
-
-## 📋 Source et informations
-- **Source**: [Source exacte des données]
-- **Durée réelle**: durée basée sur les vraies données
-- **Niveau**: niveau des vraies données
-- **Prérequis**: prérequis réels
-
-## 🎯 Objectifs
-objectifs tirés des données réelles
-
-## 📚 Programme
-utilise les vrais modules avec leurs durées et concepts exacts
-
-## 💻 Exercices pratiques
-utilise les vrais exercices collectés
-
-## 🔗 Références
-- Basé sur les données de: sources utilisées
-
-GÉNÈRE LE CONTENU:
-"""
-
 # =============================================================================
 # INITIALISATION LLM
 # =============================================================================
 
-if "llm_chain_real" not in st.session_state:
-    memory = ConversationBufferMemory(
-        chat_memory=st.session_state.chat_history,
-        memory_key="chat_history",
-        input_key="user_input"
+@st.cache_resource
+def obtenir_cache_llm():
+    """Cache persistant des réponses du LLM, installé pour tous les appels LangChain du processus"""
+    from langchain_core.globals import set_llm_cache
+    import cache_llm
+    cache = cache_llm.CacheReponsesSQLite()
+    set_llm_cache(cache_llm.CacheLangChain(cache))
+    return cache
+
+@st.cache_resource
+def obtenir_cache_semantique():
+    """Cache sémantique des demandes de génération, partagé entre les sessions"""
+    return cache_semantique.CacheSemantique()
+
+cache_demandes = obtenir_cache_semantique()
+
+def construire_chaine():
+    """
+    Chaîne LangChain de la session, construite à la première génération : c'est là que la pile LLM est
+    importée et que l'historique persistant de la session est relu
+    """
+    from langchain.prompts import ChatPromptTemplate
+    from langchain.chains import LLMChain
+    import historique_conversation
+    from memoire import MemoireResumee, resumeur_llm
+
+    debut = time.perf_counter()
+    obtenir_cache_llm()
+    st.session_state.chat_history = historique_conversation.HistoriqueSQLite(
+        f"agent:{st.query_params['session']}", obtenir_stockage_historique()
     )
-    
-    prompt_template = ChatPromptTemplate.from_template(pedagogical_template_real)
-    llm = ChatGoogleGenerativeAI(
-        model="gemini-1.5-flash-latest", 
-        google_api_key=api_key, 
+    prompt_template = ChatPromptTemplate.from_template(noyau_pedagogique.pedagogical_template_real)
+    llm = clients_llm.obtenir_llm(
+        api_key,
+        modele="gemini-1.5-flash-latest", 
         temperature=0.2  # Moins créatif, plus factuel
     )
+
+    # Derniers tours mot pour mot, tours plus anciens repliés dans un résumé mis à jour en arrière-plan
+    memory = MemoireResumee(
+        chat_memory=st.session_state.chat_history,
+        memory_key="chat_history",
+        input_key="user_input",
+        resumeur=resumeur_llm(clients_llm.obtenir_llm(api_key, modele="gemini-1.5-flash-latest", temperature=0))
+    )
     
-    st.session_state.llm_chain_real = LLMChain(
+    chaine = LLMChain(
         prompt=prompt_template,
         llm=llm,
         memory=memory
     )
+    st.session_state.duree_construction_chaine = time.perf_counter() - debut
+    return chaine
 
 # =============================================================================
 # INTERFACE DE GÉNÉRATION
@@ -272,71 +253,135 @@ if "example_query" in st.session_state:
 
 if st.button("🚀 Générer le contenu avec les vraies données", type="primary"):
     if user_input:
-        with st.spinner("🤖 Génération basée sur les données réelles collectées..."):
+        with st.spinner("🤖 Génération basée sur les données réelles collectées..."), \
+                instrumentation.mesures.trace("agent_generation", type=generation_type) as trace:
             try:
-                # Préparer le contexte avec les vraies données
-                formations_context = formations_df.to_string(index=False) if not formations_df.empty else "Aucune formation chargée"
-                modules_context = modules_df.to_string(index=False) if not modules_df.empty else "Aucun module chargé"
-                exercises_context = json.dumps(exercises_data, ensure_ascii=False, indent=2) if exercises_data else "Aucun exercice chargé"
+                trace.ajouter_duree("chargement_donnees", duree_chargement_donnees)
+                if "llm_chain_real" not in st.session_state:
+                    with trace.etape("construction_chaine"):
+                        st.session_state.llm_chain_real = construire_chaine()
+                import flux_llm
                 
-                # Filtrer les données selon les paramètres
-                filtered_formations = formations_df
-                if domaine and domaine in formations_df['domaine'].values:
-                    filtered_formations = formations_df[formations_df['domaine'] == domaine]
-                if niveau and niveau in formations_df['niveau'].values:
-                    filtered_formations = filtered_formations[filtered_formations['niveau'] == niveau]
+                # Préparer le contexte (mis en cache par contenu des enregistrements sélectionnés et termes de la demande)
+                with trace.etape("contexte"):
+                    requete_index = noyau_pedagogique.requete_index(user_input, domaine, niveau)
+                    selection = noyau_pedagogique.selectionner(index_modules, catalogue, domaine, niveau, requete_index)
+                    cle_contexte = (
+                        selection["empreinte"], generation_type, ' '.join(index_catalogue.tokeniser(requete_index))
+                    )
+                    preparation = cache_contexte_prompt.obtenir(cle_contexte)
+                    trace.cache("contexte", preparation is not None)
+                    if preparation is None:
+                        preparation = noyau_pedagogique.preparer_selection(
+                            catalogue, selection, generation_type, requete_index
+                        )
+                        cache_contexte_prompt.ajouter(cle_contexte, preparation)
+                rapport_tokens = dict(preparation["rapport_tokens"])
+                memoire = st.session_state.llm_chain_real.memory
+                memoire.max_tokens_historique = contexte_prompt.budget_pour(generation_type)['historique']
+                rapport_tokens["historique"] = {
+                    "tokens": contexte_prompt.estimer_tokens(memoire.buffer_as_str),
+                    "budget": memoire.max_tokens_historique,
+                    "elements": len(memoire.chat_memory.messages)
+                }
                 
-                # Générer la réponse avec les vraies données
-                response = st.session_state.llm_chain_real.invoke({
-                    "formations_data": filtered_formations.to_string(index=False),
-                    "modules_data": modules_context,
-                    "exercises_data": exercises_context,
-                    "generation_type": generation_type,
-                    "domaine": domaine,
-                    "niveau": niveau,
-                    "duree": duree,
-                    "format_sortie": format_sortie,
-                    "user_input": user_input
-                })
+                # Réutiliser le contenu d'une demande équivalente déjà traitée (si les enregistrements du catalogue
+                # dont il a été généré n'ont pas changé), sinon générer avec les vraies données
+                parametres_generation = cache_semantique.cle_parametres(generation_type, domaine, niveau, duree, format_sortie)
+                with trace.etape("cache_semantique"):
+                    resultat_semantique = cache_demandes.rechercher(
+                        user_input, parametres_generation, seuil=seuil_semantique,
+                        valider=lambda dependances: catalogue.empreinte_selection(dependances) == dependances["empreinte"]
+                    )
+                trace.cache("semantique", resultat_semantique is not None)
+                metriques = None
                 
-                # Afficher la réponse
                 st.write("### 📝 Contenu généré à partir des données réelles:")
-                st.write(response["text"])
+                if resultat_semantique:
+                    texte_genere = resultat_semantique["course_data"]["contenu"]
+                    memoire.save_context({"user_input": user_input}, {"text": texte_genere})
+                    with trace.etape("rendu_streamlit"):
+                        st.write(texte_genere)
+                else:
+                    # Afficher la réponse au fil de l'eau, puis l'enregistrer dans la mémoire de la chaîne
+                    chaine = st.session_state.llm_chain_real
+                    with trace.etape("rendu_prompt"):
+                        entrees = chaine.prep_inputs(noyau_pedagogique.variables_prompt(
+                            preparation, generation_type, domaine, niveau, duree, format_sortie, user_input
+                        ))
+                        prompt_value = chaine.prompt.format_prompt(**{k: entrees[k] for k in chaine.prompt.input_variables})
+                    mesure = flux_llm.MesureFlux()
+                    # Le temps passé à produire les morceaux va dans l'étape "llm", le reste de write_stream
+                    # (affichage au fil de l'eau) dans "rendu_streamlit"
+                    debut_flux = time.perf_counter()
+                    texte_genere = st.write_stream(
+                        trace.mesurer_flux("llm", flux_llm.generer_en_flux(chaine.llm, prompt_value, mesure))
+                    )
+                    trace.ajouter_duree("rendu_streamlit", time.perf_counter() - debut_flux - trace.durees.get("llm", 0.0), debut_flux)
+                    chaine.prep_outputs(entrees, {"text": texte_genere})
+                    metriques = mesure.en_dict()
+                    st.session_state.metriques_generation.append(metriques)
+                    trace.compter_tokens(
+                        prompt=contexte_prompt.estimer_tokens(prompt_value.to_string()),
+                        completion=metriques['tokens_sortie']
+                    )
+                    trace.cache("reponses_llm", metriques['depuis_cache'])
+                    trace.cache("coalescence", metriques['coalesce'])
                 
                 # Informations sur les sources utilisées
                 with st.expander("🔍 Sources de données utilisées"):
-                    if not filtered_formations.empty and 'source' in filtered_formations.columns:
-                        sources_used = filtered_formations['source'].unique()
+                    if resultat_semantique:
+                        st.write("**♻️ Contenu servi par le cache sémantique :**")
+                        st.write(f"• Similarité: {resultat_semantique['similarite']:.2f} (seuil {seuil_semantique:.2f})")
+                        st.write(f"• Demande d'origine: {resultat_semantique['demande_origine']}")
+                        st.write(f"• Générée le: {resultat_semantique['course_data'].get('timestamp', 'N/A')}")
+                    
+                    if preparation["sources"]:
                         st.write("**Sources réelles utilisées pour cette génération :**")
-                        for source in sources_used:
-                            count = len(filtered_formations[filtered_formations['source'] == source])
+                        for source, count in preparation["sources"].items():
                             st.write(f"• **{source}**: {count} formation(s)")
                     
                     st.write("**Statistiques de génération :**")
-                    st.write(f"• Formations filtrées: {len(filtered_formations)}")
-                    st.write(f"• Modules disponibles: {len(modules_df) if not modules_df.empty else 0}")
-                    st.write(f"• Exercices disponibles: {len(exercises_data)}")
+                    st.write(f"• Formations filtrées: {preparation['nb_formations']}")
+                    st.write(f"• Modules candidats (index): {preparation['nb_modules_candidats']} / {stats_catalogue['modules']}")
+                    st.write(f"• Exercices candidats (index): {preparation['nb_exercices_candidats']}")
+                    
+                    st.write("**Répartition des tokens du contexte :**")
+                    for section, infos in rapport_tokens.items():
+                        st.write(f"• {section}: {infos['tokens']} / {infos['budget']} tokens ({infos['elements']} éléments)")
+                    
+                    if metriques:
+                        st.write("**Latence de génération :**")
+                        st.write(f"• Premier token: {metriques['ttft_s']:.2f}s (total {metriques['duree_s']:.2f}s)")
+                        st.write(f"• Débit: {metriques['tokens_par_seconde'] or 'N/A'} tokens/s ({metriques['tokens_sortie']} tokens)")
+                        if metriques['depuis_cache']:
+                            st.write("• Réponse servie par le cache des réponses LLM")
+                        if metriques['coalesce']:
+                            st.write("• Réponse partagée avec une requête identique en cours dans une autre session")
                 
                 # Sauvegarder le cours généré
-                course_data = {
-                    "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M"),
-                    "type": generation_type,
-                    "domaine": domaine,
-                    "niveau": niveau,
-                    "duree": duree,
-                    "demande": user_input,
-                    "contenu": response["text"],
-                    "sources_utilisees": filtered_formations['source'].unique().tolist() if not filtered_formations.empty and 'source' in filtered_formations.columns else [],
-                    "nb_formations_source": len(filtered_formations)
-                }
-                st.session_state.generated_courses.append(course_data)
+                course_data = noyau_pedagogique.creer_course_data(
+                    preparation, generation_type, domaine, niveau, duree, user_input, texte_genere
+                )
+                if metriques:
+                    course_data["metriques"] = metriques
+                if resultat_semantique:
+                    course_data["cache_semantique"] = {
+                        "similarite": round(resultat_semantique["similarite"], 3),
+                        "demande_origine": resultat_semantique["demande_origine"]
+                    }
+                with trace.etape("enregistrement"):
+                    if not resultat_semantique:
+                        cache_demandes.ajouter(user_input, parametres_generation, course_data, dependances=preparation["selection"])
+                    entree = stock_contenus.ajouter(course_data, session=st.query_params["session"])
+                st.session_state.generated_courses = st.session_state.generated_courses[-4:] + [entree]
                 
                 # Bouton de téléchargement
                 filename = f"cours_reel_{datetime.now().strftime('%Y%m%d_%H%M')}"
                 if format_sortie == "Markdown":
                     st.download_button(
                         "📥 Télécharger (MD)",
-                        response["text"],
+                        texte_genere,
                         file_name=f"{filename}.md",
                         mime="text/markdown"
                     )
@@ -351,10 +396,11 @@ if st.button("🚀 Générer le contenu avec les vraies données", type="primary
                 st.success("✅ Contenu généré avec succès à partir des données réelles !")
                 
             except Exception as e:
+                trace.statut = "erreur"
                 st.error(f"❌ Erreur lors de la génération: {str(e)}")
                 st.write("**Détails de l'erreur pour debugging:**")
-                st.write(f"Formations disponibles: {len(formations_df) if not formations_df.empty else 0}")
-                st.write(f"Modules disponibles: {len(modules_df) if not modules_df.empty else 0}")
+                st.write(f"Formations disponibles: {stats_catalogue['formations']}")
+                st.write(f"Modules disponibles: {stats_catalogue['modules']}")
     else:
         st.warning("⚠️ Veuillez saisir une demande")
 
@@ -365,51 +411,49 @@ if st.button("🚀 Générer le contenu avec les vraies données", type="primary
 st.write("---")
 st.write("## 📊 Dashboard des données réelles collectées")
 
+# Lignes affichées au plus dans les tableaux (le catalogue n'est jamais chargé en entier)
+LIGNES_TABLEAU_MAX = 200
+
 tab1, tab2, tab3 = st.tabs(["📚 Formations", "📝 Modules", "💪 Exercices"])
 
 with tab1:
-    if not formations_df.empty:
+    if stats_catalogue['formations']:
         col1, col2 = st.columns(2)
         
         with col1:
             st.write("### Répartition par niveau")
-            if 'niveau' in formations_df.columns:
-                niveau_counts = formations_df['niveau'].value_counts()
-                st.bar_chart(niveau_counts)
+            st.bar_chart(catalogue.repartition('niveau'))
         
         with col2:
             st.write("### Répartition par domaine")
-            if 'domaine' in formations_df.columns:
-                domaine_counts = formations_df['domaine'].value_counts()
-                st.bar_chart(domaine_counts)
+            st.bar_chart(catalogue.repartition('domaine'))
         
         st.write("### Tableau détaillé des formations")
-        st.dataframe(formations_df, use_container_width=True)
+        if stats_catalogue['formations'] > LIGNES_TABLEAU_MAX:
+            st.caption(f"{LIGNES_TABLEAU_MAX} premières formations sur {stats_catalogue['formations']}")
+        st.dataframe(catalogue.formations(limite=LIGNES_TABLEAU_MAX), use_container_width=True)
     else:
         st.warning("⚠️ Aucune donnée de formation disponible")
 
 with tab2:
-    if not modules_df.empty:
+    if stats_catalogue['modules']:
         st.write("### Modules par formation")
-        if 'formation_id' in modules_df.columns:
-            modules_per_formation = modules_df['formation_id'].value_counts().sort_index()
-            st.bar_chart(modules_per_formation)
+        st.bar_chart(catalogue.modules_par_formation())
         
         st.write("### Durée moyenne des modules")
-        if 'duree_minutes' in modules_df.columns:
-            avg_duration = modules_df['duree_minutes'].mean()
+        avg_duration = catalogue.duree_moyenne_modules()
+        if avg_duration is not None:
             st.metric("Durée moyenne", f"{avg_duration:.0f} minutes")
         
         st.write("### Tableau des modules")
-        display_modules = modules_df[['titre', 'duree_minutes', 'concepts_cles']].head(20) if len(modules_df.columns) > 3 else modules_df.head(20)
-        st.dataframe(display_modules, use_container_width=True)
+        st.dataframe(catalogue.modules(limite=20)[['titre', 'duree_minutes', 'concepts_cles']], use_container_width=True)
     else:
         st.warning("⚠️ Aucune donnée de module disponible")
 
 with tab3:
-    if exercises_data:
+    if stats_catalogue['categories_exercices']:
         st.write("### Exercices par catégorie")
-        for category_data in exercises_data:
+        for category_data in catalogue.exercices(limite=LIGNES_TABLEAU_MAX):
             with st.expander(f"📁 {category_data['category']} - {category_data['level']}"):
                 st.write(f"**Nombre d'exercices:** {len(category_data['exercises'])}")
                 for i, exercise in enumerate(category_data['exercises'][:3]):  # Afficher les 3 premiers
@@ -424,27 +468,89 @@ with tab3:
 # HISTORIQUE DES GÉNÉRATIONS
 # =============================================================================
 
+def afficher_entree_cours(course, cle):
+    """Entrée légère d'un contenu généré ; le texte complet n'est relu du stock qu'à la demande"""
+    with st.expander(f"🎯 {course['type']} - {course['timestamp']} (Sources: {', '.join(course.get('sources_utilisees', ['N/A']))})"):
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.write(f"**Domaine:** {course.get('domaine', 'N/A')}")
+            st.write(f"**Niveau:** {course.get('niveau', 'N/A')}")
+            st.write(f"**Durée:** {course.get('duree', 'N/A')}h")
+        
+        with col2:
+            st.write(f"**Sources utilisées:** {', '.join(course.get('sources_utilisees', ['N/A']))}")
+            st.write(f"**Nb formations source:** {course.get('nb_formations_source', 0)}")
+        
+        st.write(f"**Demande:** {course['demande']}")
+        if st.toggle("Afficher le contenu complet", key=f"complet_{cle}"):
+            st.markdown(stock_contenus.contenu(course['id']))
+        else:
+            st.write("**Aperçu du contenu généré:**")
+            st.text(course['apercu'])
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button(
+                "📥 Télécharger (MD)",
+                lambda: stock_contenus.contenu(course['id']),
+                file_name=f"cours_reel_{course['id']}.md",
+                mime="text/markdown",
+                key=f"md_{cle}"
+            )
+        with col2:
+            st.download_button(
+                "📥 Télécharger (JSON)",
+                lambda: json.dumps(stock_contenus.course_complet(course['id']), ensure_ascii=False, indent=2),
+                file_name=f"cours_reel_{course['id']}.json",
+                mime="application/json",
+                key=f"json_{cle}"
+            )
+
 if st.session_state.generated_courses:
     st.write("---")
     st.write("### 📚 Historique des contenus générés (avec sources réelles)")
     
-    for i, course in enumerate(reversed(st.session_state.generated_courses[-5:])):  # 5 derniers
-        with st.expander(f"🎯 {course['type']} - {course['timestamp']} (Sources: {', '.join(course.get('sources_utilisees', ['N/A']))})"):
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                st.write(f"**Domaine:** {course.get('domaine', 'N/A')}")
-                st.write(f"**Niveau:** {course.get('niveau', 'N/A')}")
-                st.write(f"**Durée:** {course.get('duree', 'N/A')}h")
-            
-            with col2:
-                st.write(f"**Sources utilisées:** {', '.join(course.get('sources_utilisees', ['N/A']))}")
-                st.write(f"**Nb formations source:** {course.get('nb_formations_source', 0)}")
-            
-            st.write(f"**Demande:** {course['demande']}")
-            st.write("**Aperçu du contenu généré:**")
-            preview = course['contenu'][:500] + "..." if len(course['contenu']) > 500 else course['contenu']
-            st.text(preview)
+    for course in reversed(st.session_state.generated_courses[-5:]):  # 5 derniers
+        afficher_entree_cours(course, f"historique_{course['id']}")
+
+# Conversation persistante de la session : la fenêtre en mémoire, et les pages plus anciennes à la demande
+if "chat_history" in st.session_state:
+    historique = st.session_state.chat_history
+    with st.expander(f"💬 Conversation de la session ({historique.decalage + len(historique.messages)} messages)",
+                     expanded=bool(historique.anciens)):
+        if historique.messages_anterieurs() and st.button("⬆️ Charger les messages précédents", key="messages_precedents"):
+            historique.charger_page_precedente()
+        if historique.messages_anterieurs():
+            st.caption(f"{historique.messages_anterieurs()} message(s) plus ancien(s)")
+        for message in historique.anciens + historique.messages:
+            auteur = "🧑 Vous" if message.type == "human" else "🤖 Agent"
+            texte = message.content if len(message.content) <= 300 else message.content[:300] + "…"
+            st.markdown(f"**{auteur}** : {texte}")
+
+if stock_contenus.compter():
+    st.write("### 🔎 Rechercher dans les contenus générés (toutes sessions)")
+    col1, col2, col3, col4 = st.columns([3, 2, 2, 2])
+    with col1:
+        texte_recherche = st.text_input("Mots-clés (demande ou contenu)", key="recherche_cours")
+    with col2:
+        type_recherche = st.selectbox("Type", ["Tous"] + stock_contenus.valeurs("type"), key="recherche_type")
+    with col3:
+        domaine_recherche = st.selectbox("Domaine", ["Tous"] + stock_contenus.valeurs("domaine"), key="recherche_domaine")
+    with col4:
+        niveau_recherche = st.selectbox("Niveau", ["Tous"] + stock_contenus.valeurs("niveau"), key="recherche_niveau")
+    
+    filtres = [type_recherche, domaine_recherche, niveau_recherche]
+    if texte_recherche.strip() or any(f != "Tous" for f in filtres):
+        resultats = stock_contenus.rechercher(
+            texte_recherche,
+            type_contenu=None if type_recherche == "Tous" else type_recherche,
+            domaine=None if domaine_recherche == "Tous" else domaine_recherche,
+            niveau=None if niveau_recherche == "Tous" else niveau_recherche
+        )
+        st.caption(f"{len(resultats)} résultat(s)")
+        for course in resultats:
+            afficher_entree_cours(course, f"recherche_{course['id']}")
 
 # =============================================================================
 # INSTRUCTIONS POUR RÉCUPÉRER LES DONNÉES
@@ -453,7 +559,7 @@ if st.session_state.generated_courses:
 with st.sidebar:
     st.write("### 📋 Instructions")
     
-    if formations_df.empty or len(formations_df) < 5:  # Si peu de données
+    if not donnees_reelles or stats_catalogue['formations'] < 5:  # Si peu de données
         st.warning("⚠️ Données limitées détectées")
         st.write("""
         **Pour récupérer les vraies données :**
@@ -477,20 +583,70 @@ with st.sidebar:
         """)
     else:
         st.success("✅ Données réelles chargées")
-        st.write(f"**{len(formations_df)}** formations disponibles")
+        st.write(f"**{stats_catalogue['formations']}** formations disponibles")
         st.write("**Sources actives :**")
-        if 'source' in formations_df.columns:
-            for source in formations_df['source'].unique():
-                st.write(f"• {source}")
+        for source in catalogue.valeurs('source'):
+            st.write(f"• {source}")
 
     st.write("---")
     st.write("### 📈 Statistiques")
-    st.metric("Contenus générés", len(st.session_state.generated_courses))
-    if not formations_df.empty:
-        st.metric("Formations disponibles", len(formations_df))
-        if 'duree_heures' in formations_df.columns:
-            total_hours = formations_df['duree_heures'].sum()
-            st.metric("Heures de formation", f"{total_hours}h")
+    st.metric("Contenus générés", stock_contenus.compter(st.query_params["session"]))
+    if stats_catalogue['formations']:
+        st.metric("Formations disponibles", stats_catalogue['formations'])
+        st.metric("Heures de formation", f"{stats_catalogue['heures']}h")
+    
+    stats_cache = cache_contexte_prompt.statistiques()
+    st.write("**Cache des contextes :**")
+    st.write(f"• Hits: {stats_cache['hits']} / Misses: {stats_cache['misses']} ({stats_cache['taux_hit']:.0%})")
+    st.write(f"• {stats_cache['entrees']} entrées, {stats_cache['octets'] / 1024:.0f} Ko")
+    
+    # Statistiques de la pile LLM seulement une fois qu'elle a été chargée par une génération du processus
+    pile_llm_chargee = "cache_llm" in sys.modules
+    if pile_llm_chargee:
+        stats_llm = obtenir_cache_llm().statistiques()
+        st.write("**Cache des réponses LLM :**")
+        st.write(f"• Hits: {stats_llm['hits']} / Misses: {stats_llm['misses']} ({stats_llm['taux_hit']:.0%})")
+        st.write(f"• {stats_llm['entrees']} réponses, {stats_llm['octets'] / 1024:.0f} Ko sur disque")
+    else:
+        st.caption("Pile LLM non chargée : elle sera importée à la première génération")
+    if "duree_construction_chaine" in st.session_state:
+        st.write(f"• Chaîne construite en {st.session_state.duree_construction_chaine:.2f}s (première génération)")
+    
+    mesures_flux = [m for m in st.session_state.metriques_generation if not m['depuis_cache']]
+    if mesures_flux:
+        st.write("**Latence perçue (générations du LLM) :**")
+        st.write(f"• Premier token moyen: {sum(m['ttft_s'] for m in mesures_flux) / len(mesures_flux):.2f}s")
+        debits = [m['tokens_par_seconde'] for m in mesures_flux if m['tokens_par_seconde']]
+        if debits:
+            st.write(f"• Débit moyen: {sum(debits) / len(debits):.1f} tokens/s")
+    
+    stats_clients = clients_llm.statistiques()
+    st.write("**Clients Gemini partagés :**")
+    st.write(f"• {stats_clients['clients']} client(s), {stats_clients['reutilisations']} réutilisation(s)")
+    st.write(f"• Configuration évitée: ~{stats_clients['temps_economise_s'] * 1000:.0f} ms ({stats_clients['temps_creation_moyen_ms']} ms par création)")
+    
+    if pile_llm_chargee:
+        import coalescence
+        stats_coalescence = coalescence.appels_llm.statistiques()
+        st.write("**Appels LLM dédupliqués :**")
+        st.write(f"• {stats_coalescence['appels']} appel(s) envoyé(s), {stats_coalescence['coalesces']} requête(s) identique(s) regroupée(s)")
+    
+    stats_semantique = cache_demandes.statistiques()
+    st.write("**Cache sémantique :**")
+    st.write(f"• Hits: {stats_semantique['hits']} / Misses: {stats_semantique['misses']} ({stats_semantique['taux_hit']:.0%})")
+    
+    stats_stock = stock_contenus.statistiques()
+    st.write("**Stock des contenus générés :**")
+    st.write(f"• {stats_stock['entrees']} contenus, {stats_stock['octets'] / 1024:.0f} Ko compressés en {stats_stock['octets_compresses'] / 1024:.0f} Ko")
+    
+    stats_instrumentation = instrumentation.mesures.statistiques("agent_generation")
+    if stats_instrumentation['traces']:
+        st.write(f"**Étapes des générations ({stats_instrumentation['traces_recentes']} dernières) :**")
+        for etape, infos in stats_instrumentation['etapes'].items():
+            st.write(f"• {etape}: {infos['moyenne_ms']:.0f} ms en moyenne, p95 {infos['p95_ms']:.0f} ms")
+        st.write(f"• Tokens moyens: {stats_instrumentation['tokens_prompt_moyen']} (prompt) / {stats_instrumentation['tokens_completion_moyen']} (réponse)")
+        taux_caches = [f"{nom} {infos['taux_hit']:.0%}" for nom, infos in stats_instrumentation['caches'].items()]
+        st.write(f"• Taux de hit: {', '.join(taux_caches)}")
 
 # Footer
 st.write("---")
@@ -0,0 +1,385 @@
+"""
+Catalogue de formations, modules et exercices dans une base SQLite indexée
+Écrit par collecte_donnees.py dans catalogue.db (le même fichier que l'état de la collecte incrémentale,
+mis à jour dans la même transaction), puis interrogé par l'agent pédagogique avec des recherches
+indexées : rien n'est chargé ni parcouru en entier au démarrage, quelle que soit la taille du catalogue.
+Index : formations par domaine, niveau et source ; modules par formation et ordre ; exercices par
+catégorie et niveau. Chaque ligne porte l'empreinte de son contenu : les caches en aval sont invalidés
+par les seuls enregistrements qu'ils utilisent, pas par n'importe quel changement du catalogue.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import numpy as np
+import pandas as pd
+from catalogue_incremental import FICHIER_CATALOGUE, cle_exercices, empreinte
+from index_catalogue import DOC_MODULE, DOC_EXERCICE
+
+# Base construite depuis les données d'exemple quand aucune collecte n'a été faite
+FICHIER_CATALOGUE_EXEMPLE = 'catalogue_exemple.db'
+
+COLONNES_FORMATIONS = ['formation_id', 'titre', 'domaine', 'niveau', 'duree_heures', 'prerequis', 'description', 'source']
+COLONNES_MODULES = ['module_id', 'formation_id', 'ordre', 'titre', 'duree_minutes', 'concepts_cles', 'source', 'exemple', 'niveau']
+
+# Affinités numériques : '8' et 8 sont stockés de la même façon, avec les types des CSV relus par pandas
+TYPES_COLONNES = {
+    'formation_id': 'INTEGER', 'module_id': 'INTEGER', 'ordre': 'INTEGER',
+    'duree_heures': 'REAL', 'duree_minutes': 'INTEGER',
+}
+
+# Colonnes des formations sur lesquelles on peut filtrer et regrouper
+COLONNES_INDEXEES = ('domaine', 'niveau', 'source')
+
+
+# Colonnes dont le contenu détermine l'empreinte de chaque ligne
+COLONNES_EMPREINTE = {
+    "formations": COLONNES_FORMATIONS,
+    "modules": COLONNES_MODULES,
+    "exercices": ("category", "level", "exercices"),
+}
+
+def _definition(colonnes, cle):
+    return ", ".join(
+        f"{c} {TYPES_COLONNES.get(c, 'TEXT')}{' PRIMARY KEY' if c == cle else ''}" for c in colonnes
+    ) + ", empreinte TEXT"
+
+def _valeur(valeur):
+    """Valeur manquante de pandas (NaN) -> NULL"""
+    return None if valeur is None or (isinstance(valeur, float) and pd.isna(valeur)) else valeur
+
+
+class BaseCatalogue:
+    """Tables formations, modules et exercices du catalogue et leurs recherches indexées"""
+
+    def __init__(self, chemin=FICHIER_CATALOGUE):
+        self.chemin = chemin
+        self._local = threading.local()
+
+        connexion = self.connexion()
+        connexion.execute("PRAGMA journal_mode=WAL")
+        connexion.execute(f"CREATE TABLE IF NOT EXISTS formations ({_definition(COLONNES_FORMATIONS, 'formation_id')})")
+        connexion.execute(f"CREATE TABLE IF NOT EXISTS modules ({_definition(COLONNES_MODULES, 'module_id')})")
+        connexion.execute("""
+            CREATE TABLE IF NOT EXISTS exercices (
+                cle TEXT PRIMARY KEY,
+                category TEXT,
+                level TEXT,
+                position INTEGER NOT NULL,
+                exercices TEXT NOT NULL,
+                empreinte TEXT
+            )
+        """)
+        self._ajouter_empreintes(connexion)
+        for colonne in COLONNES_INDEXEES:
+            connexion.execute(f"CREATE INDEX IF NOT EXISTS idx_formations_{colonne} ON formations({colonne})")
+        connexion.execute("CREATE INDEX IF NOT EXISTS idx_formations_domaine_niveau ON formations(domaine, niveau)")
+        connexion.execute("CREATE INDEX IF NOT EXISTS idx_modules_formation ON modules(formation_id, ordre)")
+        connexion.execute("CREATE INDEX IF NOT EXISTS idx_exercices_categorie ON exercices(category, level)")
+        connexion.execute("CREATE INDEX IF NOT EXISTS idx_exercices_position ON exercices(position)")
+        connexion.commit()
+
+    def _ajouter_empreintes(self, connexion):
+        """Base créée avant les empreintes par ligne : ajoute la colonne et la remplit une fois"""
+        for table in COLONNES_EMPREINTE:
+            if "empreinte" in [colonne[1] for colonne in connexion.execute(f"PRAGMA table_info({table})")]:
+                continue
+            connexion.execute(f"ALTER TABLE {table} ADD COLUMN empreinte TEXT")
+            self._calculer_empreintes(connexion, table)
+
+    @staticmethod
+    def _calculer_empreintes(connexion, table, condition="1", parametres=()):
+        """
+        Empreinte des lignes calculée sur les valeurs telles que stockées (après conversion par SQLite) :
+        le même contenu a la même empreinte qu'il vienne de pandas, d'une collecte ou d'une base migrée
+        """
+        connexion.execute(
+            f"UPDATE {table} SET empreinte = empreinte_ligne({', '.join(COLONNES_EMPREINTE[table])}) WHERE {condition}",
+            parametres
+        )
+
+    def connexion(self):
+        """Une connexion SQLite par thread ; dans le thread de collecte, elle est partagée avec l'état incrémental"""
+        connexion = getattr(self._local, 'connexion', None)
+        if connexion is None:
+            connexion = sqlite3.connect(self.chemin, timeout=30)
+            connexion.row_factory = sqlite3.Row
+            connexion.create_function("empreinte_ligne", -1, lambda *valeurs: empreinte(list(valeurs)), deterministic=True)
+            self._local.connexion = connexion
+        return connexion
+
+    # -------------------------------------------------------------------------
+    # Écriture
+    # -------------------------------------------------------------------------
+
+    def vider(self):
+        """Supprime tout le catalogue (sans valider : la collecte valide en fin de transaction)"""
+        for table in ("formations", "modules", "exercices"):
+            self.connexion().execute(f"DELETE FROM {table}")
+
+    def appliquer(self, genre, statut, valeur):
+        """
+        Répercute un changement détecté par catalogue_incremental.EtatCatalogue (observateur de la collecte).
+        statut 'ajoutes' ou 'modifies' : valeur est l'enregistrement ; 'supprimes' : son identifiant (ou sa clé).
+        """
+        connexion = self.connexion()
+        if genre == "exercices":
+            if statut == "supprimes":
+                connexion.execute("DELETE FROM exercices WHERE cle = ?", (valeur,))
+            else:
+                # Une catégorie modifiée garde sa position, une nouvelle catégorie est ajoutée à la fin
+                connexion.execute(
+                    """INSERT INTO exercices (cle, category, level, position, exercices)
+                       VALUES (?, ?, ?, (SELECT COALESCE(MAX(position), -1) + 1 FROM exercices), ?)
+                       ON CONFLICT(cle) DO UPDATE SET exercices = excluded.exercices""",
+                    (cle_exercices(valeur), valeur.get('category'), valeur.get('level'),
+                     json.dumps(valeur.get('exercises', []), ensure_ascii=False))
+                )
+                self._calculer_empreintes(connexion, "exercices", "cle = ?", (cle_exercices(valeur),))
+            return
+
+        table, colonnes, cle = (
+            ("formations", COLONNES_FORMATIONS, "formation_id") if genre == "formations"
+            else ("modules", COLONNES_MODULES, "module_id")
+        )
+        if statut == "supprimes":
+            connexion.execute(f"DELETE FROM {table} WHERE {cle} = ?", (valeur,))
+        else:
+            connexion.execute(
+                f"INSERT OR REPLACE INTO {table} ({', '.join(colonnes)}) VALUES ({', '.join('?' * len(colonnes))})",
+                [_valeur(valeur.get(c)) for c in colonnes]
+            )
+            self._calculer_empreintes(connexion, table, f"{cle} = ?", (_valeur(valeur.get(cle)),))
+
+    def remplacer(self, formations_df, modules_df, exercises_data):
+        """Remplace tout le catalogue par des données déjà chargées (anciens fichiers CSV/JSON, données d'exemple)"""
+        connexion = self.connexion()
+        with connexion:
+            self.vider()
+            for genre, lignes in (("formations", formations_df.to_dict('records')),
+                                  ("modules", modules_df.to_dict('records')),
+                                  ("exercices", exercises_data)):
+                for ligne in lignes:
+                    self.appliquer(genre, "ajoutes", ligne)
+
+    # -------------------------------------------------------------------------
+    # Lecture
+    # -------------------------------------------------------------------------
+
+    def _dataframe(self, requete, parametres=(), colonnes=None):
+        curseur = self.connexion().execute(requete, parametres)
+        df = pd.DataFrame([tuple(l) for l in curseur.fetchall()], columns=colonnes or [d[0] for d in curseur.description])
+        # NULL -> NaN, comme pour une colonne vide relue depuis un CSV
+        return df.replace({None: np.nan})
+
+    def version(self):
+        """Version publiée par la collecte incrémentale (0 si la base n'a pas été écrite par une collecte)"""
+        connexion = self.connexion()
+        if connexion.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'versions'").fetchone() is None:
+            return 0
+        return connexion.execute("SELECT COALESCE(MAX(version), 0) FROM versions").fetchone()[0]
+
+    def compter(self, table="formations"):
+        if table not in ("formations", "modules", "exercices"):
+            raise ValueError(f"Table inconnue : {table}")
+        return self.connexion().execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def signature(self):
+        """
+        État du catalogue (version et effectifs), peu coûteux à lire : indique que l'index de recherche doit être
+        rafraîchi (seuls les documents dont le texte a changé sont alors réindexés, voir index_catalogue)
+        """
+        return f"{os.path.abspath(self.chemin)}:v{self.version()}:" + ":".join(
+            str(self.compter(table)) for table in ("formations", "modules", "exercices")
+        )
+
+    def statistiques(self):
+        ligne = self.connexion().execute(
+            "SELECT COUNT(*), COUNT(DISTINCT source), COALESCE(SUM(duree_heures), 0) FROM formations"
+        ).fetchone()
+        return {
+            "formations": ligne[0],
+            "sources": ligne[1],
+            "heures": ligne[2],
+            "modules": self.compter("modules"),
+            "categories_exercices": self.compter("exercices"),
+            "version": self.version(),
+        }
+
+    def valeurs(self, colonne):
+        """Valeurs distinctes d'une colonne indexée des formations (domaine, niveau, source), par ordre d'apparition"""
+        if colonne not in COLONNES_INDEXEES:
+            raise ValueError(f"Colonne non indexée : {colonne}")
+        return [l[0] for l in self.connexion().execute(
+            f"SELECT {colonne} FROM formations WHERE {colonne} IS NOT NULL GROUP BY {colonne} ORDER BY MIN(formation_id)"
+        )]
+
+    def repartition(self, colonne):
+        """Nombre de formations par valeur d'une colonne indexée, par effectif décroissant"""
+        if colonne not in COLONNES_INDEXEES:
+            raise ValueError(f"Colonne non indexée : {colonne}")
+        lignes = self.connexion().execute(
+            f"SELECT {colonne}, COUNT(*) AS n FROM formations GROUP BY {colonne} ORDER BY n DESC, {colonne}"
+        ).fetchall()
+        return pd.Series([l[1] for l in lignes], index=[l[0] for l in lignes], name="count")
+
+    def existe(self, colonne, valeur):
+        if colonne not in COLONNES_INDEXEES:
+            raise ValueError(f"Colonne non indexée : {colonne}")
+        return self.connexion().execute(
+            f"SELECT 1 FROM formations WHERE {colonne} = ? LIMIT 1", (valeur,)
+        ).fetchone() is not None
+
+    def formations(self, domaine=None, niveau=None, source=None, limite=None):
+        """Formations correspondant aux filtres (recherche par index), dans l'ordre des identifiants"""
+        conditions, parametres = [], []
+        for colonne, valeur in (("domaine", domaine), ("niveau", niveau), ("source", source)):
+            if valeur is not None:
+                conditions.append(f"{colonne} = ?")
+                parametres.append(valeur)
+        clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        limite_sql = "LIMIT ?" if limite is not None else ""
+        if limite is not None:
+            parametres.append(limite)
+        return self._dataframe(
+            f"SELECT {', '.join(COLONNES_FORMATIONS)} FROM formations {clause} ORDER BY formation_id {limite_sql}",
+            parametres, COLONNES_FORMATIONS
+        )
+
+    def filtres_formations(self, domaine, niveau):
+        """Même règle que noyau_pedagogique.filtrer_formations : un filtre absent des données est ignoré"""
+        return {
+            "domaine": domaine if domaine and self.existe("domaine", domaine) else None,
+            "niveau": niveau if niveau and self.existe("niveau", niveau) else None,
+        }
+
+    def filtrer_formations(self, domaine, niveau):
+        return self.formations(**self.filtres_formations(domaine, niveau))
+
+    def empreinte_selection(self, selection):
+        """
+        Empreinte du contenu des enregistrements d'une sélection (noyau_pedagogique.selectionner) : formations
+        correspondant à selection['filtres'], modules selection['modules'] (module_id) et catégories d'exercices
+        des références selection['exercices'] ((position, rang)). Elle ne change que si l'un d'eux change.
+        """
+        connexion = self.connexion()
+        conditions, parametres = [], []
+        for colonne in ("domaine", "niveau"):
+            if selection["filtres"].get(colonne) is not None:
+                conditions.append(f"{colonne} = ?")
+                parametres.append(selection["filtres"][colonne])
+        clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        resultat = hashlib.sha256()
+        for formation_id, valeur in connexion.execute(
+            f"SELECT formation_id, empreinte FROM formations {clause} ORDER BY formation_id", parametres
+        ):
+            resultat.update(f"f{formation_id}:{valeur}\n".encode('utf-8'))
+
+        for prefixe, table, cle, identifiants in (
+            ("m", "modules", "module_id", list(selection["modules"])),
+            ("e", "exercices", "position", list(dict.fromkeys(position for position, _ in selection["exercices"]))),
+        ):
+            valeurs = dict(connexion.execute(
+                f"SELECT {cle}, empreinte FROM {table} WHERE {cle} IN ({', '.join('?' * len(identifiants))})", identifiants
+            ).fetchall()) if identifiants else {}
+            for identifiant in identifiants:
+                resultat.update(f"{prefixe}{identifiant}:{valeurs.get(identifiant)}\n".encode('utf-8'))
+        return resultat.hexdigest()
+
+    def modules(self, formation_id=None, limite=None):
+        """Modules d'une formation (ou de toutes) dans l'ordre du programme"""
+        clause, parametres = ("WHERE formation_id = ?", [formation_id]) if formation_id is not None else ("", [])
+        limite_sql = "LIMIT ?" if limite is not None else ""
+        if limite is not None:
+            parametres.append(limite)
+        return self._dataframe(
+            f"SELECT {', '.join(COLONNES_MODULES)} FROM modules {clause} ORDER BY formation_id, ordre {limite_sql}",
+            parametres, COLONNES_MODULES
+        )
+
+    def modules_par_ids(self, identifiants):
+        """Modules demandés, dans l'ordre des identifiants donnés (résultats de l'index de recherche)"""
+        if not identifiants:
+            return pd.DataFrame(columns=COLONNES_MODULES)
+        df = self._dataframe(
+            f"SELECT {', '.join(COLONNES_MODULES)} FROM modules WHERE module_id IN ({', '.join('?' * len(identifiants))})",
+            list(identifiants), COLONNES_MODULES
+        )
+        rang = {identifiant: i for i, identifiant in enumerate(identifiants)}
+        return df.iloc[sorted(range(len(df)), key=lambda i: rang[df['module_id'].iat[i]])].reset_index(drop=True)
+
+    def modules_par_formation(self):
+        """Nombre de modules par formation"""
+        lignes = self.connexion().execute(
+            "SELECT formation_id, COUNT(*) FROM modules GROUP BY formation_id ORDER BY formation_id"
+        ).fetchall()
+        return pd.Series([l[1] for l in lignes], index=[l[0] for l in lignes], name="count")
+
+    def duree_moyenne_modules(self):
+        return self.connexion().execute("SELECT AVG(duree_minutes) FROM modules").fetchone()[0]
+
+    def exercices(self, category=None, level=None, limite=None):
+        """Catégories d'exercices (format de exercices_reels.json), filtrées par catégorie et niveau"""
+        conditions, parametres = [], []
+        for colonne, valeur in (("category", category), ("level", level)):
+            if valeur is not None:
+                conditions.append(f"{colonne} = ?")
+                parametres.append(valeur)
+        clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        limite_sql = "LIMIT ?" if limite is not None else ""
+        if limite is not None:
+            parametres.append(limite)
+        lignes = self.connexion().execute(
+            f"SELECT category, level, exercices FROM exercices {clause} ORDER BY position {limite_sql}", parametres
+        ).fetchall()
+        return [{'category': l[0], 'level': l[1], 'exercises': json.loads(l[2])} for l in lignes]
+
+    def exercices_par_refs(self, refs):
+        """
+        Exercices désignés par (position de la catégorie, rang de l'exercice), regroupés par catégorie
+        dans l'ordre de première apparition (format de exercices_reels.json)
+        """
+        positions = list(dict.fromkeys(position for position, _ in refs))
+        if not positions:
+            return []
+        lignes = {l[0]: l for l in self.connexion().execute(
+            f"SELECT position, category, level, exercices FROM exercices WHERE position IN ({', '.join('?' * len(positions))})",
+            positions
+        )}
+        categories = {}
+        for position, rang in refs:
+            ligne = lignes.get(position)
+            if ligne is None:
+                continue
+            if position not in categories:
+                categories[position] = {'category': ligne[1], 'level': ligne[2], 'exercises': [], '_liste': json.loads(ligne[3])}
+            if rang < len(categories[position]['_liste']):
+                categories[position]['exercises'].append(categories[position]['_liste'][rang])
+        return [{k: v for k, v in c.items() if k != '_liste'} for c in categories.values()]
+
+    def documents(self):
+        """
+        Textes à indexer pour la recherche, lus en flux :
+        (texte, type de document, référence) avec module_id ou (position de la catégorie, rang de l'exercice)
+        """
+        connexion = self.connexion()
+        colonnes = ('titre', 'concepts_cles', 'niveau', 'exemple')
+        for ligne in connexion.execute(f"""
+            SELECT m.module_id, {', '.join('m.' + c for c in colonnes)},
+                   f.titre, f.domaine, f.niveau
+            FROM modules m LEFT JOIN formations f ON f.formation_id = m.formation_id
+            ORDER BY m.module_id
+        """):
+            morceaux = [str(ligne[i]) for i in range(1, 1 + len(colonnes)) if ligne[i] is not None]
+            if ligne[5] is not None:
+                morceaux.append(f"{ligne[5]} {ligne[6] or ''} {ligne[7] or ''}")
+            yield ' '.join(morceaux), DOC_MODULE, (ligne[0], 0)
+
+        for position, category, level, exercices in connexion.execute(
+            "SELECT position, category, level, exercices FROM exercices ORDER BY position"
+        ):
+            for rang, exercice in enumerate(json.loads(exercices)):
+                texte = ' '.join([category or '', level or '', exercice.get('title', ''), exercice.get('description', '')])
+                yield texte, DOC_EXERCICE, (position, rang)
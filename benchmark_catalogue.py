@@ -0,0 +1,346 @@
+"""
+Benchmarks des chemins critiques de l'agent pédagogique, hors-ligne
+Un catalogue synthétique (mêmes schémas que collecte_donnees.py) de 10², 10⁴ et 10⁶ modules passe par
+les étapes réelles : collecte (normalisation, état incrémental, base indexée, exports CSV/JSON),
+chargement (fichiers et base), filtrage domaine/niveau, index de recherche, mise en forme du contexte,
+génération avec un LLM simulé, et chargement des jeux de données de stress agrandis à la même taille.
+Chaque étape est mesurée en temps, en pic de mémoire Python (tracemalloc) et en taille de prompt, puis
+comparée à une référence enregistrée : le code de sortie est 1 en cas de régression.
+
+Usage : python benchmark_catalogue.py [--tailles 100 10000 1000000] [--reference benchmark_reference.json]
+        python benchmark_catalogue.py --enregistrer   (écrit la référence à partir de cette exécution)
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import pandas as pd
+import collecteurs
+import collecte_donnees
+import base_catalogue
+import contexte_prompt
+import donnees_stress
+import index_catalogue
+import noyau_pedagogique
+from generation_lot import LLMBouchon
+from langchain.prompts import ChatPromptTemplate
+
+TAILLES = (100, 10_000, 1_000_000)
+FICHIER_REFERENCE = 'benchmark_reference.json'
+GRAINE = 42
+
+# Tolérances avant de signaler une régression (le temps varie d'une machine et d'une exécution à l'autre)
+TOLERANCE_TEMPS = 0.5
+TOLERANCE_MEMOIRE = 0.25
+TOLERANCE_PROMPT = 0.05
+# Écarts absolus ignorés : bruit de mesure des étapes très courtes
+ECART_TEMPS_MIN_S = 0.05
+ECART_MEMOIRE_MIN_MO = 1.0
+
+MODULES_PAR_FORMATION = 10
+EXERCICES_PAR_CATEGORIE = 5
+
+# =============================================================================
+# 1. CATALOGUE SYNTHÉTIQUE
+# =============================================================================
+
+DOMAINES = ['Data Science', 'Programming', 'Machine Learning', 'Web Development', 'Databases', 'DevOps']
+NIVEAUX = ['Beginner', 'Intermediate', 'Advanced']
+SOURCES = ['Kaggle Learn', 'Python Documentation', 'Coursera', 'Synthetic']
+SUJETS = [
+    'pandas', 'numpy', 'dataframe', 'regression', 'classification', 'clustering', 'visualization',
+    'functions', 'loops', 'strings', 'dictionaries', 'classes', 'decorators', 'generators', 'sql',
+    'joins', 'indexes', 'transactions', 'docker', 'deployment', 'testing', 'http', 'flask', 'api',
+    'seaborn', 'matplotlib', 'statistics', 'probability', 'neural', 'networks', 'gradient', 'features',
+]
+
+def generer_cours(nb_modules, graine=GRAINE):
+    """
+    Cours bruts synthétiques (même forme que ceux de Kaggle Learn, avec leur domaine) totalisant nb_modules
+    leçons. Déterministe pour une graine donnée.
+    """
+    aleatoire = random.Random(graine)
+    cours, restants, numero = [], nb_modules, 0
+    while restants > 0:
+        nb_lecons = min(restants, aleatoire.randint(MODULES_PAR_FORMATION // 2, MODULES_PAR_FORMATION * 3 // 2))
+        sujets = aleatoire.sample(SUJETS, 3)
+        lecons = [
+            {
+                'lesson': f"{aleatoire.choice(SUJETS).title()} {sujets[0]} lesson {ordre}",
+                'duration': f"{aleatoire.choice((0.5, 1, 1.5, 2))}h",
+                'concepts': ', '.join(aleatoire.sample(SUJETS, 4)),
+            }
+            for ordre in range(1, nb_lecons + 1)
+        ]
+        cours.append({
+            'course_id': f"cours-{numero}",
+            'title': f"{sujets[0].title()} and {sujets[1]} {numero}",
+            'description': f"Learn {sujets[0]}, {sujets[1]} and {sujets[2]} with practical examples",
+            'domain': aleatoire.choice(DOMAINES),
+            'lessons': lecons,
+            'total_duration': f"{len(lecons)}h",
+            'level': aleatoire.choice(NIVEAUX),
+            'prerequisites': aleatoire.choice(('None', 'Python basics', 'SQL basics')),
+            'source': aleatoire.choice(SOURCES),
+        })
+        restants -= nb_lecons
+        numero += 1
+    return cours
+
+def generer_exercices(nb_modules, graine=GRAINE):
+    """Catégories d'exercices synthétiques (une pour 100 modules, au moins une)"""
+    aleatoire = random.Random(graine + 1)
+    return [
+        {
+            'category': f"{aleatoire.choice(SUJETS).title()} {numero}",
+            'level': aleatoire.choice(NIVEAUX),
+            'exercises': [
+                {
+                    'title': f"{aleatoire.choice(SUJETS).title()} exercise {rang}",
+                    'description': f"Write a function using {', '.join(aleatoire.sample(SUJETS, 3))}",
+                    'starter_code': 'def solution():\n    # Your code here\n    pass',
+                }
+                for rang in range(EXERCICES_PAR_CATEGORIE)
+            ],
+        }
+        for numero in range(max(1, nb_modules // 100))
+    ]
+
+def normaliser_cours_synthetique(course):
+    """Comme collecte_donnees.normaliser_cours_kaggle, avec le domaine et la source du cours"""
+    formation, modules = collecte_donnees.normaliser_cours_kaggle(course)
+    formation.update(domaine=course['domain'], source=course['source'])
+    return formation, ({**module, 'source': course['source']} for module in modules)
+
+def demandes_synthetiques(graine=GRAINE):
+    """Demandes de génération représentatives (chaque type de contenu, domaines et niveaux variés)"""
+    aleatoire = random.Random(graine + 2)
+    return [
+        {
+            'generation_type': generation_type,
+            'domaine': aleatoire.choice(DOMAINES),
+            'niveau': aleatoire.choice(NIVEAUX),
+            'duree': 6,
+            'format_sortie': 'Markdown',
+            'user_input': f"Un cours sur {' et '.join(aleatoire.sample(SUJETS, 2))}",
+        }
+        for generation_type in contexte_prompt.BUDGETS_PAR_TYPE
+    ]
+
+def agrandir_jeu_stress(nom, lignes, dossier, graine=GRAINE):
+    """Copie du jeu de données de stress tiré avec remise jusqu'à `lignes` lignes, écrite dans dossier"""
+    df = pd.read_csv(donnees_stress.chemin_csv(nom))
+    df.sample(n=lignes, replace=True, random_state=graine).to_csv(donnees_stress.chemin_csv(nom, dossier), index=False)
+
+# =============================================================================
+# 2. MESURES
+# =============================================================================
+
+def mesurer(etape, repetitions=1):
+    """
+    Exécute etape() `repetitions` fois pour le temps (médiane), puis une fois sous tracemalloc pour le pic
+    de mémoire Python. Retourne (mesure, résultat de la dernière exécution).
+    """
+    temps = []
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        resultat = etape()
+        temps.append(time.perf_counter() - debut)
+
+    tracemalloc.start()
+    try:
+        resultat = etape()
+        _, pic = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"temps_s": round(statistics.median(temps), 4), "memoire_mo": round(pic / 1024 ** 2, 2)}, resultat
+
+def executer_benchmark(taille, dossier, repetitions=1, afficher=print):
+    """Mesure toutes les étapes pour un catalogue de `taille` modules, dans le dossier de travail donné"""
+    resultats = {}
+
+    def etape(nom, fonction, prompt=None):
+        mesure, resultat = mesurer(fonction, repetitions)
+        if prompt is not None:
+            mesure.update(prompt(resultat))
+        resultats[nom] = mesure
+        afficher(f"   {nom:<22} {mesure['temps_s']:9.3f} s {mesure['memoire_mo']:9.1f} Mo"
+                 + (f" {mesure['prompt_caracteres']:9d} caractères" if 'prompt_caracteres' in mesure else ""))
+        return resultat
+
+    cours = generer_cours(taille)
+    exercices = generer_exercices(taille)
+    collecteurs.enregistrer("benchmark_formations", lambda client: cours, normaliser=normaliser_cours_synthetique)
+    collecteurs.enregistrer("benchmark_exercices", lambda client: exercices, genre="exercices")
+
+    def collecte():
+        # Collecte complète depuis un état vide, comme une première collecte
+        for fichier in os.listdir(dossier):
+            if fichier.startswith(base_catalogue.FICHIER_CATALOGUE):
+                os.remove(os.path.join(dossier, fichier))
+        with contextlib.redirect_stdout(io.StringIO()):
+            return collecte_donnees.collect_all_real_data(["benchmark_formations", "benchmark_exercices"])
+
+    try:
+        etape("collecte", collecte)
+    finally:
+        del collecteurs.COLLECTEURS["benchmark_formations"], collecteurs.COLLECTEURS["benchmark_exercices"]
+
+    formations_df, _, _ = etape("chargement_fichiers", noyau_pedagogique.lire_donnees_reelles)
+    base, _ = etape("chargement_base", lambda: noyau_pedagogique.ouvrir_base_catalogue())
+    etape("statistiques_base", base.statistiques)
+
+    demandes = demandes_synthetiques()
+    etape("filtrage_fichiers", lambda: [
+        noyau_pedagogique.filtrer_formations(formations_df, d['domaine'], d['niveau']) for d in demandes
+    ])
+    etape("filtrage_base", lambda: [base.filtrer_formations(d['domaine'], d['niveau']) for d in demandes])
+
+    def indexation():
+        if os.path.exists(index_catalogue.FICHIER_INDEX_BASE):
+            os.remove(index_catalogue.FICHIER_INDEX_BASE)
+        return index_catalogue.charger_ou_construire_index_base(base)
+
+    index = etape("index", indexation)
+    etape("recherche", lambda: [
+        index.rechercher(noyau_pedagogique.requete_index(d['user_input'], d['domaine'], d['niveau']), k=noyau_pedagogique.TOP_K_MODULES)
+        for d in demandes
+    ])
+
+    def preparations():
+        return [
+            noyau_pedagogique.preparer_generation_base(
+                index, base, d['generation_type'], d['domaine'], d['niveau'],
+                noyau_pedagogique.requete_index(d['user_input'], d['domaine'], d['niveau'])
+            )
+            for d in demandes
+        ]
+
+    preparations_demandes = etape("contexte", preparations, prompt=lambda preps: taille_prompt(
+        ["\n".join(p["contexte"].values()) for p in preps]
+    ))
+
+    prompt_template = ChatPromptTemplate.from_template(noyau_pedagogique.pedagogical_template_real)
+    llm = LLMBouchon(delai_secondes=0)
+
+    def generation():
+        prompts = []
+        for demande, preparation in zip(demandes, preparations_demandes):
+            variables = noyau_pedagogique.variables_prompt(
+                preparation, demande['generation_type'], demande['domaine'], demande['niveau'],
+                demande['duree'], demande['format_sortie'], demande['user_input']
+            )
+            prompt_value = prompt_template.format_prompt(**variables, chat_history="")
+            llm.invoke(prompt_value)
+            prompts.append(prompt_value.to_string())
+        return prompts
+
+    etape("generation", generation, prompt=taille_prompt)
+
+    dossier_stress = os.path.join(dossier, "stress")
+    os.makedirs(dossier_stress, exist_ok=True)
+    for nom in donnees_stress.JEUX_DE_DONNEES:
+        agrandir_jeu_stress(nom, taille, dossier_stress)
+
+    def conversion_stress():
+        return [donnees_stress.convertir(nom, dossier_stress) for nom in donnees_stress.JEUX_DE_DONNEES]
+
+    etape("conversion_stress", conversion_stress)
+    etape("chargement_stress", lambda: donnees_stress.charger_tout(dossier_stress))
+    return resultats
+
+def taille_prompt(textes):
+    """Taille moyenne des prompts (caractères et tokens estimés)"""
+    caracteres = round(statistics.mean(len(texte) for texte in textes)) if textes else 0
+    return {"prompt_caracteres": caracteres, "prompt_tokens": contexte_prompt.estimer_tokens("x" * caracteres)}
+
+# =============================================================================
+# 3. COMPARAISON À LA RÉFÉRENCE
+# =============================================================================
+
+def charger_reference(chemin=FICHIER_REFERENCE):
+    if not os.path.exists(chemin):
+        return {}
+    with open(chemin, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def comparer(resultats, reference, tolerance_temps=TOLERANCE_TEMPS):
+    """
+    Compare les mesures à la référence (mêmes tailles et étapes).
+    Retourne la liste des régressions (taille, étape, grandeur, valeur, référence).
+    """
+    regressions = []
+    for taille, etapes in resultats.items():
+        for nom, mesure in etapes.items():
+            ref = reference.get(str(taille), {}).get(nom)
+            if ref is None:
+                continue
+            controles = (
+                ("temps_s", tolerance_temps, ECART_TEMPS_MIN_S),
+                ("memoire_mo", TOLERANCE_MEMOIRE, ECART_MEMOIRE_MIN_MO),
+                ("prompt_caracteres", TOLERANCE_PROMPT, 0),
+            )
+            for grandeur, tolerance, ecart_min in controles:
+                if grandeur not in mesure or grandeur not in ref:
+                    continue
+                if mesure[grandeur] > ref[grandeur] * (1 + tolerance) and mesure[grandeur] - ref[grandeur] > ecart_min:
+                    regressions.append((taille, nom, grandeur, mesure[grandeur], ref[grandeur]))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks hors-ligne des chemins critiques de l'agent pédagogique")
+    parser.add_argument("--tailles", type=int, nargs="+", default=list(TAILLES), help="Nombres de modules du catalogue synthétique")
+    parser.add_argument("--repetitions", type=int, default=1, help="Exécutions par étape pour la médiane du temps")
+    parser.add_argument("--reference", default=FICHIER_REFERENCE, help="Fichier JSON des mesures de référence")
+    parser.add_argument("--enregistrer", action="store_true", help="Enregistrer ces mesures comme référence")
+    parser.add_argument("--tolerance-temps", type=float, default=TOLERANCE_TEMPS, help="Dépassement de temps toléré (0.5 = +50 %%)")
+    parser.add_argument("--json", help="Écrire les mesures dans ce fichier JSON")
+    arguments = parser.parse_args()
+    chemin_reference = os.path.abspath(arguments.reference)
+    chemin_json = os.path.abspath(arguments.json) if arguments.json else None
+
+    resultats = {}
+    dossier_initial = os.getcwd()
+    for taille in arguments.tailles:
+        print(f"\n⏱️ Catalogue synthétique de {taille} modules")
+        # Les scripts lisent et écrivent dans le dossier courant : chaque taille a son dossier de travail
+        dossier = tempfile.mkdtemp(prefix=f"benchmark_{taille}_")
+        os.chdir(dossier)
+        try:
+            resultats[str(taille)] = executer_benchmark(taille, dossier, arguments.repetitions)
+        finally:
+            os.chdir(dossier_initial)
+            shutil.rmtree(dossier, ignore_errors=True)
+
+    if chemin_json:
+        with open(chemin_json, 'w', encoding='utf-8') as f:
+            json.dump(resultats, f, ensure_ascii=False, indent=2)
+
+    if arguments.enregistrer:
+        reference = charger_reference(chemin_reference)
+        reference.update(resultats)
+        with open(chemin_reference, 'w', encoding='utf-8') as f:
+            json.dump(reference, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Référence enregistrée dans '{chemin_reference}'")
+        sys.exit(0)
+
+    reference = charger_reference(chemin_reference)
+    if not reference:
+        print(f"\n⚠️ Pas de référence dans '{chemin_reference}' : relancez avec --enregistrer pour en créer une")
+        sys.exit(0)
+    regressions = comparer(resultats, reference, arguments.tolerance_temps)
+    for taille, nom, grandeur, valeur, ref in regressions:
+        print(f"❌ {taille} modules, {nom} : {grandeur} = {valeur} (référence {ref})")
+    if not regressions:
+        print("\n✅ Aucune régression par rapport à la référence")
+    sys.exit(1 if regressions else 0)
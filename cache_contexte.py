@@ -0,0 +1,78 @@
+"""
+Cache LRU en mémoire des contextes de prompt déjà mis en forme
+Évite de relire la base et de refaire la sérialisation quand ni le contenu des enregistrements
+sélectionnés (empreinte de la sélection, voir noyau_pedagogique.selectionner) ni les paramètres de
+génération n'ont changé.
+"""
+
+import threading
+from collections import OrderedDict
+
+# Taille maximale par défaut du cache (octets de texte mis en forme)
+TAILLE_MAX_OCTETS = 16 * 1024 * 1024
+
+
+def taille_valeur(valeur):
+    """Estime la taille en octets d'une valeur mise en cache (chaînes, nombres, listes, dictionnaires)"""
+    if isinstance(valeur, str):
+        return len(valeur.encode('utf-8'))
+    if isinstance(valeur, dict):
+        return sum(taille_valeur(k) + taille_valeur(v) for k, v in valeur.items())
+    if isinstance(valeur, (list, tuple)):
+        return sum(taille_valeur(v) for v in valeur)
+    return 8
+
+
+class CacheLRU:
+    """Cache LRU thread-safe borné en octets, avec compteurs de hits et de misses"""
+
+    def __init__(self, taille_max_octets=TAILLE_MAX_OCTETS):
+        self.taille_max_octets = taille_max_octets
+        self._entrees = OrderedDict()
+        self._taille = 0
+        self._verrou = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def obtenir(self, cle):
+        """Retourne la valeur associée à la clé, ou None si elle n'est pas en cache"""
+        with self._verrou:
+            entree = self._entrees.get(cle)
+            if entree is None:
+                self.misses += 1
+                return None
+            self._entrees.move_to_end(cle)
+            self.hits += 1
+            return entree[0]
+
+    def ajouter(self, cle, valeur, taille=None):
+        """Ajoute une valeur en évinçant les entrées les moins récemment utilisées si besoin"""
+        taille = taille_valeur(valeur) if taille is None else taille
+        if taille > self.taille_max_octets:
+            return
+        with self._verrou:
+            if cle in self._entrees:
+                self._taille -= self._entrees.pop(cle)[1]
+            self._entrees[cle] = (valeur, taille)
+            self._taille += taille
+            while self._taille > self.taille_max_octets:
+                _, (_, taille_evincee) = self._entrees.popitem(last=False)
+                self._taille -= taille_evincee
+
+    def vider(self):
+        """Vide le cache (les compteurs sont conservés)"""
+        with self._verrou:
+            self._entrees.clear()
+            self._taille = 0
+
+    def statistiques(self):
+        """Retourne les compteurs du cache"""
+        with self._verrou:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "taux_hit": self.hits / total if total else 0.0,
+                "entrees": len(self._entrees),
+                "octets": self._taille,
+            }
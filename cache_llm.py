@@ -0,0 +1,166 @@
+"""
+Cache persistant (SQLite) des réponses du LLM
+Une requête identique (même modèle, même température, même prompt rendu) est servie depuis le disque
+au lieu de rappeler Gemini. Le fichier est partagé entre les sessions Streamlit et entre les processus.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+
+FICHIER_CACHE_LLM = 'cache_llm.db'
+
+# Durée de vie des réponses et taille maximale du cache par défaut
+TTL_SECONDES = 7 * 24 * 3600
+TAILLE_MAX_OCTETS = 100 * 1024 * 1024
+
+
+def normaliser_prompt(prompt):
+    """Normalise les blancs du prompt pour que des rendus équivalents partagent la même clé"""
+    return ' '.join(prompt.split())
+
+def cle_requete(modele, temperature, prompt):
+    """Clé de cache : hash SHA-256 du modèle, de la température et du prompt normalisé"""
+    contenu = json.dumps(
+        [str(modele).strip().lower(), round(float(temperature or 0.0), 3), normaliser_prompt(prompt)],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(contenu.encode('utf-8')).hexdigest()
+
+def cle_depuis_llm_string(prompt, llm_string):
+    """
+    Clé de cache à partir des arguments d'un cache LangChain.
+    llm_string est la sérialisation JSON du modèle suivie de '---' et des paramètres d'appel (stop, ...).
+    """
+    serialisation, _, parametres_appel = llm_string.partition('---')
+    try:
+        kwargs = json.loads(serialisation).get('kwargs', {})
+        modele, temperature = kwargs['model'], kwargs.get('temperature', 0.0)
+    except (ValueError, KeyError, AttributeError):
+        modele, temperature, parametres_appel = llm_string, 0.0, ''
+    return cle_requete(modele, temperature, f"{prompt}---{parametres_appel}")
+
+
+class CacheReponsesSQLite:
+    """Cache clé -> réponse texte sur SQLite, avec expiration (TTL) et éviction LRU par taille"""
+
+    def __init__(self, chemin=FICHIER_CACHE_LLM, ttl_secondes=TTL_SECONDES, taille_max_octets=TAILLE_MAX_OCTETS):
+        self.chemin = chemin
+        self.ttl_secondes = ttl_secondes
+        self.taille_max_octets = taille_max_octets
+        self._local = threading.local()
+        self._verrou = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        connexion = self._connexion()
+        connexion.execute("PRAGMA journal_mode=WAL")
+        connexion.execute("""
+            CREATE TABLE IF NOT EXISTS reponses (
+                cle TEXT PRIMARY KEY,
+                reponse TEXT NOT NULL,
+                taille INTEGER NOT NULL,
+                cree_le REAL NOT NULL,
+                dernier_acces REAL NOT NULL
+            )
+        """)
+        connexion.execute("CREATE INDEX IF NOT EXISTS idx_reponses_cree_le ON reponses(cree_le)")
+        connexion.execute("CREATE INDEX IF NOT EXISTS idx_reponses_dernier_acces ON reponses(dernier_acces)")
+        connexion.commit()
+
+    def _connexion(self):
+        """Une connexion SQLite par thread (les threads de script Streamlit ne partagent pas de connexion)"""
+        connexion = getattr(self._local, 'connexion', None)
+        if connexion is None:
+            connexion = sqlite3.connect(self.chemin, timeout=30)
+            self._local.connexion = connexion
+        return connexion
+
+    def obtenir(self, cle):
+        """Retourne la réponse en cache pour la clé, ou None si absente ou expirée"""
+        connexion = self._connexion()
+        maintenant = time.time()
+        ligne = connexion.execute(
+            "SELECT reponse FROM reponses WHERE cle = ? AND cree_le >= ?",
+            (cle, maintenant - self.ttl_secondes)
+        ).fetchone()
+        with self._verrou:
+            if ligne is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        connexion.execute("UPDATE reponses SET dernier_acces = ? WHERE cle = ?", (maintenant, cle))
+        connexion.commit()
+        return ligne[0]
+
+    def enregistrer(self, cle, reponse):
+        """Enregistre une réponse puis applique l'expiration et la limite de taille"""
+        connexion = self._connexion()
+        maintenant = time.time()
+        connexion.execute(
+            "INSERT OR REPLACE INTO reponses (cle, reponse, taille, cree_le, dernier_acces) VALUES (?, ?, ?, ?, ?)",
+            (cle, reponse, len(reponse.encode('utf-8')), maintenant, maintenant)
+        )
+        self._evincer(connexion, maintenant)
+        connexion.commit()
+
+    def _evincer(self, connexion, maintenant):
+        """Supprime les réponses expirées, puis les moins récemment utilisées au-delà de la taille maximale"""
+        connexion.execute("DELETE FROM reponses WHERE cree_le < ?", (maintenant - self.ttl_secondes,))
+        taille_totale = connexion.execute("SELECT COALESCE(SUM(taille), 0) FROM reponses").fetchone()[0]
+        if taille_totale <= self.taille_max_octets:
+            return
+        a_liberer = taille_totale - self.taille_max_octets
+        cles = []
+        for cle, taille in connexion.execute("SELECT cle, taille FROM reponses ORDER BY dernier_acces"):
+            cles.append((cle,))
+            a_liberer -= taille
+            if a_liberer <= 0:
+                break
+        connexion.executemany("DELETE FROM reponses WHERE cle = ?", cles)
+
+    def vider(self):
+        """Supprime toutes les réponses en cache"""
+        connexion = self._connexion()
+        connexion.execute("DELETE FROM reponses")
+        connexion.commit()
+
+    def statistiques(self):
+        """Compteurs du processus courant et occupation du fichier partagé"""
+        entrees, octets = self._connexion().execute(
+            "SELECT COUNT(*), COALESCE(SUM(taille), 0) FROM reponses"
+        ).fetchone()
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "taux_hit": self.hits / total if total else 0.0,
+            "entrees": entrees,
+            "octets": octets,
+        }
+
+
+class CacheLangChain(BaseCache):
+    """
+    Adaptateur LangChain autour de CacheReponsesSQLite, à installer avec set_llm_cache().
+    Toutes les invocations de ChatGoogleGenerativeAI (y compris via LLMChain) passent alors par le cache.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def lookup(self, prompt, llm_string):
+        reponse = self.cache.obtenir(cle_depuis_llm_string(prompt, llm_string))
+        if reponse is None:
+            return None
+        return loads(reponse, valid_namespaces=["langchain_google_genai"])
+
+    def update(self, prompt, llm_string, return_val):
+        self.cache.enregistrer(cle_depuis_llm_string(prompt, llm_string), dumps(list(return_val)))
+
+    def clear(self, **kwargs):
+        self.cache.vider()
@@ -0,0 +1,232 @@
+"""
+Cache sémantique des demandes de génération pédagogique
+Une demande formulée différemment mais équivalente à une demande passée (mêmes paramètres de génération,
+texte suffisamment proche) est servie avec le contenu déjà généré, sans appeler le LLM, tant que les
+enregistrements du catalogue dont ce contenu a été généré (ses dépendances) n'ont pas changé.
+Les demandes sont vectorisées localement (hachage de mots et de trigrammes de caractères).
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import zlib
+import numpy as np
+from index_catalogue import tokeniser
+
+FICHIER_CACHE_SEMANTIQUE = 'cache_semantique.db'
+
+# Dimension des vecteurs de hachage et seuil de similarité cosinus par défaut. En dessous de 0.95, des
+# demandes différentes se confondent : « quiz ML » / « quiz DL » (0.86), « sans » / « avec exercices » (0.89-0.93)
+DIMENSION = 1024
+SEUIL_DEFAUT = 0.95
+# Durée de vie d'un contenu en cache et nombre maximal de demandes conservées
+TTL_SECONDES = 7 * 24 * 3600
+MAX_DEMANDES = 5000
+
+# Termes équivalents dans les demandes pédagogiques
+SYNONYMES = {
+    'formation': 'cours', 'formations': 'cours', 'lecon': 'module', 'lecons': 'module', 'modules': 'module',
+    'exercice': 'exercices', 'quizz': 'quiz', 'questionnaire': 'quiz', 'programme': 'plan',
+    'debutant': 'beginner', 'debutants': 'beginner', 'intermediaire': 'intermediate', 'avance': 'advanced',
+}
+
+
+def _indice(texte):
+    """Indice de hachage stable (indépendant de PYTHONHASHSEED)"""
+    return zlib.crc32(texte.encode('utf-8')) % DIMENSION
+
+def vectoriser(texte):
+    """Vecteur float32 normalisé combinant les mots (poids 2) et les trigrammes de caractères"""
+    vecteur = np.zeros(DIMENSION, dtype=np.float32)
+    mots = [SYNONYMES.get(mot, mot) for mot in tokeniser(texte)]
+    for mot in mots:
+        vecteur[_indice('m:' + mot)] += 2.0
+    for mot in mots:
+        mot = f" {mot} "
+        for i in range(len(mot) - 2):
+            vecteur[_indice('t:' + mot[i:i + 3])] += 1.0
+    norme = np.linalg.norm(vecteur)
+    return vecteur / norme if norme else vecteur
+
+def cle_parametres(generation_type, domaine, niveau, duree, format_sortie):
+    """Seules les demandes avec exactement les mêmes paramètres de génération sont comparées"""
+    return json.dumps([generation_type, domaine, niveau, int(duree), format_sortie], ensure_ascii=False)
+
+
+class CacheSemantique:
+    """
+    Index vectoriel des demandes passées, persisté dans SQLite et regroupé par paramètres de génération,
+    avec expiration (TTL) et éviction des demandes les moins récemment servies au-delà de max_demandes
+    """
+
+    def __init__(self, chemin=FICHIER_CACHE_SEMANTIQUE, seuil=SEUIL_DEFAUT, ttl_secondes=TTL_SECONDES,
+                 max_demandes=MAX_DEMANDES):
+        self.chemin = chemin
+        self.seuil = seuil
+        self.ttl_secondes = ttl_secondes
+        self.max_demandes = max_demandes
+        self._local = threading.local()
+        self._verrou = threading.Lock()
+        self._groupes = {}  # cle_parametres -> (matrice des vecteurs, liste des ids, dates de création)
+        self._dernier_id = 0
+        self.hits = 0
+        self.misses = 0
+
+        connexion = self._connexion()
+        connexion.execute("PRAGMA journal_mode=WAL")
+        connexion.execute("""
+            CREATE TABLE IF NOT EXISTS demandes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                parametres TEXT NOT NULL,
+                demande TEXT NOT NULL,
+                vecteur BLOB NOT NULL,
+                course_data TEXT NOT NULL,
+                cree_le REAL NOT NULL,
+                dernier_acces REAL NOT NULL DEFAULT 0,
+                dependances TEXT
+            )
+        """)
+        colonnes = [colonne[1] for colonne in connexion.execute("PRAGMA table_info(demandes)")]
+        if "dernier_acces" not in colonnes:
+            connexion.execute("ALTER TABLE demandes ADD COLUMN dernier_acces REAL NOT NULL DEFAULT 0")
+        if "dependances" not in colonnes:
+            connexion.execute("ALTER TABLE demandes ADD COLUMN dependances TEXT")
+        connexion.execute("CREATE INDEX IF NOT EXISTS idx_demandes_parametres ON demandes(parametres)")
+        connexion.execute("CREATE INDEX IF NOT EXISTS idx_demandes_dernier_acces ON demandes(dernier_acces)")
+        connexion.commit()
+
+    def _connexion(self):
+        """Une connexion SQLite par thread (les threads de script Streamlit ne partagent pas de connexion)"""
+        connexion = getattr(self._local, 'connexion', None)
+        if connexion is None:
+            connexion = sqlite3.connect(self.chemin, timeout=30)
+            self._local.connexion = connexion
+        return connexion
+
+    def _rafraichir(self):
+        """Charge les demandes ajoutées depuis le dernier chargement (y compris par d'autres processus)"""
+        lignes = self._connexion().execute(
+            "SELECT id, parametres, vecteur, cree_le FROM demandes WHERE id > ? ORDER BY id", (self._dernier_id,)
+        ).fetchall()
+        nouveaux = {}
+        for id_demande, parametres, vecteur, cree_le in lignes:
+            nouveaux.setdefault(parametres, ([], [], []))
+            nouveaux[parametres][0].append(np.frombuffer(vecteur, dtype=np.float32))
+            nouveaux[parametres][1].append(id_demande)
+            nouveaux[parametres][2].append(cree_le)
+            self._dernier_id = id_demande
+        for parametres, (vecteurs, ids, dates) in nouveaux.items():
+            matrice, ids_existants, dates_existantes = self._groupes.get(
+                parametres, (np.empty((0, DIMENSION), dtype=np.float32), [], np.empty(0))
+            )
+            self._groupes[parametres] = (
+                np.vstack([matrice, np.stack(vecteurs)]), ids_existants + ids, np.concatenate([dates_existantes, dates])
+            )
+
+    def _retirer(self, ids_retires):
+        """Retire de l'index en mémoire des demandes supprimées de la base"""
+        ids_retires = set(ids_retires)
+        for parametres, (matrice, ids, dates) in list(self._groupes.items()):
+            garder = [i for i, id_demande in enumerate(ids) if id_demande not in ids_retires]
+            if len(garder) == len(ids):
+                continue
+            if garder:
+                self._groupes[parametres] = (matrice[garder], [ids[i] for i in garder], dates[garder])
+            else:
+                del self._groupes[parametres]
+
+    def rechercher(self, demande, parametres, seuil=None, valider=None):
+        """
+        Cherche la demande passée la plus proche avec les mêmes paramètres, parmi celles qui n'ont pas expiré.
+        valider(dependances) : appelé pour chaque candidate enregistrée avec des dépendances, de la plus proche à la
+        moins proche ; une candidate refusée (catalogue changé depuis) est supprimée et la suivante est essayée.
+        Retourne un dictionnaire (similarite, demande d'origine, course_data, cree_le) ou None.
+        """
+        seuil = self.seuil if seuil is None else seuil
+        maintenant = time.time()
+        with self._verrou:
+            self._rafraichir()
+            matrice, ids, dates = self._groupes.get(parametres, (None, [], None))
+            candidates = []
+            if ids:
+                similarites = np.where(dates >= maintenant - self.ttl_secondes, matrice @ vectoriser(demande), -1.0)
+                candidates = [(ids[i], float(similarites[i])) for i in np.argsort(-similarites, kind='stable')
+                              if similarites[i] >= seuil]
+
+        # Validation hors du verrou : elle peut interroger le catalogue
+        connexion = self._connexion()
+        retires, resultat = [], None
+        for id_demande, similarite in candidates:
+            ligne = connexion.execute(
+                "SELECT demande, course_data, cree_le, dependances FROM demandes WHERE id = ?", (id_demande,)
+            ).fetchone()
+            # Évincée par un autre processus, ou générée à partir d'enregistrements qui ont changé
+            if ligne is None or (valider and ligne[3] is not None and not valider(json.loads(ligne[3]))):
+                retires.append(id_demande)
+                continue
+            demande_origine, course_data, cree_le, _ = ligne
+            resultat = {
+                "similarite": similarite,
+                "demande_origine": demande_origine,
+                "course_data": json.loads(course_data),
+                "cree_le": cree_le,
+            }
+            connexion.execute("UPDATE demandes SET dernier_acces = ? WHERE id = ?", (maintenant, id_demande))
+            break
+        connexion.executemany("DELETE FROM demandes WHERE id = ?", [(i,) for i in retires])
+        connexion.commit()
+
+        with self._verrou:
+            if retires:
+                self._retirer(retires)
+            if resultat:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return resultat
+
+    def ajouter(self, demande, parametres, course_data, dependances=None):
+        """
+        Enregistre une demande et le contenu généré correspondant, puis applique l'expiration et la limite de taille.
+        dependances : données JSON transmises à valider() par rechercher() (sélection du catalogue utilisée)
+        """
+        vecteur = vectoriser(demande)
+        connexion = self._connexion()
+        maintenant = time.time()
+        connexion.execute(
+            """INSERT INTO demandes (parametres, demande, vecteur, course_data, cree_le, dernier_acces, dependances)
+               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            (parametres, demande, vecteur.tobytes(), json.dumps(course_data, ensure_ascii=False), maintenant, maintenant,
+             json.dumps(dependances, ensure_ascii=False) if dependances is not None else None)
+        )
+        retires = self._evincer(connexion, maintenant)
+        connexion.commit()
+        if retires:
+            with self._verrou:
+                self._retirer(retires)
+
+    def _evincer(self, connexion, maintenant):
+        """Supprime les demandes expirées, puis les moins récemment servies au-delà de max_demandes ; retourne leurs ids"""
+        retires = [l[0] for l in connexion.execute(
+            "SELECT id FROM demandes WHERE cree_le < ?", (maintenant - self.ttl_secondes,)
+        )]
+        excedent = connexion.execute("SELECT COUNT(*) FROM demandes").fetchone()[0] - len(retires) - self.max_demandes
+        if excedent > 0:
+            retires += [l[0] for l in connexion.execute(
+                "SELECT id FROM demandes WHERE cree_le >= ? ORDER BY dernier_acces, id LIMIT ?",
+                (maintenant - self.ttl_secondes, excedent)
+            )]
+        connexion.executemany("DELETE FROM demandes WHERE id = ?", [(i,) for i in retires])
+        return retires
+
+    def statistiques(self):
+        """Compteurs du processus courant"""
+        with self._verrou:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "taux_hit": self.hits / total if total else 0.0,
+                "demandes": sum(len(ids) for _, ids, _ in self._groupes.values()),
+            }
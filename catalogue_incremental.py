@@ -0,0 +1,171 @@
+"""
+Rafraîchissement incrémental du catalogue collecté
+Chaque enregistrement (formation, module, catégorie d'exercices) est identifié par une clé naturelle
+(source + titre, ...) et une empreinte SHA-256 de son contenu, conservées dans catalogue.db. Les
+identifiants formation_id / module_id restent ainsi stables d'une collecte à l'autre, seuls les
+enregistrements ajoutés, modifiés ou supprimés sont réécrits dans les tables du catalogue, et chaque
+collecte qui change quelque chose enregistre une version avec le décompte de ces changements.
+Chaque empreinte retient le collecteur qui l'a produite : une collecte limitée à certaines sources ne
+supprime que les enregistrements disparus de ces sources. Les tables indexées de base_catalogue, dans le
+même fichier, sont mises à jour dans la même transaction que l'état.
+"""
+
+import hashlib
+import json
+import sqlite3
+import time
+
+FICHIER_CATALOGUE = 'catalogue.db'
+
+GENRES = ("formations", "modules", "exercices")
+
+
+def empreinte(contenu):
+    """Empreinte du contenu d'un enregistrement (indépendante de l'ordre des clés)"""
+    return hashlib.sha256(json.dumps(contenu, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')).hexdigest()
+
+def cle_formation(formation):
+    return f"{formation.get('source')}|{formation.get('titre')}"
+
+def cle_exercices(categorie):
+    return f"{categorie.get('category')}|{categorie.get('level')}"
+
+
+class EtatCatalogue:
+    """
+    Clés, identifiants et empreintes des enregistrements de la dernière collecte.
+    Usage : commencer(), enregistrer(...) pour chaque enregistrement collecté, puis terminer(sources) qui
+    détecte les suppressions et retourne le décompte des changements, ou annuler() si la collecte a échoué.
+    connexion : connexion à partager (les tables du catalogue sont alors mises à jour dans la même transaction) ;
+    observateur(genre, statut, valeur) : appelé pour chaque ajout, modification (valeur = enregistrement) et
+    suppression (valeur = identifiant ou clé), avant la validation.
+    """
+
+    def __init__(self, chemin=FICHIER_CATALOGUE, connexion=None, observateur=None):
+        self._proprietaire = connexion is None
+        self.connexion = connexion or sqlite3.connect(chemin, timeout=30)
+        self.observateur = observateur
+        self.connexion.execute("PRAGMA journal_mode=WAL")
+        self.connexion.execute("""
+            CREATE TABLE IF NOT EXISTS empreintes (
+                genre TEXT NOT NULL,
+                cle TEXT NOT NULL,
+                id INTEGER,
+                empreinte TEXT NOT NULL,
+                collecte INTEGER NOT NULL,
+                source TEXT,
+                PRIMARY KEY (genre, cle)
+            )
+        """)
+        # État créé avant le suivi des sources : ses lignes (source NULL) n'expirent qu'avec une collecte complète
+        if "source" not in [colonne[1] for colonne in self.connexion.execute("PRAGMA table_info(empreintes)")]:
+            self.connexion.execute("ALTER TABLE empreintes ADD COLUMN source TEXT")
+        self.connexion.execute("CREATE INDEX IF NOT EXISTS idx_empreintes_collecte ON empreintes(genre, collecte)")
+        self.connexion.execute("CREATE TABLE IF NOT EXISTS compteurs (genre TEXT PRIMARY KEY, prochain_id INTEGER NOT NULL)")
+        self.connexion.execute("""
+            CREATE TABLE IF NOT EXISTS versions (
+                version INTEGER PRIMARY KEY,
+                cree_le REAL NOT NULL,
+                resume TEXT NOT NULL
+            )
+        """)
+        self.connexion.commit()
+        self.version = None
+
+    def version_courante(self):
+        return self.connexion.execute("SELECT COALESCE(MAX(version), 0) FROM versions").fetchone()[0]
+
+    def commencer(self):
+        """
+        Ouvre une collecte : tous les enregistrements vus sont marqués du numéro de collecte, ceux qui ne le sont
+        pas à la fin ont disparu. La version publiée n'avance que si la collecte change quelque chose.
+        """
+        precedente = self.version_courante()
+        self.version = precedente + 1
+        self.collecte = self._allouer_id("collectes")
+        # Première collecte : tout le catalogue est écrit
+        self.complet = precedente == 0
+        self.compte = {genre: {"ajoutes": 0, "modifies": 0, "supprimes": 0, "inchanges": 0} for genre in GENRES}
+
+    def _allouer_id(self, genre):
+        ligne = self.connexion.execute("SELECT prochain_id FROM compteurs WHERE genre = ?", (genre,)).fetchone()
+        identifiant = ligne[0] if ligne else 1
+        self.connexion.execute("INSERT OR REPLACE INTO compteurs (genre, prochain_id) VALUES (?, ?)", (genre, identifiant + 1))
+        return identifiant
+
+    def enregistrer(self, genre, cle, contenu, champ_id=None, source=None):
+        """
+        Rapproche un enregistrement collecté de l'état précédent. Retourne l'enregistrement complété de son
+        identifiant stable (champ_id), nouveau s'il s'agit d'un ajout. Les identifiants supprimés ne sont jamais réutilisés.
+        source : nom du collecteur qui a produit l'enregistrement (portée des suppressions de terminer())
+        """
+        valeur = empreinte(contenu)
+        ligne = self.connexion.execute(
+            "SELECT id, empreinte FROM empreintes WHERE genre = ? AND cle = ?", (genre, cle)
+        ).fetchone()
+        if ligne is None:
+            identifiant = self._allouer_id(genre) if champ_id else None
+            self.connexion.execute(
+                "INSERT INTO empreintes (genre, cle, id, empreinte, collecte, source) VALUES (?, ?, ?, ?, ?, ?)",
+                (genre, cle, identifiant, valeur, self.collecte, source)
+            )
+            statut = "ajoutes"
+        else:
+            identifiant = ligne[0]
+            statut = "inchanges" if ligne[1] == valeur else "modifies"
+            self.connexion.execute(
+                "UPDATE empreintes SET empreinte = ?, collecte = ?, source = ? WHERE genre = ? AND cle = ?",
+                (valeur, self.collecte, source, genre, cle)
+            )
+
+        enregistrement = {champ_id: identifiant, **contenu} if champ_id else contenu
+        self.compte[genre][statut] += 1
+        if statut != "inchanges" and self.observateur:
+            self.observateur(genre, statut, enregistrement)
+        return enregistrement
+
+    def terminer(self, sources=None):
+        """
+        Détecte les enregistrements disparus, valide l'état et retourne la version publiée avec le décompte
+        des changements par genre (None si rien n'a changé).
+        sources : collecteurs exécutés jusqu'au bout par cette collecte ; seuls leurs enregistrements non revus
+        sont supprimés. None : collecte complète, tout enregistrement non revu est supprimé.
+        """
+        if sources is None:
+            portee, parametres_portee = "", []
+        else:
+            sources = list(sources)
+            portee, parametres_portee = f" AND source IN ({', '.join('?' * len(sources))})", sources
+        for genre in GENRES:
+            parametres = [genre, self.collecte, *parametres_portee]
+            disparus = self.connexion.execute(
+                f"SELECT cle, id FROM empreintes WHERE genre = ? AND collecte < ?{portee}", parametres
+            ).fetchall()
+            self.connexion.execute(f"DELETE FROM empreintes WHERE genre = ? AND collecte < ?{portee}", parametres)
+            self.compte[genre]["supprimes"] = len(disparus)
+            if self.observateur:
+                # Formations et modules sont supprimés par identifiant, les catégories d'exercices par clé
+                for cle, identifiant in disparus:
+                    self.observateur(genre, "supprimes", identifiant if identifiant is not None else cle)
+
+        change = self.complet or any(
+            self.compte[genre][statut] for genre in GENRES for statut in ("ajoutes", "modifies", "supprimes")
+        )
+        if not change:
+            self.connexion.commit()
+            return None
+
+        self.connexion.execute(
+            "INSERT INTO versions (version, cree_le, resume) VALUES (?, ?, ?)",
+            (self.version, time.time(), json.dumps(self.compte))
+        )
+        self.connexion.commit()
+        return {"version": self.version, "complet": self.complet, "resume": self.compte}
+
+    def annuler(self):
+        """Abandonne la collecte en cours : l'état et les tables du catalogue restent ceux de la collecte précédente"""
+        self.connexion.rollback()
+
+    def fermer(self):
+        if self._proprietaire:
+            self.connexion.close()
@@ -0,0 +1,335 @@
+"""
+Test de charge multi-sessions de l'agent pédagogique (agent_donnees_reelles.py)
+N sessions simulées exécutent chacune le parcours de génération de l'application, sans navigateur
+(streamlit.testing), en parallèle dans un même processus : caches, base du catalogue et clients LLM sont
+partagés comme sur une instance déployée. Les appels au LLM partent vers le serveur de rejeu local
+(serveur_rejeu.py), qui renvoie des réponses enregistrées avec leur latence réelle.
+
+Le rapport donne les latences de bout en bout (p50/p95/p99), le débit, et la croissance de la mémoire :
+celle du processus par session, et celle de l'état de chaque session (historique, generated_courses)
+au fil des générations.
+
+Usage : python charge_agent.py --sessions 20 --generations 3 [--cassette cassette_llm.jsonl] [--json rapport.json]
+"""
+
+import argparse
+import atexit
+import json
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import streamlit as st
+from streamlit import config
+from streamlit.runtime import Runtime
+from streamlit.runtime.scriptrunner import magic
+from streamlit.runtime.secrets import Secrets
+from streamlit.testing.v1 import AppTest
+import base_catalogue
+import index_catalogue
+import serveur_rejeu
+
+APPLICATION = os.path.join(os.path.dirname(os.path.abspath(__file__)), "agent_donnees_reelles.py")
+DELAI_EXECUTION_S = 600
+# Seuil du cache sémantique pendant le test : 1.0 = seules les demandes identiques sont resservies
+SEUIL_SEMANTIQUE = 1.0
+
+SUJETS = ['Python', 'Pandas', 'NumPy', 'SQL', 'Machine Learning', 'visualisation', 'statistiques', 'API REST',
+          'tests unitaires', 'classes', 'fonctions', 'boucles', 'dictionnaires', 'régression', 'clustering']
+FORMULATIONS = [
+    "Crée un cours complet sur {} et {} pour un groupe de {} apprenants",
+    "Génère un quiz de {} questions sur {} et {}",
+    "Propose des exercices pratiques sur {} en lien avec {} (séance {})",
+    "Un plan de formation {} puis {} sur {} semaines",
+]
+
+# =============================================================================
+# 0. SESSIONS SIMULÉES EN PARALLÈLE
+# =============================================================================
+
+# AppTest exécute une session à la fois : chaque exécution installe puis remet à zéro des globales de Streamlit
+# (runtime simulé, st.secrets, option global.appTest), ce qui casse les sessions qui s'exécutent au même moment.
+# Ces globales sont fixées une fois pour tout le test de charge.
+_verrou = threading.Lock()
+_runtime = {}
+_instance_runtime = Runtime.instance.__func__
+
+def _instance_partagee(cls):
+    """Runtime simulé de l'exécution en cours, ou à défaut le dernier installé par une autre session"""
+    instance = cls._instance
+    if instance is not None:
+        _runtime["dernier"] = instance
+        return instance
+    if "dernier" in _runtime:
+        return _runtime["dernier"]
+    return _instance_runtime(cls)
+
+# ast.parse n'est pas sûr entre threads en CPython 3.11 (« AST constructor recursion depth mismatch ») :
+# la compilation du script par chaque session simulée est sérialisée
+_add_magic = magic.add_magic
+
+def _add_magic_serialise(code, script_path):
+    with _verrou:
+        return _add_magic(code, script_path)
+
+def preparer_sessions_paralleles(secrets):
+    Runtime.instance = classmethod(_instance_partagee)
+    Runtime.exists = classmethod(lambda cls: cls._instance is not None or "dernier" in _runtime)
+    magic.add_magic = _add_magic_serialise
+    st.secrets = Secrets()
+    st.secrets._secrets = dict(secrets)
+    config.set_option("global.appTest", True)
+
+# =============================================================================
+# 1. MESURES
+# =============================================================================
+
+def centiles(valeurs, rangs=(50, 95, 99)):
+    if not valeurs:
+        return {f"p{r}": None for r in rangs}
+    return {f"p{r}": round(float(np.percentile(valeurs, r)), 3) for r in rangs}
+
+def memoire_processus_mo():
+    """Mémoire résidente actuelle du processus (Linux : /proc), sinon pic de mémoire résidente"""
+    try:
+        with open("/proc/self/statm", 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except (OSError, ValueError, AttributeError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def taille_profonde(objet, vus=None):
+    """Taille en octets d'un objet et de ce qu'il contient (conteneurs, chaînes, attributs d'objets)"""
+    vus = set() if vus is None else vus
+    if id(objet) in vus:
+        return 0
+    vus.add(id(objet))
+    taille = sys.getsizeof(objet)
+    if isinstance(objet, dict):
+        taille += sum(taille_profonde(k, vus) + taille_profonde(v, vus) for k, v in objet.items())
+    elif isinstance(objet, (list, tuple, set, frozenset)):
+        taille += sum(taille_profonde(element, vus) for element in objet)
+    elif hasattr(objet, '__dict__') and not isinstance(objet, type):
+        taille += taille_profonde(vars(objet), vus)
+    return taille
+
+def tailles_session(at):
+    """Octets de l'état de session qui grandit avec les générations"""
+    etat = at.session_state
+    historique = 0
+    if "llm_chain_real" in etat:
+        memoire = etat["llm_chain_real"].memory
+        historique = taille_profonde(memoire.chat_memory._messages) + taille_profonde(getattr(memoire, "resume", ""))
+    return {
+        "historique": historique,
+        "generated_courses": taille_profonde(etat["generated_courses"]) if "generated_courses" in etat else 0,
+        "metriques_generation": taille_profonde(etat["metriques_generation"]) if "metriques_generation" in etat else 0,
+    }
+
+# =============================================================================
+# 2. SESSIONS SIMULÉES
+# =============================================================================
+
+def demande_session(session, rang, graine=42):
+    """Demande de génération propre à une session et à un rang (pas de réponse resservie par les caches)"""
+    aleatoire = random.Random(f"{graine}-{session}-{rang}")
+    return aleatoire.choice(FORMULATIONS).format(*aleatoire.sample(SUJETS, 2), aleatoire.randint(2, 40))
+
+def executer_session(session, generations, pause_s=0.0, seuil_semantique=SEUIL_SEMANTIQUE, application=APPLICATION):
+    """Ouvre une session, puis enchaîne les générations ; retourne les mesures de chaque génération"""
+    at = AppTest.from_file(application, default_timeout=DELAI_EXECUTION_S)
+    debut = time.perf_counter()
+    at.run()
+    resultat = {"session": session, "ouverture_s": round(time.perf_counter() - debut, 3), "generations": [], "erreurs": []}
+    if at.exception:
+        resultat["erreurs"].append(str(at.exception[0].value))
+        return resultat
+    for curseur in at.slider:
+        if "cache sémantique" in (curseur.label or ""):
+            curseur.set_value(seuil_semantique)
+
+    for rang in range(generations):
+        if not at.text_area:
+            resultat["erreurs"].append("Page incomplète : zone de saisie absente après l'exécution du script")
+            break
+        at.text_area[0].input(demande_session(session, rang))
+        next(b for b in at.button if "Générer" in (b.label or "")).click()
+        nb_metriques = len(at.session_state["metriques_generation"])
+        debut = time.perf_counter()
+        at.run()
+        duree = time.perf_counter() - debut
+        erreurs = [str(e.value) for e in at.exception] + [str(e.value) for e in at.error]
+        if erreurs:
+            resultat["erreurs"].extend(erreurs)
+            continue
+        # Pas de nouvelle mesure de flux : contenu servi par le cache sémantique
+        nouvelles = at.session_state["metriques_generation"][nb_metriques:]
+        metriques = nouvelles[-1] if nouvelles else None
+        resultat["generations"].append({
+            "rang": rang,
+            "latence_s": round(duree, 3),
+            "ttft_s": metriques["ttft_s"] if metriques else None,
+            "depuis_cache": metriques is None or metriques["depuis_cache"] or metriques["coalesce"],
+            "tailles": tailles_session(at),
+        })
+        if pause_s:
+            time.sleep(pause_s)
+    return resultat
+
+# =============================================================================
+# 3. SCÉNARIO ET RAPPORT
+# =============================================================================
+
+def preparer_dossier(source, dossier):
+    """Copie la base du catalogue (et son index) dans le dossier de travail : caches et historiques partent vides"""
+    chemin = os.path.join(source, base_catalogue.FICHIER_CATALOGUE)
+    if os.path.exists(chemin):
+        with sqlite3.connect(chemin) as origine, sqlite3.connect(os.path.join(dossier, base_catalogue.FICHIER_CATALOGUE)) as copie:
+            origine.backup(copie)
+    if os.path.exists(os.path.join(source, index_catalogue.FICHIER_INDEX_BASE)):
+        shutil.copy(os.path.join(source, index_catalogue.FICHIER_INDEX_BASE), dossier)
+
+def executer_charge(sessions, generations, montee_s=0.0, pause_s=0.0, seuil_semantique=SEUIL_SEMANTIQUE):
+    """Lance les sessions en parallèle (démarrages étalés sur montee_s) et agrège les mesures"""
+    preparer_sessions_paralleles({"GEMINI_API_KEY": "rejeu"})
+    # Session d'échauffement à part : le démarrage à froid (caches de ressources, index, import de la pile LLM
+    # à la première génération) n'est compté ni dans les latences ni dans la mémoire par session
+    debut = time.perf_counter()
+    echauffement = executer_session(-1, 1, seuil_semantique=seuil_semantique)
+    demarrage_s = time.perf_counter() - debut
+    if echauffement["erreurs"]:
+        raise RuntimeError(f"Échec de la session d'échauffement : {echauffement['erreurs'][0]}")
+
+    memoire_avant = memoire_processus_mo()
+    depart = threading.Barrier(sessions)
+
+    def session(numero):
+        depart.wait()
+        time.sleep(montee_s * numero / sessions)
+        return executer_session(numero, generations, pause_s, seuil_semantique)
+
+    debut = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions, thread_name_prefix="session") as pool:
+        resultats = list(pool.map(session, range(sessions)))
+    duree_totale = time.perf_counter() - debut
+    memoire_apres = memoire_processus_mo()
+
+    mesures = [g for r in resultats for g in r["generations"]]
+    latences = [g["latence_s"] for g in mesures]
+    ttfts = [g["ttft_s"] for g in mesures if g["ttft_s"] is not None]
+
+    # Croissance de l'état de session : écart entre la dernière et la première génération, par génération
+    croissance = {}
+    for composant in ("historique", "generated_courses", "metriques_generation"):
+        pentes = [
+            (r["generations"][-1]["tailles"][composant] - r["generations"][0]["tailles"][composant]) / (len(r["generations"]) - 1)
+            for r in resultats if len(r["generations"]) > 1
+        ]
+        finales = [r["generations"][-1]["tailles"][composant] for r in resultats if r["generations"]]
+        croissance[composant] = {
+            "octets_par_generation": round(float(np.mean(pentes))) if pentes else None,
+            "octets_fin_moyenne": round(float(np.mean(finales))) if finales else None,
+        }
+
+    return {
+        "sessions": sessions,
+        "generations_par_session": generations,
+        "echauffement_s": round(demarrage_s, 3),
+        "generations_reussies": len(mesures),
+        "erreurs": sum(len(r["erreurs"]) for r in resultats),
+        "exemples_erreurs": [e for r in resultats for e in r["erreurs"]][:5],
+        "servies_par_cache": sum(g["depuis_cache"] for g in mesures),
+        "duree_totale_s": round(duree_totale, 3),
+        "debit_generations_par_minute": round(len(mesures) / duree_totale * 60, 1) if duree_totale else None,
+        "latence_s": centiles(latences),
+        "ouverture_session_s": centiles([r["ouverture_s"] for r in resultats]),
+        "ttft_s": centiles(ttfts),
+        "memoire_processus_mo": {
+            "avant": round(memoire_avant, 1),
+            "apres": round(memoire_apres, 1),
+            "par_session": round((memoire_apres - memoire_avant) / sessions, 2),
+        },
+        "etat_session": croissance,
+    }
+
+def afficher_rapport(rapport):
+    print(f"\n📈 {rapport['sessions']} sessions × {rapport['generations_par_session']} générations "
+          f"en {rapport['duree_totale_s']:.1f}s (échauffement : démarrage et première génération en {rapport['echauffement_s']:.1f}s)")
+    print(f"   ✅ {rapport['generations_reussies']} générations, ❌ {rapport['erreurs']} erreurs, "
+          f"♻️ {rapport['servies_par_cache']} servies par un cache")
+    for erreur in rapport["exemples_erreurs"]:
+        print(f"      • {erreur[:200]}")
+    print(f"   🚀 Débit : {rapport['debit_generations_par_minute']} générations/minute")
+    for nom, cle in (("Latence de bout en bout", "latence_s"), ("Premier token", "ttft_s"), ("Ouverture de session", "ouverture_session_s")):
+        valeurs = rapport[cle]
+        if valeurs["p50"] is not None:
+            print(f"   ⏱️ {nom} : p50 {valeurs['p50']:.2f}s, p95 {valeurs['p95']:.2f}s, p99 {valeurs['p99']:.2f}s")
+    memoire = rapport["memoire_processus_mo"]
+    print(f"   💾 Mémoire du processus : {memoire['avant']:.0f} → {memoire['apres']:.0f} Mo ({memoire['par_session']:+.2f} Mo par session)")
+    for composant, valeurs in rapport["etat_session"].items():
+        if valeurs["octets_fin_moyenne"] is not None:
+            pente = valeurs["octets_par_generation"]
+            print(f"   🧠 {composant} : {valeurs['octets_fin_moyenne'] / 1024:.1f} Ko par session"
+                  + (f", {pente / 1024:+.1f} Ko par génération" if pente is not None else ""))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Test de charge multi-sessions de l'agent pédagogique")
+    parser.add_argument("--sessions", type=int, default=10, help="Nombre de sessions simultanées")
+    parser.add_argument("--generations", type=int, default=3, help="Générations par session")
+    parser.add_argument("--montee-s", type=float, default=0.0, help="Durée sur laquelle les démarrages de sessions sont étalés")
+    parser.add_argument("--pause-s", type=float, default=0.0, help="Temps de réflexion entre deux générations d'une session")
+    parser.add_argument("--cassette", default=serveur_rejeu.FICHIER_CASSETTE, help="Réponses enregistrées du serveur de rejeu")
+    parser.add_argument("--synthetique", type=int, metavar="N", help="Générer une cassette de N réponses synthétiques si elle n'existe pas")
+    parser.add_argument("--facteur-latence", type=float, default=1.0, help="Multiplie les latences rejouées")
+    parser.add_argument("--url", help="Serveur de rejeu déjà lancé (sinon démarré dans ce processus)")
+    parser.add_argument("--seuil-semantique", type=float, default=SEUIL_SEMANTIQUE)
+    parser.add_argument("--json", help="Écrire le rapport dans ce fichier JSON")
+    arguments = parser.parse_args()
+
+    source = os.getcwd()
+    cassette = os.path.abspath(arguments.cassette)
+    chemin_json = os.path.abspath(arguments.json) if arguments.json else None
+    if arguments.synthetique and not os.path.exists(cassette):
+        serveur_rejeu.cassette_synthetique(cassette, arguments.synthetique)
+        print(f"🧪 Cassette synthétique de {arguments.synthetique} réponses écrite dans '{cassette}'")
+
+    serveur = None
+    if arguments.url:
+        os.environ["LLM_REJEU_URL"] = arguments.url
+    else:
+        serveur = serveur_rejeu.ServeurRejeu(cassette, facteur_latence=arguments.facteur_latence)
+        os.environ["LLM_REJEU_URL"] = serveur.demarrer()
+        print(f"🎞️ Serveur de rejeu sur {serveur.url} ({len(serveur.enregistrements)} réponses enregistrées)")
+
+    # L'application lit et écrit ses bases dans le dossier courant : un dossier de travail par test
+    dossier = tempfile.mkdtemp(prefix="charge_agent_")
+    preparer_dossier(source, dossier)
+    # Le dossier reste le dossier courant jusqu'à la sortie : il est supprimé après le vidage des tampons
+    # d'écriture de l'application (atexit : dernier inscrit, premier exécuté)
+    atexit.register(shutil.rmtree, dossier, ignore_errors=True)
+    os.chdir(dossier)
+    try:
+        rapport = executer_charge(arguments.sessions, arguments.generations, arguments.montee_s,
+                                  arguments.pause_s, arguments.seuil_semantique)
+    finally:
+        if serveur:
+            rapport_serveur = serveur.statistiques()
+            serveur.arreter()
+
+    if serveur:
+        rapport["serveur_rejeu"] = rapport_serveur
+    afficher_rapport(rapport)
+    if serveur:
+        print(f"   🎞️ Serveur de rejeu : {rapport_serveur['requetes']} requêtes, "
+              f"{rapport_serveur['en_cours_max']} simultanées au plus")
+    if chemin_json:
+        with open(chemin_json, 'w', encoding='utf-8') as f:
+            json.dump(rapport, f, ensure_ascii=False, indent=2)
+    sys.exit(1 if rapport["erreurs"] else 0)
@@ -0,0 +1,63 @@
+"""
+Registre des clients Gemini partagés par tout le processus
+Un seul ChatGoogleGenerativeAI est créé par (modèle, température, clé d'API) et réutilisé par tous les
+appels et toutes les sessions Streamlit : la configuration du client et ses connexions (canal gRPC/HTTP)
+ne sont plus refaites à chaque appel ni à chaque rerun.
+Si la variable LLM_REJEU_URL est définie, les clients interrogent à la place le serveur de rejeu local
+(serveur_rejeu.py), pour les tests de charge hors-ligne.
+"""
+
+import hashlib
+import os
+import threading
+import time
+
+MODELE_PAR_DEFAUT = "gemini-1.5-flash-latest"
+
+_clients = {}
+_verrou = threading.Lock()
+_statistiques = {"creations": 0, "reutilisations": 0, "temps_creation_s": 0.0}
+
+
+def _creer_gemini(modele, temperature, api_key):
+    url_rejeu = os.environ.get("LLM_REJEU_URL")
+    if url_rejeu:
+        from serveur_rejeu import LLMRejeu
+        return LLMRejeu(url=url_rejeu, modele=modele, temperature=temperature)
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    parametres = {"model": modele, "google_api_key": api_key}
+    if temperature is not None:
+        parametres["temperature"] = temperature
+    return ChatGoogleGenerativeAI(**parametres)
+
+def obtenir_llm(api_key, modele=MODELE_PAR_DEFAUT, temperature=None, fabrique=_creer_gemini):
+    """
+    Retourne le client partagé pour (modèle, température, clé d'API), en le créant au premier appel.
+    temperature=None conserve la température par défaut du modèle.
+    """
+    cle = (modele, temperature, hashlib.sha256(api_key.encode('utf-8')).hexdigest())
+    with _verrou:
+        client = _clients.get(cle)
+        if client is not None:
+            _statistiques["reutilisations"] += 1
+            return client
+
+        debut = time.perf_counter()
+        client = fabrique(modele, temperature, api_key)
+        _statistiques["temps_creation_s"] += time.perf_counter() - debut
+        _statistiques["creations"] += 1
+        _clients[cle] = client
+        return client
+
+def statistiques():
+    """Nombre de clients, créations, réutilisations et temps de configuration économisé (estimé)"""
+    with _verrou:
+        creations = _statistiques["creations"]
+        temps_moyen = _statistiques["temps_creation_s"] / creations if creations else 0.0
+        return {
+            "clients": len(_clients),
+            "creations": creations,
+            "reutilisations": _statistiques["reutilisations"],
+            "temps_creation_moyen_ms": round(temps_moyen * 1000, 1),
+            "temps_economise_s": round(temps_moyen * _statistiques["reutilisations"], 3),
+        }
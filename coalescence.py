@@ -0,0 +1,127 @@
+"""
+Déduplication des appels LLM identiques simultanés (single-flight)
+Quand plusieurs sessions Streamlit (threads de script distincts) envoient au même moment exactement
+le même prompt au même modèle, un seul appel part vers Gemini : les autres attendent son résultat.
+Si le responsable est interrompu sans erreur de l'appel lui-même (arrêt du script Streamlit, générateur
+fermé...), la clé est libérée et l'un des appels en attente reprend l'exécution à sa place.
+"""
+
+import threading
+from langchain_core.load import dumps
+from cache_llm import cle_depuis_llm_string
+
+# Attente maximale du résultat d'un autre appel identique
+DELAI_ATTENTE_SECONDES = 300
+
+
+class AppelAbandonne(Exception):
+    """Le responsable de l'appel partagé a été interrompu : il faut rejoindre la clé à nouveau"""
+
+
+class _AppelEnCours:
+    def __init__(self):
+        self.termine = threading.Event()
+        self.resultat = None
+        self.erreur = None
+        self.abandonne = False
+
+
+class SingleFlight:
+    """Regroupe les exécutions concurrentes d'une même clé en une seule"""
+
+    def __init__(self):
+        self._en_cours = {}
+        self._verrou = threading.Lock()
+        self.appels = 0
+        self.coalesces = 0
+
+    def rejoindre(self, cle):
+        """
+        Rejoint l'exécution en cours pour la clé, ou en devient responsable.
+        Retourne (appel, responsable) : le responsable doit appeler terminer(), les autres attendre().
+        """
+        with self._verrou:
+            appel = self._en_cours.get(cle)
+            if appel is not None:
+                self.coalesces += 1
+                return appel, False
+            appel = _AppelEnCours()
+            self._en_cours[cle] = appel
+            self.appels += 1
+            return appel, True
+
+    def terminer(self, cle, appel, resultat=None, erreur=None, abandonne=False):
+        """
+        Publie le résultat (ou l'erreur) du responsable et libère la clé.
+        abandonne : le responsable a été interrompu, les appels en attente réessaient au lieu de recevoir une erreur
+        """
+        appel.resultat = resultat
+        appel.erreur = erreur
+        appel.abandonne = abandonne
+        with self._verrou:
+            self._en_cours.pop(cle, None)
+        appel.termine.set()
+
+    @staticmethod
+    def attendre(appel, delai=DELAI_ATTENTE_SECONDES):
+        """
+        Attend la fin de l'exécution partagée et retourne son résultat (ou relève son erreur).
+        Lève AppelAbandonne si le responsable a été interrompu, TimeoutError après delai secondes.
+        """
+        if not appel.termine.wait(delai):
+            raise TimeoutError(f"Aucun résultat de l'appel identique en cours après {delai} s")
+        if appel.abandonne:
+            raise AppelAbandonne()
+        if appel.erreur is not None:
+            raise appel.erreur
+        return appel.resultat
+
+    def executer(self, cle, fonction, delai=DELAI_ATTENTE_SECONDES):
+        """Exécute fonction() une seule fois pour toutes les demandes simultanées de la même clé"""
+        while True:
+            appel, responsable = self.rejoindre(cle)
+            if responsable:
+                break
+            try:
+                return self.attendre(appel, delai)
+            except AppelAbandonne:
+                continue
+        try:
+            resultat = fonction()
+        except Exception as e:
+            self.terminer(cle, appel, erreur=e)
+            raise
+        except BaseException:
+            # Interruption du responsable (KeyboardInterrupt, GeneratorExit, arrêt du script) : pas une erreur de l'appel
+            self.terminer(cle, appel, abandonne=True)
+            raise
+        self.terminer(cle, appel, resultat=resultat)
+        return resultat
+
+    def statistiques(self):
+        with self._verrou:
+            return {"appels": self.appels, "coalesces": self.coalesces, "en_cours": len(self._en_cours)}
+
+
+# Instance partagée par tout le processus (toutes les sessions Streamlit)
+appels_llm = SingleFlight()
+
+
+def cle_appel(llm, messages):
+    """Clé d'un appel LLM : la même que celle du cache des réponses (modèle, température, prompt rendu)"""
+    return cle_depuis_llm_string(dumps(messages), llm._get_llm_string())
+
+def invoquer(llm, prompt):
+    """llm.invoke(prompt) dédupliqué entre appels simultanés identiques"""
+    messages = llm._convert_input(prompt).to_messages()
+    return appels_llm.executer(cle_appel(llm, messages), lambda: llm.invoke(messages))
+
+def invoquer_chaine(chaine, entrees):
+    """
+    Équivalent de LLMChain.invoke(entrees) avec un appel LLM dédupliqué :
+    chargement de la mémoire, rendu du prompt, appel, puis enregistrement de l'échange en mémoire.
+    """
+    entrees = chaine.prep_inputs(entrees)
+    prompt_value = chaine.prompt.format_prompt(**{k: entrees[k] for k in chaine.prompt.input_variables})
+    reponse = invoquer(chaine.llm, prompt_value)
+    return chaine.prep_outputs(entrees, {chaine.output_key: reponse.content})
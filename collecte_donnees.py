@@ -5,17 +5,31 @@ Script pour collecter des données réelles de formation depuis Kaggle, Coursera
 
 import requests
 import pandas as pd
+import csv
 import json
 import os
+import itertools
+import collections
+import argparse
+import sys
 from bs4 import BeautifulSoup
 import time
 from kaggle.api.kaggle_api_extended import KaggleApi
+import collecteurs
+import base_catalogue
+import catalogue_incremental
+
+# Page de référence des fonctions natives (surchargeable pour pointer vers un serveur local)
+URL_FONCTIONS_PYTHON = os.environ.get("PYTHON_DOCS_URL", "https://docs.python.org/3/library/functions.html")
+# Les sources en ligne ne sont collectées que si COLLECTE_EN_LIGNE=1 : un collecteur en échec annule toute
+# la collecte, une collecte par défaut doit donc aboutir hors-ligne
+COLLECTE_EN_LIGNE = os.environ.get("COLLECTE_EN_LIGNE") == "1"
 
 # =============================================================================
 # 1. COLLECTE DONNÉES KAGGLE LEARN
 # =============================================================================
 
-def collect_kaggle_learn_data():
+def collect_kaggle_learn_data(client=None):
     """Collecte les données des cours Kaggle Learn"""
     print("📚 Collecte des données Kaggle Learn...")
     
@@ -111,7 +125,7 @@ def collect_kaggle_learn_data():
 # 2. COLLECTE DOCUMENTATION PYTHON OFFICIELLE
 # =============================================================================
 
-def collect_python_documentation():
+def collect_python_documentation(client=None):
     """Collecte la structure de la documentation Python officielle"""
     print("🐍 Collecte de la documentation Python...")
     
@@ -158,11 +172,37 @@ def collect_python_documentation():
     
     return python_modules
 
+def collect_python_builtins_online(client):
+    """Collecte la liste des fonctions natives depuis la page en ligne de la documentation Python"""
+    print("🌐 Collecte des fonctions natives sur docs.python.org...")
+    
+    page = client.obtenir(URL_FONCTIONS_PYTHON)
+    soup = BeautifulSoup(page.texte, 'html.parser')
+    functions = []
+    for definition in soup.select('dl.function'):
+        signature = definition.find('dt', id=True)
+        if signature is None:
+            continue
+        paragraphe = definition.find('dd').find('p') if definition.find('dd') else None
+        description = paragraphe.get_text(' ', strip=True).split('. ')[0] if paragraphe else ''
+        functions.append({
+            'name': f"{signature['id']}()",
+            'description': description,
+            'example': f"help({signature['id']})",
+            'level': 'Intermediate'
+        })
+    
+    return [{
+        'module': 'Built-in Functions Reference',
+        'category': 'Core Python',
+        'functions': functions
+    }] if functions else []
+
 # =============================================================================
 # 3. COLLECTE EXERCICES CODING PRACTICE
 # =============================================================================
 
-def collect_practice_exercises():
+def collect_practice_exercises(client=None):
     """Génère des exercices pratiques par niveau"""
     print("💪 Génération d'exercices pratiques...")
     
@@ -214,95 +254,253 @@ def collect_practice_exercises():
     return exercises
 
 # =============================================================================
-# 4. FONCTION PRINCIPALE DE COLLECTE
+# 4. PIPELINE DE NORMALISATION EN FLUX
 # =============================================================================
 
-def collect_all_real_data():
-    """Fonction principale pour collecter toutes les données"""
-    print("🚀 Début de la collecte des données réelles...")
-    
-    # Collecter les données
-    kaggle_data = collect_kaggle_learn_data()
-    python_docs = collect_python_documentation()
-    exercises = collect_practice_exercises()
-    
-    # Créer les DataFrames
-    courses_list = []
-    modules_list = []
-    
-    # Traiter les données Kaggle
-    for course in kaggle_data:
-        courses_list.append({
-            'formation_id': len(courses_list) + 1,
-            'titre': course['title'],
-            'domaine': 'Data Science',
-            'niveau': course['level'],
-            'duree_heures': (course['total_duration'].replace('h', '')),
-            'prerequis': course['prerequisites'],
-            'description': course['description'],
+FICHIER_FORMATIONS = 'formations_reelles.csv'
+FICHIER_MODULES = 'modules_reels.csv'
+FICHIER_EXERCICES = 'exercices_reels.json'
+
+COLONNES_FORMATIONS = base_catalogue.COLONNES_FORMATIONS
+COLONNES_MODULES = base_catalogue.COLONNES_MODULES
+
+# Nombre de lignes accumulées avant chaque écriture sur disque
+TAILLE_LOT_ECRITURE = 1000
+
+def normaliser_cours_kaggle(course):
+    """Cours Kaggle Learn -> (formation sans identifiant, générateur de ses modules)"""
+    formation = {
+        'titre': course['title'],
+        'domaine': 'Data Science',
+        'niveau': course['level'],
+        'duree_heures': (course['total_duration'].replace('h', '')),
+        'prerequis': course['prerequisites'],
+        'description': course['description'],
+        'source': 'Kaggle Learn'
+    }
+    modules = (
+        {
+            'ordre': ordre,
+            'titre': lesson['lesson'],
+            'duree_minutes': int(float(lesson['duration'].replace('h', '')) * 60),
+            'concepts_cles': lesson['concepts'],
             'source': 'Kaggle Learn'
-        })
-        
-        # Ajouter les modules
-        for i, lesson in enumerate(course['lessons']):
-            modules_list.append({
-                'module_id': len(modules_list) + 1,
-                'formation_id': len(courses_list),
-                'ordre': i + 1,
-                'titre': lesson['lesson'],
-                'duree_minutes': int(float(lesson['duration'].replace('h', '')) * 60),
-                'concepts_cles': lesson['concepts'],
-                'source': 'Kaggle Learn'
-            })
-    
-    # Traiter la documentation Python
-    for module in python_docs:
-        courses_list.append({
-            'formation_id': len(courses_list) + 1,
-            'titre': f"Python {module['module']}",
-            'domaine': 'Programming',
-            'niveau': 'Beginner',
-            'duree_heures': 4,
-            'prerequis': 'None',
-            'description': f"Learn {module['module']} in Python",
+        }
+        for ordre, lesson in enumerate(course['lessons'], start=1)
+    )
+    return formation, modules
+
+def normaliser_module_python(module):
+    """Module de la documentation Python -> (formation sans identifiant, générateur de ses fonctions comme modules)"""
+    formation = {
+        'titre': f"Python {module['module']}",
+        'domaine': 'Programming',
+        'niveau': 'Beginner',
+        'duree_heures': 4,
+        'prerequis': 'None',
+        'description': f"Learn {module['module']} in Python",
+        'source': 'Python Documentation'
+    }
+    # L'ordre est la position de la fonction dans le module (énumération, en temps linéaire)
+    modules = (
+        {
+            'ordre': ordre,
+            'titre': func['name'],
+            'duree_minutes': 30,
+            'concepts_cles': func['description'],
+            'exemple': func['example'],
+            'niveau': func['level'],
             'source': 'Python Documentation'
-        })
+        }
+        for ordre, func in enumerate(module['functions'], start=1)
+    )
+    return formation, modules
+
+def flux_formations_modules(sources, etat):
+    """
+    Génère les enregistrements normalisés dans l'ordre ('formation', ...) puis ('module', ...) de cette formation.
+    Les identifiants sont stables d'une collecte à l'autre : ils sont attribués par l'état du catalogue
+    (catalogue_incremental.EtatCatalogue) à partir de la clé naturelle de chaque enregistrement.
+    sources : itérable de (nom du collecteur, éléments bruts, fonction de normalisation) ; les éléments peuvent
+    être des itérables paresseux : rien n'est matérialisé. Les modules sont rattachés à la source de leur formation.
+    """
+    elements = itertools.chain.from_iterable(
+        ((nom, *normaliser(element)) for element in elements) for nom, elements, normaliser in sources
+    )
+    occurrences_formations = collections.Counter()
+    for nom, formation, modules in elements:
+        cle = catalogue_incremental.cle_formation(formation)
+        occurrences_formations[cle] += 1
+        if occurrences_formations[cle] > 1:
+            cle = f"{cle}|{occurrences_formations[cle]}"
+        formation = etat.enregistrer('formations', cle, formation, 'formation_id', source=nom)
+        yield 'formation', formation
         
-        # Ajouter les fonctions comme modules
-        for func in module['functions']:
-            modules_list.append({
-                'module_id': len(modules_list) + 1,
-                'formation_id': len(courses_list),
-                'ordre': len([f for f in module['functions'] if module['functions'].index(f) <= module['functions'].index(func)]),
-                'titre': func['name'],
-                'duree_minutes': 30,
-                'concepts_cles': func['description'],
-                'exemple': func['example'],
-                'niveau': func['level'],
-                'source': 'Python Documentation'
-            })
+        # Clé d'un module : formation + titre (+ rang d'occurrence si le titre se répète)
+        occurrences = collections.Counter()
+        for module in modules:
+            occurrences[module['titre']] += 1
+            cle_module = f"{cle}|{module['titre']}|{occurrences[module['titre']]}"
+            yield 'module', etat.enregistrer(
+                'modules', cle_module, {'formation_id': formation['formation_id'], **module}, 'module_id', source=nom
+            )
+
+class EcrivainCSVParLots:
+    """Écrit des lignes CSV par lots de taille_lot, vidés sur disque après chaque lot : la mémoire reste constante"""
+
+    def __init__(self, chemin, colonnes, taille_lot=TAILLE_LOT_ECRITURE):
+        self.fichier = open(chemin, 'w', encoding='utf-8', newline='')
+        self.writer = csv.DictWriter(self.fichier, fieldnames=colonnes, restval='', extrasaction='ignore', lineterminator='\n')
+        self.writer.writeheader()
+        self.taille_lot = taille_lot
+        self.lot = []
+        self.lignes = 0
+
+    def ecrire(self, ligne):
+        self.lot.append(ligne)
+        if len(self.lot) >= self.taille_lot:
+            self.vider()
+
+    def vider(self):
+        self.writer.writerows(self.lot)
+        self.lignes += len(self.lot)
+        self.lot.clear()
+        self.fichier.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.vider()
+        self.fichier.close()
+
+def ecrire_json_par_elements(chemin, elements):
+    """Écrit un tableau JSON élément par élément (même format que json.dump(..., indent=2)) ; retourne leur nombre"""
+    nombre = 0
+    with open(chemin, 'w', encoding='utf-8') as f:
+        f.write('[')
+        for element in elements:
+            texte = json.dumps(element, ensure_ascii=False, indent=2).replace('\n', '\n  ')
+            f.write((',\n  ' if nombre else '\n  ') + texte)
+            nombre += 1
+        f.write('\n]' if nombre else ']')
+    return nombre
+
+def exporter_catalogue(base):
+    """Réécrit les fichiers CSV/JSON depuis les tables du catalogue (lues en flux, écriture atomique)"""
+    connexion = base.connexion()
+    for fichier, table, colonnes, ordre in (
+        (FICHIER_FORMATIONS, "formations", COLONNES_FORMATIONS, "formation_id"),
+        (FICHIER_MODULES, "modules", COLONNES_MODULES, "module_id"),
+    ):
+        with EcrivainCSVParLots(fichier + '.tmp', colonnes) as ecrivain:
+            for ligne in connexion.execute(f"SELECT {', '.join(colonnes)} FROM {table} ORDER BY {ordre}"):
+                ecrivain.ecrire(dict(zip(colonnes, ligne)))
+        os.replace(fichier + '.tmp', fichier)
+    ecrire_json_par_elements(FICHIER_EXERCICES + '.tmp', (
+        {'category': l[0], 'level': l[1], 'exercises': json.loads(l[2])}
+        for l in connexion.execute("SELECT category, level, exercices FROM exercices ORDER BY position")
+    ))
+    os.replace(FICHIER_EXERCICES + '.tmp', FICHIER_EXERCICES)
+
+# Sources enregistrées (exécutées en parallèle) ; l'ordre d'enregistrement fixe les identifiants
+collecteurs.enregistrer("kaggle_learn", collect_kaggle_learn_data, normaliser=normaliser_cours_kaggle)
+collecteurs.enregistrer("python_docs", collect_python_documentation, normaliser=normaliser_module_python)
+if COLLECTE_EN_LIGNE:
+    collecteurs.enregistrer("python_builtins_en_ligne", collect_python_builtins_online, normaliser=normaliser_module_python)
+collecteurs.enregistrer("exercices", collect_practice_exercises, genre="exercices")
+
+# =============================================================================
+# 5. FONCTION PRINCIPALE DE COLLECTE
+# =============================================================================
+
+def collect_all_real_data(sources=None, client=None):
+    """
+    Fonction principale pour collecter toutes les données.
+    sources : noms des collecteurs à exécuter (tous les collecteurs enregistrés par défaut), en parallèle.
+    Les enregistrements sont normalisés et écrits au fil de l'eau dans des fichiers temporaires, qui ne
+    remplacent les fichiers exportés qu'une fois la collecte validée ; retourne le nombre de formations,
+    de modules et de catégories d'exercices écrits.
+    Si un collecteur échoue, la collecte est annulée (catalogue et fichiers inchangés) et
+    collecteurs.CollecteurEnEchec est levée.
+    """
+    print("🚀 Début de la collecte des données réelles...")
     
-    # Créer les DataFrames finaux
-    courses_df = pd.DataFrame(courses_list)
-    modules_df = pd.DataFrame(modules_list)
+    # Rapprochement avec la collecte précédente : identifiants stables et empreintes de contenu. Les changements
+    # sont répercutés dans la base indexée du catalogue, validée dans la même transaction que l'état
+    base = base_catalogue.BaseCatalogue()
+    etat = catalogue_incremental.EtatCatalogue(connexion=base.connexion(), observateur=base.appliquer)
+    etat.commencer()
+    if etat.complet:
+        base.vider()
+    # Fichiers temporaires, remplacés seulement si la collecte aboutit et que quelque chose a changé :
+    # les exports précédents restent intacts en cas d'échec
+    exports = (FICHIER_FORMATIONS, FICHIER_MODULES, FICHIER_EXERCICES)
+    fichiers = [fichier + '.tmp' for fichier in exports]
     
-    # Sauvegarder les données
-    courses_df.to_csv('formations_reelles.csv', index=False, encoding='utf-8')
-    modules_df.to_csv('modules_reels.csv', index=False, encoding='utf-8')
+    try:
+        # Collecter les données (collecteurs en parallèle, client HTTP partagé), normaliser et sauvegarder en flux
+        with collecteurs.executer_collecteurs(sources, client) as resultats:
+            sources_formations = [(c.nom, elements, c.normaliser) for c, elements in resultats if c.genre == "formations"]
+            exercises = itertools.chain.from_iterable(
+                ((c.nom, categorie) for categorie in elements) for c, elements in resultats if c.genre == "exercices"
+            )
+            
+            with EcrivainCSVParLots(fichiers[0], COLONNES_FORMATIONS) as formations, \
+                 EcrivainCSVParLots(fichiers[1], COLONNES_MODULES) as modules:
+                for genre, enregistrement in flux_formations_modules(sources_formations, etat):
+                    (formations if genre == 'formation' else modules).ecrire(enregistrement)
+            
+            # Sauvegarder les exercices
+            nb_categories = ecrire_json_par_elements(fichiers[2], (
+                etat.enregistrer('exercices', catalogue_incremental.cle_exercices(categorie), categorie, source=nom)
+                for nom, categorie in exercises
+            ))
+    except BaseException as e:
+        # Collecte incomplète : rien n'est validé (les enregistrements absents seraient sinon supprimés)
+        etat.annuler()
+        etat.fermer()
+        for fichier in fichiers:
+            if os.path.exists(fichier):
+                os.remove(fichier)
+        if isinstance(e, collecteurs.CollecteurEnEchec):
+            print(f"❌ {e} : collecte annulée, catalogue inchangé")
+        raise
     
-    # Sauvegarder les exercices
-    with open('exercices_reels.json', 'w', encoding='utf-8') as f:
-        json.dump(exercises, f, ensure_ascii=False, indent=2)
+    # Seuls les enregistrements des collecteurs exécutés peuvent avoir disparu
+    changements = etat.terminer(sources)
+    etat.fermer()
+    # Collecte limitée à certaines sources : les fichiers écrits au fil de l'eau ne contiennent que ces
+    # sources, les exports sont régénérés depuis la base qui contient aussi les autres
+    partielle = sources is not None
+    for fichier in exports:
+        if (changements is not None or not os.path.exists(fichier)) and not partielle:
+            os.replace(fichier + '.tmp', fichier)
+        else:
+            os.remove(fichier + '.tmp')
+    if partielle and (changements is not None or not all(os.path.exists(f) for f in exports)):
+        exporter_catalogue(base)
+    
+    if changements is None:
+        print("♻️ Aucun changement depuis la dernière collecte : fichiers conservés")
+    else:
+        resume = ", ".join(
+            f"{genre}: +{c['ajoutes']} ~{c['modifies']} -{c['supprimes']}" for genre, c in changements["resume"].items()
+        )
+        print(f"🔁 Version {changements['version']} du catalogue ({resume})")
     
     print(f"✅ Données collectées avec succès !")
-    print(f"📊 {len(courses_df)} formations sauvegardées dans 'formations_reelles.csv'")
-    print(f"📚 {len(modules_df)} modules sauvegardés dans 'modules_reels.csv'")
-    print(f"💪 {len(exercises)} catégories d'exercices sauvegardées dans 'exercices_reels.json'")
+    print(f"📊 {formations.lignes} formations sauvegardées dans '{FICHIER_FORMATIONS}'")
+    print(f"📚 {modules.lignes} modules sauvegardés dans '{FICHIER_MODULES}'")
+    print(f"💪 {nb_categories} catégories d'exercices sauvegardées dans '{FICHIER_EXERCICES}'")
+    print(f"🗄️ Catalogue indexé à jour dans '{base.chemin}'")
+    if partielle:
+        print(f"📦 Sources {', '.join(sources)} seulement : exports régénérés depuis le catalogue complet")
     
-    return courses_df, modules_df, exercises
+    return {"formations": formations.lignes, "modules": modules.lignes, "categories_exercices": nb_categories}
 
 # =============================================================================
-# 5. SCRIPT D'EXÉCUTION
+# 6. SCRIPT D'EXÉCUTION
 # =============================================================================
 
 if __name__ == "__main__":
@@ -310,15 +508,23 @@ if __name__ == "__main__":
     if not os.path.exists('data'):
         os.makedirs('data')
     
+    parser = argparse.ArgumentParser(description="Collecte des données de formation")
+    parser.add_argument("--sources", nargs="+", choices=list(collecteurs.COLLECTEURS),
+                        help="Collecteurs à exécuter (tous par défaut)")
+    arguments = parser.parse_args()
+    
     # Collecter toutes les données
-    courses_df, modules_df, exercises = collect_all_real_data()
+    try:
+        collect_all_real_data(arguments.sources)
+    except collecteurs.CollecteurEnEchec:
+        sys.exit(1)
     
-    # Afficher un aperçu
+    # Afficher un aperçu (seules les premières lignes sont relues)
     print("\n📋 Aperçu des formations collectées:")
-    print(courses_df[['titre', 'niveau', 'duree_heures', 'source']].head(10))
+    print(pd.read_csv(FICHIER_FORMATIONS, nrows=10)[['titre', 'niveau', 'duree_heures', 'source']])
     
     print("\n📝 Aperçu des modules collectés:")
-    print(modules_df[['titre', 'duree_minutes', 'concepts_cles', 'source']].head(10))
+    print(pd.read_csv(FICHIER_MODULES, nrows=10)[['titre', 'duree_minutes', 'concepts_cles', 'source']])
     
     print(f"\n🎯 Données prêtes pour votre agent pédagogique !")
     print("Vous pouvez maintenant utiliser ces fichiers dans votre application Streamlit.")
@@ -0,0 +1,283 @@
+"""
+Cadre des collecteurs de données (plug-ins) pour collecte_donnees.py
+Chaque source est un collecteur enregistré sous un nom ; les collecteurs s'exécutent en parallèle sur un
+pool de threads et partagent un même client HTTP :
+- une requests.Session avec pool de connexions (keep-alive),
+- une limite de débit par hôte,
+- un cache disque qui rejoue les requêtes en conditionnel (ETag / Last-Modified) : une page inchangée
+  revient en 304 et est relue depuis le disque au lieu d'être retéléchargée.
+"""
+
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+
+DOSSIER_CACHE_HTTP = '.cache_http'
+DEBIT_PAR_HOTE_DEFAUT = 2.0  # requêtes par seconde
+TAILLE_POOL = 8
+DELAI_REQUETE_SECONDES = 20
+# Éléments produits d'avance par un collecteur avant d'attendre que la collecte les consomme
+TAILLE_FILE_COLLECTEUR = 1000
+USER_AGENT = "agent-pedagogique-collecte/1.0"
+
+# =============================================================================
+# 1. CLIENT HTTP PARTAGÉ
+# =============================================================================
+
+class LimiteurDebit:
+    """Espace les requêtes vers un même hôte d'au moins 1 / débit secondes (sûr entre threads)"""
+
+    def __init__(self, debit_par_hote=DEBIT_PAR_HOTE_DEFAUT, debits=None):
+        self.debit_par_hote = debit_par_hote
+        self.debits = debits or {}
+        self._prochain = {}
+        self._verrou = threading.Lock()
+
+    def attendre(self, hote):
+        intervalle = 1.0 / self.debits.get(hote, self.debit_par_hote)
+        with self._verrou:
+            maintenant = time.monotonic()
+            creneau = max(maintenant, self._prochain.get(hote, 0.0))
+            self._prochain[hote] = creneau + intervalle
+        if creneau > maintenant:
+            time.sleep(creneau - maintenant)
+
+
+class ReponseHTTP:
+    def __init__(self, url, statut, contenu, encodage, depuis_cache):
+        self.url = url
+        self.statut = statut
+        self.contenu = contenu
+        self.encodage = encodage or 'utf-8'
+        self.depuis_cache = depuis_cache
+
+    @property
+    def texte(self):
+        return self.contenu.decode(self.encodage, errors='replace')
+
+
+class ClientHTTP:
+    """Session HTTP partagée par les collecteurs : pool de connexions, débit par hôte, cache conditionnel"""
+
+    def __init__(self, dossier_cache=DOSSIER_CACHE_HTTP, limiteur=None, taille_pool=TAILLE_POOL):
+        self.dossier_cache = dossier_cache
+        os.makedirs(dossier_cache, exist_ok=True)
+        self.limiteur = limiteur or LimiteurDebit()
+        self.session = requests.Session()
+        adaptateur = HTTPAdapter(pool_connections=taille_pool, pool_maxsize=taille_pool)
+        self.session.mount("http://", adaptateur)
+        self.session.mount("https://", adaptateur)
+        self.session.headers["User-Agent"] = USER_AGENT
+        self._verrou = threading.Lock()
+        self.statistiques = {"requetes": 0, "non_modifiees": 0, "telechargees": 0, "octets_telecharges": 0}
+
+    def _chemins(self, url):
+        cle = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.dossier_cache, cle + ".json"), os.path.join(self.dossier_cache, cle + ".corps")
+
+    def _lire_cache(self, url):
+        chemin_meta, chemin_corps = self._chemins(url)
+        try:
+            with open(chemin_meta, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            with open(chemin_corps, 'rb') as f:
+                return meta, f.read()
+        except (OSError, ValueError):
+            return None, None
+
+    def _ecrire_cache(self, url, reponse):
+        chemin_meta, chemin_corps = self._chemins(url)
+        meta = {
+            "url": url,
+            "etag": reponse.headers.get("ETag"),
+            "last_modified": reponse.headers.get("Last-Modified"),
+            "encodage": reponse.encoding,
+            "enregistre_le": time.time(),
+        }
+        with open(chemin_corps + ".tmp", 'wb') as f:
+            f.write(reponse.content)
+        os.replace(chemin_corps + ".tmp", chemin_corps)
+        with open(chemin_meta + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(chemin_meta + ".tmp", chemin_meta)
+
+    def obtenir(self, url):
+        """GET conditionnel : le corps en cache est réutilisé si le serveur répond 304 Not Modified"""
+        meta, corps = self._lire_cache(url)
+        entetes = {}
+        if meta:
+            if meta.get("etag"):
+                entetes["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                entetes["If-Modified-Since"] = meta["last_modified"]
+
+        self.limiteur.attendre(urlsplit(url).netloc)
+        reponse = self.session.get(url, headers=entetes, timeout=DELAI_REQUETE_SECONDES)
+        with self._verrou:
+            self.statistiques["requetes"] += 1
+
+        if reponse.status_code == 304 and corps is not None:
+            with self._verrou:
+                self.statistiques["non_modifiees"] += 1
+            return ReponseHTTP(url, 200, corps, meta.get("encodage"), depuis_cache=True)
+
+        reponse.raise_for_status()
+        if reponse.headers.get("ETag") or reponse.headers.get("Last-Modified"):
+            self._ecrire_cache(url, reponse)
+        with self._verrou:
+            self.statistiques["telechargees"] += 1
+            self.statistiques["octets_telecharges"] += len(reponse.content)
+        return ReponseHTTP(url, reponse.status_code, reponse.content, reponse.encoding, depuis_cache=False)
+
+    def fermer(self):
+        self.session.close()
+
+# =============================================================================
+# 2. REGISTRE DES COLLECTEURS
+# =============================================================================
+
+class Collecteur:
+    """
+    Source de données enregistrée : collecter(client) retourne les éléments bruts de la source.
+    genre 'formations' : chaque élément est transformé par normaliser() en (formation, modules) ;
+    genre 'exercices' : les éléments sont des catégories d'exercices.
+    """
+
+    def __init__(self, nom, collecter, genre, normaliser=None):
+        self.nom = nom
+        self.collecter = collecter
+        self.genre = genre
+        self.normaliser = normaliser
+
+
+COLLECTEURS = {}
+
+def enregistrer(nom, collecter, genre="formations", normaliser=None):
+    """Enregistre un collecteur ; l'ordre d'enregistrement fixe l'ordre (et les identifiants) de la sortie"""
+    if genre == "formations" and normaliser is None:
+        raise ValueError(f"Le collecteur '{nom}' de formations doit fournir une fonction normaliser")
+    COLLECTEURS[nom] = Collecteur(nom, collecter, genre, normaliser)
+    return COLLECTEURS[nom]
+
+class CollecteurEnEchec(RuntimeError):
+    """Un collecteur a échoué : la collecte est incomplète"""
+
+    def __init__(self, nom, erreur):
+        super().__init__(f"Collecteur '{nom}' en échec : {erreur}")
+        self.nom = nom
+        self.erreur = erreur
+
+
+_FIN = object()
+_RIEN = object()
+
+class _Flux:
+    """
+    Éléments d'un collecteur transmis au consommateur par une file bornée.
+    Un producteur dont la file est pleine ne bloque pas son worker : il se met en pause avec l'élément en attente
+    et le consommateur le resoumet au pool dès qu'il libère une place. Les files peuvent ainsi être vidées dans
+    n'importe quel ordre, même avec plus de collecteurs que de workers.
+    """
+
+    def __init__(self, collecteur, client, pool, arret):
+        self.collecteur = collecteur
+        self.client = client
+        self.pool = pool
+        self.arret = arret
+        self.file = queue.Queue(maxsize=TAILLE_FILE_COLLECTEUR)
+        self.iterateur = None
+        self.en_attente = _RIEN
+        self.en_pause = False
+        self._verrou = threading.Lock()
+
+    def _deposer(self, element):
+        try:
+            self.file.put_nowait(element)
+            return True
+        except queue.Full:
+            pass
+        # Sous le verrou : soit le consommateur a libéré une place entre-temps, soit il verra la pause
+        with self._verrou:
+            try:
+                self.file.put_nowait(element)
+                return True
+            except queue.Full:
+                self.en_pause = True
+                return False
+
+    def produire(self):
+        """Pousse les éléments du collecteur dans la file, puis _FIN ou l'exception rencontrée"""
+        while not self.arret.is_set():
+            if self.en_attente is _RIEN:
+                try:
+                    if self.iterateur is None:
+                        self.iterateur = iter(self.collecteur.collecter(self.client))
+                    self.en_attente = next(self.iterateur)
+                except StopIteration:
+                    self.en_attente = _FIN
+                except Exception as e:
+                    self.en_attente = CollecteurEnEchec(self.collecteur.nom, e)
+            element = self.en_attente
+            if not self._deposer(element):
+                return
+            self.en_attente = _RIEN
+            if element is _FIN or isinstance(element, CollecteurEnEchec):
+                return
+
+    def consommer(self):
+        while True:
+            element = self.file.get()
+            with self._verrou:
+                if self.en_pause:
+                    self.en_pause = False
+                    self.pool.submit(self.produire)
+            if element is _FIN:
+                return
+            if isinstance(element, CollecteurEnEchec):
+                raise element
+            yield element
+
+    def fermer(self):
+        close = getattr(self.iterateur, "close", None)
+        if close is not None:
+            close()
+
+@contextmanager
+def executer_collecteurs(noms=None, client=None, max_workers=4):
+    """
+    Exécute les collecteurs demandés (tous par défaut) en parallèle.
+    Fournit [(collecteur, éléments)] dans l'ordre d'enregistrement ; les éléments sont des itérateurs paresseux
+    alimentés par une file bornée par collecteur : rien n'est matérialisé, et ils peuvent être consommés dans
+    n'importe quel ordre. L'itérateur d'un collecteur en échec lève CollecteurEnEchec, que l'appelant doit
+    traiter comme une collecte incomplète.
+    Usage : `with executer_collecteurs(noms) as resultats: ...`
+    """
+    noms = set(noms or COLLECTEURS)
+    if noms - COLLECTEURS.keys():
+        raise KeyError(f"Collecteurs inconnus : {sorted(noms - COLLECTEURS.keys())}")
+    collecteurs = [collecteur for nom, collecteur in COLLECTEURS.items() if nom in noms]
+    proprietaire = client is None
+    client = client or ClientHTTP()
+    arret = threading.Event()
+    pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="collecteur")
+    flux = [_Flux(collecteur, client, pool, arret) for collecteur in collecteurs]
+    try:
+        for f in flux:
+            pool.submit(f.produire)
+        yield [(f.collecteur, f.consommer()) for f in flux]
+    finally:
+        # Collecte interrompue : les producteurs en cours s'arrêtent, ceux en pause ne sont pas repris
+        arret.set()
+        pool.shutdown(wait=True)
+        for f in flux:
+            f.fermer()
+        if proprietaire:
+            client.fermer()
@@ -0,0 +1,169 @@
+"""
+Préparation du contexte envoyé au LLM par l'agent pédagogique
+Classe les lignes candidates (formations, modules, exercices) et remplit un budget de tokens
+par section selon le type de contenu à générer, pour borner la taille du prompt.
+"""
+
+import format_contexte
+from index_catalogue import tokeniser
+
+# Estimation grossière : environ 4 caractères par token pour les modèles Gemini
+CARACTERES_PAR_TOKEN = 4
+
+# Budget de tokens par section du prompt, selon le type de contenu à générer
+BUDGETS_PAR_TYPE = {
+    "Cours complet": {"formations": 600, "modules": 2500, "exercices": 1500, "historique": 800},
+    "Module spécifique": {"formations": 300, "modules": 1500, "exercices": 800, "historique": 600},
+    "Quiz interactif": {"formations": 300, "modules": 1500, "exercices": 400, "historique": 400},
+    "Exercices pratiques": {"formations": 300, "modules": 800, "exercices": 2000, "historique": 400},
+    "Plan de formation personnalisé": {"formations": 1500, "modules": 1500, "exercices": 400, "historique": 800},
+}
+BUDGET_DEFAUT = BUDGETS_PAR_TYPE["Cours complet"]
+
+# Nombre maximal de lignes candidates mises en forme avant l'emballage
+MAX_CANDIDATS = 200
+
+# Format de sérialisation de chaque section (voir format_contexte.py, qui mesure leurs tokens sur le catalogue)
+FORMATS_SECTIONS = {"formations": "dictionnaire", "modules": "dictionnaire", "exercices": "dictionnaire"}
+
+# =============================================================================
+# 1. ESTIMATION DES TOKENS
+# =============================================================================
+
+def estimer_tokens(texte):
+    """Estime le nombre de tokens d'un texte"""
+    return (len(texte) + CARACTERES_PAR_TOKEN - 1) // CARACTERES_PAR_TOKEN
+
+def budget_pour(generation_type):
+    """Retourne le budget de tokens par section pour un type de contenu"""
+    return BUDGETS_PAR_TYPE.get(generation_type, BUDGET_DEFAUT)
+
+# =============================================================================
+# 2. CLASSEMENT ET EMBALLAGE DES SECTIONS
+# =============================================================================
+
+def classer_formations(formations_df, requete):
+    """Classe les formations par nombre de termes de la requête présents dans leur titre et description"""
+    if formations_df.empty:
+        return formations_df
+    termes = set(tokeniser(requete))
+    colonnes = [c for c in ('titre', 'description', 'prerequis') if c in formations_df.columns]
+    textes = formations_df[colonnes].fillna('').astype(str).agg(' '.join, axis=1)
+    scores = textes.map(lambda texte: len(termes.intersection(tokeniser(texte))))
+    ordre = scores.reset_index(drop=True).sort_values(ascending=False, kind='stable').index
+    return formations_df.iloc[ordre]
+
+def emballer_tableau(df, budget_tokens, texte_vide, format_tableau="texte", ignorer_trop_longues=False):
+    """
+    Remplit le budget avec les premières lignes du DataFrame (déjà classé), dans un format de format_contexte.
+    Une ligne qui dépasse le budget arrête l'emballage, ou est seulement ignorée si ignorer_trop_longues.
+    Retourne (texte, nombre de lignes retenues, tokens utilisés).
+    """
+    if df.empty:
+        return texte_vide, 0, estimer_tokens(texte_vide)
+
+    entete, lignes = format_contexte.lignes_tableau(df.head(MAX_CANDIDATS), format_tableau)
+    retenues = []
+    codes = set()
+    tokens = estimer_tokens(entete) + 1
+    for ligne, codes_ligne in lignes:
+        # Les codes de valeurs répétées sont définis une fois, à la première ligne qui les utilise
+        nouveaux = [code for code in codes_ligne if code not in codes]
+        cout = estimer_tokens(ligne) + 1 + sum(estimer_tokens(code) + 1 for code in nouveaux)
+        if tokens + cout > budget_tokens:
+            if ignorer_trop_longues:
+                continue
+            break
+        retenues.append((ligne, codes_ligne))
+        codes.update(nouveaux)
+        tokens += cout
+
+    if not retenues:
+        return texte_vide, 0, estimer_tokens(texte_vide)
+    return format_contexte.assembler_tableau(entete, retenues), len(retenues), tokens
+
+def emballer_exercices(exercices, budget_tokens, texte_vide, format_exercices="json_indente"):
+    """
+    Remplit le budget avec les exercices (déjà classés) : regroupés par catégorie dans le même format que
+    exercices_reels.json pour les formats JSON, ou à plat (une ligne par exercice) pour les formats tabulaires.
+    Retourne (texte, nombre d'exercices retenus, tokens utilisés).
+    """
+    if format_exercices in format_contexte.FORMATS_TABLEAU:
+        return emballer_tableau(
+            format_contexte.exercices_en_tableau(exercices), budget_tokens, texte_vide,
+            format_exercices, ignorer_trop_longues=True
+        )
+
+    retenus = {}
+    tokens = 0
+    nb_retenus = 0
+    for categorie in exercices:
+        for exercice in categorie['exercises']:
+            cout = estimer_tokens(format_contexte.formater_exercice(exercice, format_exercices))
+            if tokens + cout > budget_tokens:
+                continue
+            cle = (categorie['category'], categorie['level'])
+            if cle not in retenus:
+                retenus[cle] = {'category': categorie['category'], 'level': categorie['level'], 'exercises': []}
+            retenus[cle]['exercises'].append(exercice)
+            tokens += cout
+            nb_retenus += 1
+
+    if not retenus:
+        return texte_vide, 0, estimer_tokens(texte_vide)
+    texte = format_contexte.formater_groupes_exercices(list(retenus.values()), format_exercices)
+    return texte, nb_retenus, estimer_tokens(texte)
+
+def preparer_contexte(generation_type, formations_df, modules_df, exercices, requete, formats=None):
+    """
+    Construit les sections formations / modules / exercices du prompt dans le budget du type de contenu.
+    formats remplace le format de certaines sections ({"modules": "texte"}, voir FORMATS_SECTIONS).
+    Retourne (contexte, rapport) : contexte contient les variables du prompt, rapport les tokens par section.
+    """
+    budget = budget_pour(generation_type)
+    formats = {**FORMATS_SECTIONS, **(formats or {})}
+
+    formations_texte, nb_formations, tokens_formations = emballer_tableau(
+        classer_formations(formations_df, requete), budget['formations'], "Aucune formation chargée",
+        formats['formations'])
+    modules_texte, nb_modules, tokens_modules = emballer_tableau(
+        modules_df, budget['modules'], "Aucun module chargé", formats['modules'])
+    exercices_texte, nb_exercices, tokens_exercices = emballer_exercices(
+        exercices, budget['exercices'], "Aucun exercice chargé", formats['exercices'])
+
+    contexte = {
+        "formations_data": formations_texte,
+        "modules_data": modules_texte,
+        "exercises_data": exercices_texte,
+    }
+    rapport = {
+        "formations": {"tokens": tokens_formations, "budget": budget['formations'], "elements": nb_formations},
+        "modules": {"tokens": tokens_modules, "budget": budget['modules'], "elements": nb_modules},
+        "exercices": {"tokens": tokens_exercices, "budget": budget['exercices'], "elements": nb_exercices},
+    }
+    return contexte, rapport
+
+# =============================================================================
+# 3. TRONCATURE DE L'HISTORIQUE
+# =============================================================================
+
+def tronquer_historique(messages, budget_tokens, human_prefix="Human", ai_prefix="AI"):
+    """
+    Garde les messages les plus récents qui tiennent dans le budget, dans l'ordre chronologique.
+    Si le dernier message dépasse à lui seul le budget, il est coupé à sa fin. Budget nul ou négatif : aucun historique.
+    """
+    if budget_tokens <= 0:
+        return ''
+    lignes = []
+    tokens = 0
+    for message in reversed(messages):
+        prefixe = human_prefix if message.type == "human" else ai_prefix if message.type == "ai" else message.type
+        ligne = f"{prefixe}: {message.content}"
+        cout = estimer_tokens(ligne) + 1
+        if tokens + cout > budget_tokens:
+            if not lignes:
+                lignes.append(ligne[:max(budget_tokens * CARACTERES_PAR_TOKEN - 2, 0)] + " …")
+            break
+        lignes.append(ligne)
+        tokens += cout
+    return '\n'.join(reversed(lignes))
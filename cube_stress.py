@@ -0,0 +1,141 @@
+"""
+Cube de statistiques précalculées sur StressLevelDataset
+Distributions de chaque facteur, tableaux croisés facteur x stress_level et rangs de corrélation,
+calculés une fois de façon vectorisée et sauvegardés à côté des données. Le chatbot reçoit un bloc
+de contexte compact tiré de ce cube (recherches en O(1) par facteur) au lieu de lignes brutes.
+"""
+
+import os
+import re
+import json
+import numpy as np
+import donnees_stress
+
+CIBLE = "stress_level"
+NOM_JEU = "niveau_stress"
+FICHIER_CUBE = "cube.json"
+
+# Nombre de facteurs résumés quand la question n'en cite aucun
+NB_FACTEURS_RESUME = 5
+
+# =============================================================================
+# 1. CONSTRUCTION DU CUBE
+# =============================================================================
+
+def rangs(matrice):
+    """Rangs (moyens en cas d'égalité) de chaque colonne, pour la corrélation de Spearman"""
+    resultat = np.empty(matrice.shape, dtype=np.float64)
+    for j in range(matrice.shape[1]):
+        valeurs, inverse, effectifs = np.unique(matrice[:, j], return_inverse=True, return_counts=True)
+        fins = np.cumsum(effectifs)
+        resultat[:, j] = (fins - (effectifs - 1) / 2.0)[inverse]
+    return resultat
+
+def construire_cube(df, cible=CIBLE):
+    """Calcule le cube de statistiques du DataFrame (colonnes entières) par rapport à la colonne cible"""
+    facteurs = [c for c in df.columns if c != cible]
+    matrice = df[facteurs].to_numpy(dtype=np.int64)
+    y = df[cible].to_numpy(dtype=np.int64)
+    niveaux_cible = np.unique(y)
+    indices_cible = np.searchsorted(niveaux_cible, y)
+    n = len(y)
+
+    complet = np.column_stack([matrice, y]).astype(np.float64)
+    pearson = np.corrcoef(complet, rowvar=False)[:-1, -1]
+    spearman = np.corrcoef(rangs(complet), rowvar=False)[:-1, -1]
+    ordre = np.argsort(-np.abs(np.nan_to_num(spearman)), kind='stable')
+    rang = np.empty(len(facteurs), dtype=np.int64)
+    rang[ordre] = np.arange(1, len(facteurs) + 1)
+
+    cube = {
+        "cible": cible,
+        "lignes": int(n),
+        "niveaux_cible": niveaux_cible.tolist(),
+        "distribution_cible": (np.bincount(indices_cible, minlength=len(niveaux_cible)) / n).round(4).tolist(),
+        "facteurs": {},
+    }
+    for j, facteur in enumerate(facteurs):
+        valeurs, codes = np.unique(matrice[:, j], return_inverse=True)
+        # Tableau croisé valeur x niveau de stress en un seul bincount
+        croise = np.bincount(codes * len(niveaux_cible) + indices_cible,
+                             minlength=len(valeurs) * len(niveaux_cible)).reshape(len(valeurs), len(niveaux_cible))
+        effectifs = croise.sum(axis=1)
+        cube["facteurs"][facteur] = {
+            "valeurs": valeurs.tolist(),
+            "effectifs": effectifs.tolist(),
+            "distribution": (effectifs / n).round(4).tolist(),
+            "tableau_croise": croise.tolist(),
+            "stress_moyen": (croise @ niveaux_cible / np.maximum(effectifs, 1)).round(3).tolist(),
+            "pearson": round(float(pearson[j]), 4),
+            "spearman": round(float(spearman[j]), 4),
+            "rang_correlation": int(rang[j]),
+        }
+    cube["classement"] = [facteurs[j] for j in ordre]
+    return cube
+
+# =============================================================================
+# 2. PERSISTANCE
+# =============================================================================
+
+def charger_ou_construire_cube(dossier=None):
+    """Charge le cube sauvegardé à côté des données, ou le reconstruit si le CSV a changé"""
+    df = donnees_stress.charger(NOM_JEU, dossier)
+    manifeste = donnees_stress.manifeste_a_jour(NOM_JEU, dossier)
+    chemin = os.path.join(donnees_stress.chemin_colonnaire(NOM_JEU, dossier), FICHIER_CUBE)
+
+    if os.path.exists(chemin):
+        with open(chemin, 'r', encoding='utf-8') as f:
+            cube = json.load(f)
+        if cube.get("sha256_source") == manifeste["sha256"]:
+            return cube
+
+    cube = construire_cube(df)
+    cube["sha256_source"] = manifeste["sha256"]
+    with open(chemin + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(cube, f, ensure_ascii=False)
+    os.replace(chemin + ".tmp", chemin)
+    return cube
+
+# =============================================================================
+# 3. BLOC DE CONTEXTE POUR LE PROMPT
+# =============================================================================
+
+def facteurs_cites(cube, question):
+    """Facteurs du cube mentionnés dans la question ('sleep_quality' ou 'sleep quality')"""
+    texte = re.sub(r'[\s\-]+', '_', question.lower())
+    return [f for f in cube["facteurs"] if f in texte]
+
+def bloc_facteur(cube, facteur):
+    """Bloc compact pour un facteur : corrélations et répartition du stress par valeur"""
+    infos = cube["facteurs"][facteur]
+    niveaux = cube["niveaux_cible"]
+    lignes = [
+        f"## {facteur} (spearman={infos['spearman']}, pearson={infos['pearson']}, "
+        f"rang {infos['rang_correlation']}/{len(cube['facteurs'])})",
+        f"value,n,mean_{cube['cible']}," + ",".join(f"pct_{cube['cible']}_{v}" for v in niveaux),
+    ]
+    for valeur, effectif, moyenne, ligne in zip(infos["valeurs"], infos["effectifs"], infos["stress_moyen"], infos["tableau_croise"]):
+        pourcentages = ",".join(f"{100 * c / effectif:.0f}" for c in ligne) if effectif else ",".join("0" for _ in ligne)
+        lignes.append(f"{valeur},{effectif},{moyenne},{pourcentages}")
+    return "\n".join(lignes)
+
+def bloc_contexte(cube, question):
+    """
+    Contexte envoyé au LLM : taille de la population, distribution de la cible, puis le détail des facteurs
+    cités dans la question (ou un résumé des facteurs les plus corrélés si aucun n'est cité).
+    """
+    cible = cube["cible"]
+    distribution = ", ".join(f"{v}: {100 * p:.1f}%" for v, p in zip(cube["niveaux_cible"], cube["distribution_cible"]))
+    lignes = [
+        f"StressLevelDataset: {cube['lignes']} students, {len(cube['facteurs'])} factors.",
+        f"{cible} distribution: {distribution}",
+    ]
+
+    cites = facteurs_cites(cube, question)
+    if cites:
+        lignes.extend(bloc_facteur(cube, f) for f in cites)
+    else:
+        lignes.append(f"Factors most correlated with {cible} (spearman):")
+        for facteur in cube["classement"][:NB_FACTEURS_RESUME]:
+            lignes.append(f"- {facteur}: {cube['facteurs'][facteur]['spearman']}")
+    return "\n".join(lignes)
@@ -0,0 +1,156 @@
+"""
+Chargement des jeux de données Student Stress Monitoring
+Chaque CSV est converti une seule fois en un format colonnaire sur disque (un fichier .npy par colonne,
+types compacts : les réponses aux questionnaires tiennent en int8, les textes répétés sont encodés
+en catégories). Les chargements suivants projettent les colonnes en mémoire (memory-map) au lieu de
+reparser le CSV ; la conversion est refaite si la date de modification et le contenu du CSV changent.
+
+Le dossier des données se configure avec la variable d'environnement STRESS_DATA_DIR.
+"""
+
+import os
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+
+DOSSIER_PAR_DEFAUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Student Stress Monitoring Datasets")
+
+# Noms courts des jeux de données -> fichiers CSV
+JEUX_DE_DONNEES = {
+    "stress": "Stress_Dataset.csv",
+    "niveau_stress": "StressLevelDataset.csv",
+}
+
+SOUS_DOSSIER_COLONNAIRE = ".colonnaire"
+VERSION_FORMAT = 1
+
+
+def dossier_donnees():
+    """Dossier contenant les CSV (STRESS_DATA_DIR ou le dossier du dépôt)"""
+    return os.environ.get("STRESS_DATA_DIR", DOSSIER_PAR_DEFAUT)
+
+def chemin_csv(nom, dossier=None):
+    return os.path.join(dossier or dossier_donnees(), JEUX_DE_DONNEES[nom])
+
+def chemin_colonnaire(nom, dossier=None):
+    return os.path.join(dossier or dossier_donnees(), SOUS_DOSSIER_COLONNAIRE, nom)
+
+def empreinte_fichier(chemin):
+    """Hash SHA-256 du contenu d'un fichier"""
+    empreinte = hashlib.sha256()
+    with open(chemin, 'rb') as f:
+        for bloc in iter(lambda: f.read(1024 * 1024), b''):
+            empreinte.update(bloc)
+    return empreinte.hexdigest()
+
+def signature(nom, dossier=None):
+    """(taille, date de modification) du CSV : clé de cache bon marché pour Streamlit"""
+    stat = os.stat(chemin_csv(nom, dossier))
+    return stat.st_size, stat.st_mtime_ns
+
+# =============================================================================
+# 1. CONVERSION CSV -> FORMAT COLONNAIRE
+# =============================================================================
+
+def compacter_colonne(serie):
+    """Retourne (tableau NumPy compact, catégories ou None) pour une colonne"""
+    if pd.api.types.is_integer_dtype(serie) or pd.api.types.is_bool_dtype(serie):
+        return pd.to_numeric(serie, downcast='integer').to_numpy(), None
+    if pd.api.types.is_float_dtype(serie):
+        entiers = serie.dropna()
+        if len(entiers) == len(serie) and (entiers == entiers.round()).all():
+            return pd.to_numeric(serie.astype('int64'), downcast='integer').to_numpy(), None
+        return serie.astype(np.float32).to_numpy(), None
+
+    categories = pd.Categorical(serie.astype(object).where(serie.notna(), None))
+    codes = categories.codes
+    type_codes = np.int8 if len(categories.categories) < 127 else np.int16 if len(categories.categories) < 32767 else np.int32
+    return codes.astype(type_codes), [str(c) for c in categories.categories]
+
+def convertir(nom, dossier=None):
+    """Convertit le CSV au format colonnaire et écrit le manifeste décrivant les colonnes"""
+    source = chemin_csv(nom, dossier)
+    destination = chemin_colonnaire(nom, dossier)
+    os.makedirs(destination, exist_ok=True)
+
+    df = pd.read_csv(source)
+    colonnes = []
+    for i, colonne in enumerate(df.columns):
+        valeurs, categories = compacter_colonne(df[colonne])
+        fichier = f"col_{i:03d}.npy"
+        np.save(os.path.join(destination, fichier), np.ascontiguousarray(valeurs))
+        colonnes.append({"nom": colonne, "fichier": fichier, "dtype": str(valeurs.dtype), "categories": categories})
+
+    stat = os.stat(source)
+    manifeste = {
+        "version": VERSION_FORMAT,
+        "source": os.path.basename(source),
+        "taille": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": empreinte_fichier(source),
+        "lignes": len(df),
+        "colonnes": colonnes,
+    }
+    ecrire_manifeste(destination, manifeste)
+    return manifeste
+
+def ecrire_manifeste(destination, manifeste):
+    chemin = os.path.join(destination, "manifeste.json")
+    with open(chemin + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(manifeste, f, ensure_ascii=False, indent=2)
+    os.replace(chemin + ".tmp", chemin)
+
+def manifeste_a_jour(nom, dossier=None):
+    """
+    Retourne le manifeste s'il correspond encore au CSV, sinon None.
+    Si seule la date de modification a changé (contenu identique), le manifeste est mis à jour sans reconversion.
+    """
+    destination = chemin_colonnaire(nom, dossier)
+    try:
+        with open(os.path.join(destination, "manifeste.json"), 'r', encoding='utf-8') as f:
+            manifeste = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifeste.get("version") != VERSION_FORMAT:
+        return None
+
+    source = chemin_csv(nom, dossier)
+    stat = os.stat(source)
+    if stat.st_size == manifeste["taille"] and stat.st_mtime_ns == manifeste["mtime_ns"]:
+        return manifeste
+    if stat.st_size == manifeste["taille"] and empreinte_fichier(source) == manifeste["sha256"]:
+        manifeste["mtime_ns"] = stat.st_mtime_ns
+        ecrire_manifeste(destination, manifeste)
+        return manifeste
+    return None
+
+# =============================================================================
+# 2. CHARGEMENT
+# =============================================================================
+
+def charger(nom, dossier=None):
+    """Charge un jeu de données ('stress' ou 'niveau_stress') depuis le format colonnaire, en le (re)convertissant si besoin"""
+    manifeste = manifeste_a_jour(nom, dossier) or convertir(nom, dossier)
+    destination = chemin_colonnaire(nom, dossier)
+
+    colonnes = {}
+    for colonne in manifeste["colonnes"]:
+        valeurs = np.load(os.path.join(destination, colonne["fichier"]), mmap_mode='r')
+        if colonne["categories"] is not None:
+            colonnes[colonne["nom"]] = pd.Categorical.from_codes(valeurs, categories=colonne["categories"])
+        else:
+            colonnes[colonne["nom"]] = valeurs
+    return pd.DataFrame(colonnes, copy=False)
+
+def charger_tout(dossier=None):
+    """Charge tous les jeux de données : dictionnaire nom -> DataFrame"""
+    return {nom: charger(nom, dossier) for nom in JEUX_DE_DONNEES}
+
+
+if __name__ == "__main__":
+    for nom in JEUX_DE_DONNEES:
+        manifeste = convertir(nom)
+        df = charger(nom)
+        print(f"✅ {manifeste['source']} : {manifeste['lignes']} lignes, {len(manifeste['colonnes'])} colonnes, "
+              f"{df.memory_usage(deep=True).sum() / 1024:.0f} Ko en mémoire")
@@ -0,0 +1,115 @@
+"""
+Génération en flux (streaming) avec mesure de la latence perçue
+Le texte est produit morceau par morceau ; le temps jusqu'au premier token et le débit
+(tokens/seconde) sont mesurés pour chaque génération.
+"""
+
+import time
+from langchain_core.globals import get_llm_cache
+from langchain_core.load import dumps
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration
+from contexte_prompt import estimer_tokens
+import coalescence
+
+
+class MesureFlux:
+    """Chronométrage d'une génération en flux"""
+
+    def __init__(self):
+        self.debut = time.perf_counter()
+        self.premier_token = None
+        self.fin = None
+        self.tokens_sortie = 0
+        self.depuis_cache = False
+        self.coalesce = False
+
+    def marquer_morceau(self):
+        if self.premier_token is None:
+            self.premier_token = time.perf_counter()
+
+    def terminer(self, texte, tokens_sortie=None):
+        self.fin = time.perf_counter()
+        self.tokens_sortie = tokens_sortie or estimer_tokens(texte)
+
+    def en_dict(self):
+        """Métriques de la génération : ttft_s, duree_s, tokens_sortie, tokens_par_seconde"""
+        fin = self.fin or time.perf_counter()
+        premier_token = self.premier_token or fin
+        duree_flux = fin - premier_token
+        return {
+            "ttft_s": round(premier_token - self.debut, 3),
+            "duree_s": round(fin - self.debut, 3),
+            "tokens_sortie": self.tokens_sortie,
+            "tokens_par_seconde": round(self.tokens_sortie / duree_flux, 1) if duree_flux > 0 else None,
+            "depuis_cache": self.depuis_cache,
+            "coalesce": self.coalesce,
+        }
+
+
+def generer_en_flux(llm, prompt_value, mesure):
+    """
+    Générateur des morceaux de texte produits par le modèle pour le prompt.
+    Le cache LangChain global (set_llm_cache) est consulté avant l'appel, et la réponse complète
+    y est enregistrée à la fin du flux : le streaming partage ainsi les entrées du cache avec invoke().
+    Si le même prompt est déjà en cours de génération dans une autre session, on attend son résultat
+    au lieu de lancer un second appel.
+    """
+    messages = prompt_value.to_messages()
+    cache = get_llm_cache()
+    prompt_cache = dumps(messages)
+    llm_string = llm._get_llm_string()
+
+    if cache is not None:
+        generations = cache.lookup(prompt_cache, llm_string)
+        if generations:
+            mesure.depuis_cache = True
+            mesure.marquer_morceau()
+            texte = generations[0].text
+            yield texte
+            mesure.terminer(texte)
+            return
+
+    cle = coalescence.cle_appel(llm, messages)
+    while True:
+        appel, responsable = coalescence.appels_llm.rejoindre(cle)
+        if responsable:
+            break
+        try:
+            texte = coalescence.SingleFlight.attendre(appel)
+        except coalescence.AppelAbandonne:
+            # Le responsable a été interrompu : la clé est libre, l'un des appels en attente la reprend
+            continue
+        mesure.coalesce = True
+        mesure.marquer_morceau()
+        yield texte
+        mesure.terminer(texte)
+        return
+
+    morceaux = []
+    usage = None
+    try:
+        for morceau in llm.stream(messages):
+            if getattr(morceau, 'usage_metadata', None):
+                usage = morceau.usage_metadata
+            if not morceau.content:
+                continue
+            mesure.marquer_morceau()
+            morceaux.append(morceau.content)
+            yield morceau.content
+    except Exception as e:
+        coalescence.appels_llm.terminer(cle, appel, erreur=e)
+        raise
+    except BaseException:
+        # Flux fermé avant la fin (GeneratorExit) ou script interrompu : un appel en attente reprend
+        coalescence.appels_llm.terminer(cle, appel, abandonne=True)
+        raise
+
+    texte = ''.join(morceaux)
+    mesure.terminer(texte, usage.get('output_tokens') if usage else None)
+    try:
+        if cache is not None:
+            cache.update(prompt_cache, llm_string, [ChatGeneration(message=AIMessage(content=texte))])
+    finally:
+        # Clé libérée une fois la réponse en cache : un appel arrivé entre-temps la trouve dans le cache
+        coalescence.appels_llm.terminer(cle, appel, resultat=texte)
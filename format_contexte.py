@@ -0,0 +1,293 @@
+"""
+Formats de sérialisation des tableaux envoyés dans les prompts
+DataFrame.to_string() aligne chaque colonne sur sa valeur la plus longue et json.dumps(indent=2) indente
+chaque clé : une bonne part des tokens du contexte part en espaces. Les formats compacts écrivent l'entête
+une seule fois, séparent les cellules par une virgule ou une tabulation et peuvent remplacer les valeurs
+répétées (source, niveau, domaine...) par un code court défini une fois en tête du tableau.
+
+Les formats sont sans perte (decoder_tableau relit les cellules) ; le script mesure les tokens de chaque
+format, section par section, sur le catalogue :
+
+Usage : python format_contexte.py [--demande "..."] [--type "Cours complet"] [--json formats.json]
+"""
+
+import argparse
+import csv
+import io
+import json
+import re
+import pandas as pd
+
+# Formats des sections tabulaires (formations, modules)
+FORMATS_TABLEAU = ("texte", "csv", "tsv", "dictionnaire")
+# Formats des exercices : JSON groupé par catégorie, ou tableau à plat (une ligne par exercice)
+FORMATS_EXERCICES = ("json_indente", "json") + FORMATS_TABLEAU
+
+# Une colonne est codée si ses valeurs se répètent (au plus une valeur distincte pour 2 lignes)
+# et sont assez longues pour qu'un code les raccourcisse
+REPETITION_MAX = 0.5
+LONGUEUR_MIN_CODEE = 4
+
+_LIGNE_CODE = re.compile(r'^(([A-Z][a-z]*)\d+)=(.*)$')
+
+# =============================================================================
+# 1. CELLULES
+# =============================================================================
+
+def cellule(valeur):
+    """Texte d'une cellule : vide pour une valeur manquante, listes jointes par ' | ', flottants sans zéros inutiles"""
+    if isinstance(valeur, (list, tuple)):
+        return " | ".join(cellule(v) for v in valeur)
+    if valeur is None or (not isinstance(valeur, str) and pd.isna(valeur)):
+        return ""
+    if isinstance(valeur, float):
+        return f"{valeur:g}"
+    return str(valeur)
+
+def _echapper(texte):
+    """Tabulations et retours à la ligne écrits comme en JSON : une ligne du tableau = une ligne de texte"""
+    return texte.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+def _desechapper(texte):
+    return re.sub(r'\\([\\tnr])', lambda m: {'\\': '\\', 't': '\t', 'n': '\n', 'r': '\r'}[m.group(1)], texte)
+
+def _joindre(valeurs, format_tableau):
+    valeurs = [_echapper(v) for v in valeurs]
+    if format_tableau == "csv":
+        tampon = io.StringIO()
+        csv.writer(tampon, lineterminator='').writerow(valeurs)
+        return tampon.getvalue()
+    return '\t'.join(valeurs)
+
+def _separer(ligne, format_tableau):
+    valeurs = next(csv.reader([ligne])) if format_tableau == "csv" else ligne.split('\t')
+    return [_desechapper(v) for v in valeurs]
+
+# =============================================================================
+# 2. MISE EN FORME ET RELECTURE DES TABLEAUX
+# =============================================================================
+
+def colonnes_codees(df):
+    """Colonnes texte dont les valeurs répétées gagnent à être remplacées par un code"""
+    colonnes = []
+    for colonne in df.columns:
+        valeurs = [cellule(v) for v in df[colonne]]
+        remplies = [v for v in valeurs if v]
+        if not remplies or df[colonne].dtype.kind in 'iufb':
+            continue
+        if (len(set(remplies)) <= len(remplies) * REPETITION_MAX
+                and sum(map(len, remplies)) / len(remplies) >= LONGUEUR_MIN_CODEE
+                and not any('=' in v or '\n' in v for v in remplies)):
+            colonnes.append(colonne)
+    return colonnes
+
+def _prefixes(colonnes):
+    """
+    Préfixe des codes de chaque colonne, unique dans le tableau : initiale en majuscule, allongée d'une lettre
+    tant qu'elle est déjà prise (station, statut, stage -> S, St, Sta). Calculé sur toutes les colonnes de
+    l'entête pour que decoder_tableau retrouve la colonne de chaque code.
+    """
+    prefixes = {}
+    for colonne in colonnes:
+        lettres = ''.join(c for c in str(colonne) if c.isascii() and c.isalpha()) or 'C'
+        longueur = 1
+        prefixe = lettres[0].upper()
+        while prefixe in prefixes.values():
+            longueur += 1
+            prefixe = lettres[0].upper() + (lettres[1:longueur].lower() if longueur <= len(lettres) else lettres[1:].lower() + 'x' * (longueur - len(lettres)))
+        prefixes[colonne] = prefixe
+    return prefixes
+
+def lignes_tableau(df, format_tableau):
+    """
+    Met en forme un DataFrame ligne par ligne pour remplir un budget de tokens.
+    Retourne (entête, [(ligne, codes utilisés)]) ; chaque code est une ligne 'S1=Kaggle Learn' à placer avant
+    l'entête (format 'dictionnaire' seulement). Les colonnes entièrement vides sont omises des formats compacts.
+    """
+    if format_tableau == "texte":
+        lignes = df.to_string(index=False).split('\n')
+        return lignes[0], [(ligne, ()) for ligne in lignes[1:]]
+    if format_tableau not in FORMATS_TABLEAU:
+        raise ValueError(f"Format de tableau inconnu : {format_tableau} (formats : {', '.join(FORMATS_TABLEAU)})")
+
+    colonnes = [c for c in df.columns if any(cellule(v) for v in df[c])]
+    codees = colonnes_codees(df[colonnes]) if format_tableau == "dictionnaire" else []
+    prefixes = _prefixes(colonnes)
+    codes = {colonne: {} for colonne in codees}
+
+    lignes = []
+    for valeurs in df[colonnes].itertuples(index=False, name=None):
+        textes, utilises = [], []
+        for colonne, valeur in zip(colonnes, valeurs):
+            texte = cellule(valeur)
+            if colonne in codes and texte:
+                if texte not in codes[colonne]:
+                    codes[colonne][texte] = f"{prefixes[colonne]}{len(codes[colonne]) + 1}"
+                code = codes[colonne][texte]
+                utilises.append(f"{code}={texte}")
+                texte = code
+            textes.append(texte)
+        lignes.append((_joindre(textes, format_tableau), tuple(utilises)))
+    return _joindre([str(c) for c in colonnes], format_tableau), lignes
+
+def assembler_tableau(entete, lignes):
+    """Texte du tableau : codes utilisés (dans l'ordre d'apparition), entête puis lignes"""
+    codes = dict.fromkeys(code for _, utilises in lignes for code in utilises)
+    return '\n'.join([*codes, entete, *(ligne for ligne, _ in lignes)])
+
+def formater_tableau(df, format_tableau):
+    """Tableau complet dans le format demandé"""
+    return assembler_tableau(*lignes_tableau(df, format_tableau))
+
+def decoder_tableau(texte, format_tableau):
+    """
+    Relit un tableau compact : liste de dictionnaires {colonne: texte de la cellule}. Seules les cellules des
+    colonnes codées (celles dont le préfixe a des codes) sont remplacées : une valeur d'une autre colonne qui
+    ressemble à un code reste telle quelle.
+    """
+    lignes = texte.split('\n')
+    codes = {}
+    while lignes and _LIGNE_CODE.match(lignes[0]):
+        code, prefixe, valeur = _LIGNE_CODE.match(lignes.pop(0)).groups()
+        codes.setdefault(prefixe, {})[code] = valeur
+    if not lignes:
+        return []
+    colonnes = _separer(lignes[0], format_tableau)
+    prefixes = _prefixes(colonnes)
+    codes_colonnes = [codes.get(prefixes[colonne], {}) for colonne in colonnes]
+    return [
+        {colonne: codes_colonne.get(valeur, valeur)
+         for colonne, codes_colonne, valeur in zip(colonnes, codes_colonnes, _separer(ligne, format_tableau))}
+        for ligne in lignes[1:]
+    ]
+
+# =============================================================================
+# 3. EXERCICES
+# =============================================================================
+
+def exercices_en_tableau(exercices):
+    """Exercices groupés par catégorie (format de exercices_reels.json) -> une ligne par exercice"""
+    return pd.DataFrame([
+        {'category': categorie['category'], 'level': categorie['level'], **exercice}
+        for categorie in exercices for exercice in categorie['exercises']
+    ])
+
+def formater_exercice(exercice, format_exercices):
+    """Un exercice en JSON (indenté ou compact), tel qu'écrit dans le groupe de sa catégorie"""
+    if format_exercices == "json_indente":
+        return json.dumps(exercice, ensure_ascii=False, indent=2)
+    return json.dumps(exercice, ensure_ascii=False, separators=(',', ':'))
+
+def formater_groupes_exercices(groupes, format_exercices):
+    if format_exercices == "json_indente":
+        return json.dumps(groupes, ensure_ascii=False, indent=2)
+    return json.dumps(groupes, ensure_ascii=False, separators=(',', ':'))
+
+# =============================================================================
+# 4. MESURE SUR LE CATALOGUE
+# =============================================================================
+
+def verifier_sans_perte(df, format_tableau):
+    """Vrai si le tableau relu redonne toutes les cellules non vides du DataFrame"""
+    if format_tableau == "texte":
+        return None
+    attendu = [{c: cellule(v) for c, v in ligne.items() if cellule(v)} for ligne in df.to_dict('records')]
+    relu = [{c: v for c, v in ligne.items() if v} for ligne in decoder_tableau(formater_tableau(df, format_tableau), format_tableau)]
+    return attendu == relu
+
+def mesurer_formats(base, index, demandes, generation_type, formats_sections=None):
+    """
+    Tokens de chaque section du prompt dans chaque format, sur les demandes données.
+    Retourne {section: {format: {"tokens", "elements", "tokens_par_element", "sans_perte"}}}.
+    """
+    import contexte_prompt
+    import noyau_pedagogique
+
+    sections = {
+        "formations": FORMATS_TABLEAU,
+        "modules": FORMATS_TABLEAU,
+        "exercices": FORMATS_EXERCICES,
+    }
+    # Sans perte : vérifié sur les lignes du catalogue elles-mêmes (jusqu'à MAX_CANDIDATS lignes)
+    echantillons = {
+        "formations": base.formations(limite=contexte_prompt.MAX_CANDIDATS),
+        "modules": base.modules(limite=contexte_prompt.MAX_CANDIDATS),
+        "exercices": exercices_en_tableau(base.exercices())[:contexte_prompt.MAX_CANDIDATS],
+    }
+
+    resultats = {}
+    for section, formats in sections.items():
+        resultats[section] = {}
+        for format_section in formats:
+            tokens = elements = 0
+            for demande, domaine, niveau in demandes:
+                requete = noyau_pedagogique.requete_index(demande, domaine, niveau)
+                preparation = noyau_pedagogique.preparer_generation_base(
+                    index, base, generation_type, domaine, niveau, requete,
+                    formats={**(formats_sections or {}), section: format_section}
+                )
+                rapport = preparation["rapport_tokens"][section]
+                tokens += rapport["tokens"]
+                elements += rapport["elements"]
+            resultats[section][format_section] = {
+                "tokens": tokens,
+                "elements": elements,
+                "tokens_par_element": round(tokens / elements, 1) if elements else None,
+                "sans_perte": verifier_sans_perte(echantillons[section], format_section)
+                if format_section in FORMATS_TABLEAU and not echantillons[section].empty else None,
+            }
+    return resultats
+
+def format_recommande(mesures, actuel=None):
+    """Format le moins coûteux par élément parmi ceux qui relisent le tableau sans perte (ou JSON), l'actuel à égalité"""
+    candidats = [
+        (infos["tokens_par_element"], nom != actuel, nom) for nom, infos in mesures.items()
+        if infos["tokens_par_element"] is not None and infos["sans_perte"] is not False and nom != "texte"
+    ]
+    return min(candidats)[2] if candidats else None
+
+
+if __name__ == "__main__":
+    import contexte_prompt
+    import index_catalogue
+    import noyau_pedagogique
+
+    parser = argparse.ArgumentParser(description="Tokens des sections du prompt dans chaque format de sérialisation")
+    parser.add_argument("--demande", action="append", help="Demande à préparer (répétable ; exemples de l'application par défaut)")
+    parser.add_argument("--domaine", default="Tous")
+    parser.add_argument("--niveau", default="Tous")
+    parser.add_argument("--type", default="Cours complet", choices=list(contexte_prompt.BUDGETS_PAR_TYPE))
+    parser.add_argument("--json", help="Écrire les mesures dans ce fichier JSON")
+    arguments = parser.parse_args()
+
+    base, reelles = noyau_pedagogique.ouvrir_base_catalogue()
+    if not reelles:
+        print("⚠️ Catalogue réel absent : mesure sur les données d'exemple (lancez collecte_donnees.py)")
+    index = index_catalogue.charger_ou_construire_index_base(base)
+    demandes = [(d, arguments.domaine, arguments.niveau) for d in (arguments.demande or [
+        "Génère un cours complet sur Python avec tous les modules réels et exercices",
+        "Crée une formation Pandas en utilisant les vrais modules et exercices",
+        "Génère un quiz sur Machine Learning basé sur les vraies leçons",
+        "Exercices pratiques sur les fonctions et les chaînes de caractères",
+    ])]
+
+    mesures = mesurer_formats(base, index, demandes, arguments.type)
+    print(f"\n📏 Tokens du contexte par format ({len(demandes)} demandes, type « {arguments.type} »)")
+    ecarts = 0
+    for section, formats in mesures.items():
+        actuel = contexte_prompt.FORMATS_SECTIONS[section]
+        recommande = format_recommande(formats, actuel)
+        print(f"\n   {section} (format actuel : {actuel})")
+        for nom, infos in formats.items():
+            par_element = f"{infos['tokens_par_element']:6.1f}" if infos['tokens_par_element'] is not None else "   N/A"
+            perte = {True: "✅ sans perte", False: "❌ perte", None: ""}[infos["sans_perte"]]
+            repere = " ⭐" if nom == recommande else ""
+            print(f"   {nom:>13} : {infos['tokens']:6d} tokens, {infos['elements']:4d} éléments, {par_element} tokens/élément {perte}{repere}")
+        if recommande and recommande != actuel and formats[recommande]["tokens_par_element"] < formats[actuel]["tokens_par_element"]:
+            ecarts += 1
+            print(f"   💡 {recommande} est moins coûteux que {actuel} pour cette section")
+
+    if arguments.json:
+        with open(arguments.json, 'w', encoding='utf-8') as f:
+            json.dump(mesures, f, ensure_ascii=False, indent=2)
+    print(f"\n{'✅ Formats actuels les moins coûteux' if not ecarts else f'💡 {ecarts} section(s) à revoir'}")
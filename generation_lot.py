@@ -0,0 +1,206 @@
+"""
+Génération de contenus pédagogiques par lots, sans interface Streamlit
+Lit un fichier JSONL de demandes (generation_type, domaine, niveau, duree, format_sortie, user_input),
+les exécute en parallèle avec asyncio sous une limite de concurrence et écrit chaque résultat dès
+qu'il est prêt, dans le même format que course_data. Une exécution interrompue reprend là où elle
+s'était arrêtée : les demandes déjà présentes dans le fichier de sortie sont ignorées.
+
+Usage : python generation_lot.py demandes.jsonl --sortie cours_generes.jsonl --concurrence 8
+        python generation_lot.py demandes.jsonl --bouchon   (LLM local simulé, sans appel à Gemini)
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+from langchain.prompts import ChatPromptTemplate
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+import index_catalogue
+import noyau_pedagogique
+import clients_llm
+
+CHAMPS_DEMANDE = ('generation_type', 'domaine', 'niveau', 'duree', 'format_sortie', 'user_input')
+
+# =============================================================================
+# 1. LLM LOCAL SIMULÉ
+# =============================================================================
+
+class LLMBouchon(BaseChatModel):
+    """Modèle de chat local qui répond après un délai fixe, pour tester la génération par lots hors-ligne"""
+
+    delai_secondes: float = 0.05
+
+    @property
+    def _llm_type(self):
+        return "bouchon"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.delai_secondes)
+        return self._reponse(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.delai_secondes)
+        return self._reponse(messages)
+
+    def _reponse(self, messages):
+        prompt = messages[-1].content
+        demande = prompt.split("DEMANDE UTILISATEUR:", 1)[-1].split("\n", 1)[0].strip()
+        texte = f"# Contenu simulé\n\nDemande : {demande}\n\nPrompt de {len(prompt)} caractères."
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=texte))])
+
+# =============================================================================
+# 2. LECTURE DES DEMANDES ET REPRISE
+# =============================================================================
+
+def identifiant_demande(demande):
+    """Identifiant stable d'une demande : son champ job_id, ou un hash de ses paramètres"""
+    if demande.get('job_id'):
+        return str(demande['job_id'])
+    contenu = json.dumps([demande.get(champ) for champ in CHAMPS_DEMANDE], ensure_ascii=False)
+    return hashlib.sha256(contenu.encode('utf-8')).hexdigest()[:16]
+
+def lire_demandes(chemin):
+    """Lit le fichier JSONL des demandes (les lignes vides sont ignorées)"""
+    demandes = []
+    with open(chemin, 'r', encoding='utf-8') as f:
+        for numero, ligne in enumerate(f, 1):
+            if not ligne.strip():
+                continue
+            demande = json.loads(ligne)
+            manquants = [champ for champ in CHAMPS_DEMANDE if champ not in demande]
+            if manquants:
+                raise ValueError(f"Ligne {numero} : champs manquants {manquants}")
+            demandes.append(demande)
+    return demandes
+
+def demandes_terminees(chemin_sortie):
+    """Identifiants des demandes déjà écrites dans le fichier de sortie (une ligne tronquée est ignorée)"""
+    terminees = set()
+    if not os.path.exists(chemin_sortie):
+        return terminees
+    with open(chemin_sortie, 'r', encoding='utf-8') as f:
+        for ligne in f:
+            try:
+                terminees.add(json.loads(ligne)['job_id'])
+            except (ValueError, KeyError):
+                continue
+    return terminees
+
+def ligne_terminee(chemin_sortie):
+    """Le fichier de sortie se termine-t-il par un saut de ligne ?"""
+    with open(chemin_sortie, 'rb') as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+# =============================================================================
+# 3. EXÉCUTION CONCURRENTE
+# =============================================================================
+
+class GenerateurLot:
+    """Exécute les demandes avec un nombre borné d'appels au LLM en parallèle"""
+
+    def __init__(self, llm, base, concurrence=4):
+        self.llm = llm
+        self.base = base
+        self.index = index_catalogue.charger_ou_construire_index_base(base)
+        self.prompt_template = ChatPromptTemplate.from_template(noyau_pedagogique.pedagogical_template_real)
+        self.semaphore = asyncio.Semaphore(concurrence)
+        self.verrou_ecriture = asyncio.Lock()
+        self.reussites = 0
+        self.echecs = 0
+
+    def preparer(self, demande):
+        """Contexte et variables du prompt pour une demande (chaque demande est indépendante : pas d'historique)"""
+        requete = noyau_pedagogique.requete_index(demande['user_input'], demande['domaine'], demande['niveau'])
+        preparation = noyau_pedagogique.preparer_generation_base(
+            self.index, self.base, demande['generation_type'], demande['domaine'], demande['niveau'], requete
+        )
+        variables = noyau_pedagogique.variables_prompt(
+            preparation, demande['generation_type'], demande['domaine'], demande['niveau'],
+            demande['duree'], demande['format_sortie'], demande['user_input']
+        )
+        return preparation, self.prompt_template.format_prompt(**variables, chat_history="")
+
+    async def traiter(self, demande, sortie):
+        """Génère le contenu d'une demande et l'ajoute au fichier de sortie"""
+        async with self.semaphore:
+            debut = time.perf_counter()
+            try:
+                # Lecture SQLite, recherche et mise en forme synchrones : hors de la boucle d'événements, pour ne pas
+                # bloquer les appels au LLM des autres demandes (une connexion SQLite par thread, voir base_catalogue)
+                preparation, prompt_value = await asyncio.to_thread(self.preparer, demande)
+                reponse = await self.llm.ainvoke(prompt_value)
+            except Exception as e:
+                self.echecs += 1
+                print(f"❌ {identifiant_demande(demande)} : {e}", file=sys.stderr)
+                return
+
+            course_data = noyau_pedagogique.creer_course_data(
+                preparation, demande['generation_type'], demande['domaine'], demande['niveau'],
+                demande['duree'], demande['user_input'], reponse.content
+            )
+            course_data["job_id"] = identifiant_demande(demande)
+            course_data["format_sortie"] = demande['format_sortie']
+            course_data["duree_generation_s"] = round(time.perf_counter() - debut, 3)
+
+            async with self.verrou_ecriture:
+                sortie.write(json.dumps(course_data, ensure_ascii=False) + "\n")
+                sortie.flush()
+                os.fsync(sortie.fileno())
+            self.reussites += 1
+
+    async def executer(self, demandes, chemin_sortie):
+        """Exécute toutes les demandes non encore présentes dans le fichier de sortie"""
+        terminees = demandes_terminees(chemin_sortie)
+        a_faire = {}
+        for demande in demandes:
+            identifiant = identifiant_demande(demande)
+            if identifiant not in terminees:
+                a_faire.setdefault(identifiant, demande)
+
+        print(f"📋 {len(demandes)} demandes, {len(terminees)} déjà générées, {len(a_faire)} à générer")
+        with open(chemin_sortie, 'a', encoding='utf-8') as sortie:
+            # Dernière ligne tronquée par une interruption : les résultats suivants commencent sur une nouvelle ligne
+            if sortie.tell() > 0 and not ligne_terminee(chemin_sortie):
+                sortie.write("\n")
+            await asyncio.gather(*(self.traiter(demande, sortie) for demande in a_faire.values()))
+
+# =============================================================================
+# 4. SCRIPT D'EXÉCUTION
+# =============================================================================
+
+def creer_llm(arguments):
+    """LLM Gemini (clé dans GEMINI_API_KEY) ou LLM local simulé"""
+    if arguments.bouchon:
+        return LLMBouchon(delai_secondes=arguments.delai_bouchon)
+    return clients_llm.obtenir_llm(os.environ["GEMINI_API_KEY"], modele=arguments.modele, temperature=arguments.temperature)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Génération de contenus pédagogiques par lots")
+    parser.add_argument("demandes", help="Fichier JSONL des demandes")
+    parser.add_argument("--sortie", default="cours_generes.jsonl", help="Fichier JSONL des résultats (complété à chaque exécution)")
+    parser.add_argument("--concurrence", type=int, default=4, help="Nombre maximal d'appels au LLM en parallèle")
+    parser.add_argument("--modele", default="gemini-1.5-flash-latest")
+    parser.add_argument("--temperature", type=float, default=0.2)
+    parser.add_argument("--bouchon", action="store_true", help="Utiliser un LLM local simulé au lieu de Gemini")
+    parser.add_argument("--delai-bouchon", type=float, default=0.05, help="Délai de réponse du LLM simulé (secondes)")
+    arguments = parser.parse_args(argv)
+
+    base, reelles = noyau_pedagogique.ouvrir_base_catalogue(lambda niveau, message: print(f"{'✅' if niveau == 'succes' else '⚠️'} {message}"))
+    if not reelles:
+        print("📝 Utilisation de données d'exemple.")
+
+    generateur = GenerateurLot(creer_llm(arguments), base, concurrence=arguments.concurrence)
+    debut = time.perf_counter()
+    asyncio.run(generateur.executer(lire_demandes(arguments.demandes), arguments.sortie))
+    print(f"✅ {generateur.reussites} contenus générés, {generateur.echecs} échecs en {time.perf_counter() - debut:.1f}s")
+    print(f"📁 Résultats dans '{arguments.sortie}'")
+    return 0 if generateur.echecs == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
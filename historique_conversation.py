@@ -0,0 +1,273 @@
+"""
+Historique de conversation persistant (SQLite), partagé entre les sessions et les redémarrages
+Les messages sont ajoutés dans un tampon vidé par lots (une transaction pour plusieurs messages), relus
+page par page à la demande, et chaque session est limitée en nombre de messages et en ancienneté :
+la mémoire du serveur reste stable quel que soit le nombre d'utilisateurs ou la longueur des sessions.
+Le résumé courant de la conversation (memoire.MemoireResumee) est conservé à côté des messages.
+"""
+
+import atexit
+import json
+import sqlite3
+import threading
+import time
+from typing import List, Sequence
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+
+FICHIER_HISTORIQUE = 'historique_conversations.db'
+
+# Vidage du tampon dès TAILLE_LOT messages, ou au plus tard après DELAI_LOT_SECONDES
+TAILLE_LOT = 32
+DELAI_LOT_SECONDES = 1.0
+# Rétention par session
+MAX_MESSAGES_SESSION = 500
+MAX_AGE_SECONDES = 30 * 24 * 3600
+# Messages gardés en mémoire par session (les plus récents) et taille des pages relues
+FENETRE_MESSAGES = 40
+TAILLE_PAGE = 20
+
+
+class StockageHistorique:
+    """Table des messages de toutes les sessions, avec tampon d'écriture et rétention"""
+
+    def __init__(self, chemin=FICHIER_HISTORIQUE, max_messages_session=MAX_MESSAGES_SESSION,
+                 max_age_secondes=MAX_AGE_SECONDES, taille_lot=TAILLE_LOT):
+        self.chemin = chemin
+        self.max_messages_session = max_messages_session
+        self.max_age_secondes = max_age_secondes
+        self.taille_lot = taille_lot
+        self._local = threading.local()
+        self._verrou = threading.Lock()
+        self._tampon = []
+        self.lots_ecrits = 0
+        self.messages_ecrits = 0
+
+        connexion = self._connexion()
+        connexion.execute("PRAGMA journal_mode=WAL")
+        connexion.execute("""
+            CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session TEXT NOT NULL,
+                horodatage REAL NOT NULL,
+                message TEXT NOT NULL
+            )
+        """)
+        connexion.execute("CREATE INDEX IF NOT EXISTS idx_messages_session ON messages(session, id)")
+        connexion.execute("CREATE INDEX IF NOT EXISTS idx_messages_horodatage ON messages(horodatage)")
+        # messages_resumes : nombre de messages de la session (depuis le plus ancien conservé) repliés dans le résumé
+        connexion.execute("""
+            CREATE TABLE IF NOT EXISTS resumes (
+                session TEXT PRIMARY KEY,
+                resume TEXT NOT NULL,
+                messages_resumes INTEGER NOT NULL,
+                horodatage REAL NOT NULL
+            )
+        """)
+        connexion.commit()
+
+        # Vidage périodique du tampon, et à l'arrêt du processus
+        threading.Thread(target=self._vider_periodiquement, daemon=True, name="historique-lots").start()
+        atexit.register(self.vider_tampon)
+
+    def _connexion(self):
+        """Une connexion SQLite par thread (les threads de script Streamlit ne partagent pas de connexion)"""
+        connexion = getattr(self._local, 'connexion', None)
+        if connexion is None:
+            connexion = sqlite3.connect(self.chemin, timeout=30)
+            self._local.connexion = connexion
+        return connexion
+
+    def _vider_periodiquement(self):
+        while True:
+            time.sleep(DELAI_LOT_SECONDES)
+            self.vider_tampon()
+
+    # -------------------------------------------------------------------------
+    # Écriture par lots
+    # -------------------------------------------------------------------------
+
+    def ajouter(self, session, messages: Sequence[BaseMessage]):
+        """Place les messages dans le tampon ; écrit le lot immédiatement s'il est plein"""
+        maintenant = time.time()
+        with self._verrou:
+            self._tampon.extend((session, maintenant, json.dumps(message_to_dict(m), ensure_ascii=False)) for m in messages)
+            plein = len(self._tampon) >= self.taille_lot
+        if plein:
+            self.vider_tampon()
+
+    def vider_tampon(self):
+        """Écrit tous les messages en attente en une transaction, puis applique la rétention des sessions touchées"""
+        with self._verrou:
+            lot, self._tampon = self._tampon, []
+        if not lot:
+            return
+        connexion = self._connexion()
+        with connexion:
+            connexion.executemany("INSERT INTO messages (session, horodatage, message) VALUES (?, ?, ?)", lot)
+            for session in {ligne[0] for ligne in lot}:
+                self._appliquer_retention(connexion, session)
+        with self._verrou:
+            self.lots_ecrits += 1
+            self.messages_ecrits += len(lot)
+
+    def _appliquer_retention(self, connexion, session):
+        """
+        Supprime les messages trop anciens et ceux au-delà de max_messages_session pour la session.
+        Les messages supprimés sont les plus anciens, déjà repliés dans le résumé : sa position est décalée d'autant.
+        """
+        supprimes = connexion.execute(
+            "DELETE FROM messages WHERE session = ? AND horodatage < ?",
+            (session, time.time() - self.max_age_secondes)
+        ).rowcount
+        supprimes += connexion.execute("""
+            DELETE FROM messages WHERE session = ? AND id <= (
+                SELECT id FROM messages WHERE session = ? ORDER BY id DESC LIMIT 1 OFFSET ?
+            )
+        """, (session, session, self.max_messages_session)).rowcount
+        if supprimes:
+            connexion.execute(
+                "UPDATE resumes SET messages_resumes = MAX(messages_resumes - ?, 0) WHERE session = ?",
+                (supprimes, session)
+            )
+
+    # -------------------------------------------------------------------------
+    # Lecture paginée
+    # -------------------------------------------------------------------------
+
+    def page(self, session, avant_id=None, taille=TAILLE_PAGE):
+        """
+        Messages de la session antérieurs à avant_id (les plus récents si None), au plus `taille`.
+        Retourne (identifiants, messages) dans l'ordre chronologique.
+        """
+        self.vider_tampon()
+        requete = "SELECT id, message FROM messages WHERE session = ?"
+        parametres = [session]
+        if avant_id is not None:
+            requete += " AND id < ?"
+            parametres.append(avant_id)
+        lignes = self._connexion().execute(requete + " ORDER BY id DESC LIMIT ?", parametres + [taille]).fetchall()
+        lignes.reverse()
+        return [i for i, _ in lignes], messages_from_dict([json.loads(m) for _, m in lignes])
+
+    def compter(self, session):
+        self.vider_tampon()
+        return self._connexion().execute("SELECT COUNT(*) FROM messages WHERE session = ?", (session,)).fetchone()[0]
+
+    def supprimer_session(self, session):
+        self.vider_tampon()
+        connexion = self._connexion()
+        with connexion:
+            connexion.execute("DELETE FROM messages WHERE session = ?", (session,))
+            connexion.execute("DELETE FROM resumes WHERE session = ?", (session,))
+
+    def purger(self):
+        """Supprime les messages expirés de toutes les sessions, et les résumés des sessions expirées"""
+        limite = time.time() - self.max_age_secondes
+        connexion = self._connexion()
+        with connexion:
+            connexion.execute("DELETE FROM messages WHERE horodatage < ?", (limite,))
+            connexion.execute("DELETE FROM resumes WHERE horodatage < ?", (limite,))
+
+    # -------------------------------------------------------------------------
+    # Résumé courant
+    # -------------------------------------------------------------------------
+
+    def lire_resume(self, session):
+        """Résumé de la session et nombre de messages qu'il couvre ('', 0 si aucun)"""
+        ligne = self._connexion().execute(
+            "SELECT resume, messages_resumes FROM resumes WHERE session = ?", (session,)
+        ).fetchone()
+        return (ligne[0], ligne[1]) if ligne else ("", 0)
+
+    def ecrire_resume(self, session, resume, messages_resumes):
+        connexion = self._connexion()
+        with connexion:
+            connexion.execute(
+                "INSERT OR REPLACE INTO resumes (session, resume, messages_resumes, horodatage) VALUES (?, ?, ?, ?)",
+                (session, resume, messages_resumes, time.time())
+            )
+
+    def statistiques(self):
+        self.vider_tampon()
+        sessions, messages = self._connexion().execute(
+            "SELECT COUNT(DISTINCT session), COUNT(*) FROM messages"
+        ).fetchone()
+        return {
+            "sessions": sessions,
+            "messages": messages,
+            "lots_ecrits": self.lots_ecrits,
+            "messages_par_lot": round(self.messages_ecrits / self.lots_ecrits, 1) if self.lots_ecrits else 0.0,
+        }
+
+
+class HistoriqueSQLite(BaseChatMessageHistory):
+    """
+    Historique LangChain d'une session adossé au StockageHistorique.
+    Seuls les `fenetre` messages les plus récents sont gardés en mémoire ; les pages plus anciennes sont
+    relues à la demande avec charger_page_precedente() (« messages précédents » de l'application) et gardées
+    dans `anciens`, hors de la fenêtre transmise au LLM. `decalage` est la position absolue du premier
+    message de la fenêtre dans l'historique complet de la session.
+    """
+
+    def __init__(self, session, stockage, fenetre=FENETRE_MESSAGES):
+        self.session = session
+        self.stockage = stockage
+        self.fenetre = fenetre
+        self._ids, self._messages = stockage.page(session, taille=fenetre)
+        self.decalage = stockage.compter(session) - len(self._messages)
+        self.anciens = []
+        self._ids_anciens = []
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        return list(self._messages)
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        self.stockage.ajouter(self.session, messages)
+        self._messages.extend(messages)
+        self._ids.extend([None] * len(messages))
+        surplus = len(self._messages) - self.fenetre
+        if surplus > 0:
+            # Messages sortis de la fenêtre : rattachés aux pages déjà relues pour qu'elles restent continues
+            if self.anciens:
+                self.anciens.extend(self._messages[:surplus])
+                self._ids_anciens.extend(self._ids[:surplus])
+            del self._messages[:surplus]
+            del self._ids[:surplus]
+            self.decalage += surplus
+
+    def lire_resume(self):
+        return self.stockage.lire_resume(self.session)
+
+    def ecrire_resume(self, resume, messages_resumes):
+        self.stockage.ecrire_resume(self.session, resume, messages_resumes)
+
+    def messages_anterieurs(self):
+        """Nombre de messages de la session plus anciens que ceux déjà en mémoire"""
+        return max(self.decalage - len(self.anciens), 0)
+
+    def charger_page_precedente(self, taille=TAILLE_PAGE):
+        """
+        Relit la page de messages précédant ceux déjà en mémoire et l'ajoute en tête de `anciens` (sans
+        l'ajouter à la fenêtre) ; chaque appel remonte d'une page. Retourne les messages de la page.
+        """
+        premier_id = next((i for i in self._ids_anciens + self._ids if i is not None), None)
+        if premier_id is None:
+            # Fenêtre encore non écrite : on repart des identifiants en base
+            ids, _ = self.stockage.page(self.session, taille=len(self._messages))
+            premier_id = ids[0] if ids else None
+        if premier_id is None:
+            return []
+        ids, messages = self.stockage.page(self.session, avant_id=premier_id, taille=taille)
+        self._ids_anciens[:0] = ids
+        self.anciens[:0] = messages
+        return messages
+
+    def clear(self) -> None:
+        self.stockage.supprimer_session(self.session)
+        self._messages.clear()
+        self._ids.clear()
+        self.anciens.clear()
+        self._ids_anciens.clear()
+        self.decalage = 0
@@ -0,0 +1,260 @@
+"""
+Index de recherche local (TF-IDF en NumPy) sur le catalogue de modules et d'exercices
+Construit hors-ligne à partir de la base du catalogue (catalogue.db), puis chargé au démarrage de l'agent
+pédagogique pour n'envoyer au LLM que les modules et exercices pertinents. Quand le catalogue change, seuls
+les documents dont le texte a changé sont retokenisés : les fréquences des autres sont reprises de l'index précédent.
+
+Usage : python index_catalogue.py
+"""
+
+import os
+import re
+import time
+import hashlib
+import unicodedata
+import numpy as np
+
+# Index de la base SQLite du catalogue (références par module_id / position de la catégorie d'exercices)
+FICHIER_INDEX_BASE = 'index_catalogue_base.npz'
+
+# Mots trop fréquents pour être discriminants (français et anglais)
+MOTS_VIDES = {
+    'le', 'la', 'les', 'un', 'une', 'des', 'de', 'du', 'et', 'en', 'au', 'aux', 'sur', 'pour', 'avec',
+    'dans', 'par', 'ou', 'que', 'qui', 'est', 'sont', 'ce', 'cette', 'ces', 'tous', 'tout', 'base',
+    'cree', 'genere', 'utilisant', 'donnees', 'vrais', 'vraies', 'reels', 'reelles',
+    'the', 'of', 'and', 'to', 'in', 'for', 'with', 'on', 'an', 'is', 'from', 'by', 'as', 'at', 'into'
+}
+
+# Types de documents indexés
+DOC_MODULE = 0
+DOC_EXERCICE = 1
+
+# =============================================================================
+# 1. TOKENISATION
+# =============================================================================
+
+def normaliser_texte(texte):
+    """Met en minuscules et retire les accents"""
+    texte = unicodedata.normalize('NFKD', str(texte).lower())
+    return ''.join(c for c in texte if not unicodedata.combining(c))
+
+def tokeniser(texte):
+    """Découpe un texte en termes indexables"""
+    return [t for t in re.findall(r'[a-z0-9_]+', normaliser_texte(texte)) if len(t) > 1 and t not in MOTS_VIDES]
+
+def empreinte_texte(texte):
+    """Empreinte 64 bits du texte d'un document"""
+    return int.from_bytes(hashlib.blake2b(texte.encode('utf-8'), digest_size=8).digest(), 'little')
+
+# =============================================================================
+# 2. INDEX INVERSÉ
+# =============================================================================
+
+class IndexCatalogue:
+    """
+    Index inversé TF-IDF stocké en tableaux NumPy contigus.
+    Les listes de postings sont rangées par terme : les documents du terme t sont
+    doc_ids[terme_ptr[t]:terme_ptr[t + 1]], avec les poids normalisés et les fréquences brutes (tf) correspondants.
+    empreintes_docs : empreinte du texte de chaque document, pour reprendre ses fréquences lors d'une mise à jour.
+    """
+
+    def __init__(self, vocabulaire, terme_ptr, doc_ids, poids, types_docs, refs_docs, signature='',
+                 tf=None, empreintes_docs=None):
+        self.vocabulaire = vocabulaire
+        self.terme_ptr = terme_ptr
+        self.doc_ids = doc_ids
+        self.poids = poids
+        self.types_docs = types_docs
+        self.refs_docs = refs_docs
+        self.signature = signature
+        self.tf = tf
+        self.empreintes_docs = empreintes_docs
+        self.nb_docs = len(types_docs)
+
+    def rechercher(self, requete, k=10, type_doc=None):
+        """Retourne les k documents les plus proches de la requête : liste de (indice document, score)"""
+        termes = [self.vocabulaire[t] for t in tokeniser(requete) if t in self.vocabulaire]
+        if not termes or self.nb_docs == 0:
+            return []
+
+        # Accumulation des scores sur les seules listes de postings des termes de la requête
+        tranches = [slice(self.terme_ptr[t], self.terme_ptr[t + 1]) for t in termes]
+        docs = np.concatenate([self.doc_ids[s] for s in tranches])
+        poids = np.concatenate([self.poids[s] for s in tranches])
+        scores = np.bincount(docs, weights=poids, minlength=self.nb_docs)
+
+        if type_doc is not None:
+            scores[self.types_docs != type_doc] = 0.0
+
+        candidats = np.flatnonzero(scores)
+        if len(candidats) > k:
+            candidats = candidats[np.argpartition(-scores[candidats], k - 1)[:k]]
+        candidats = candidats[np.argsort(-scores[candidats], kind='stable')]
+        return [(int(i), float(scores[i])) for i in candidats]
+
+    def sauvegarder(self, chemin=FICHIER_INDEX_BASE):
+        """Sauvegarde l'index sur disque (format .npz)"""
+        termes = np.array(sorted(self.vocabulaire, key=self.vocabulaire.get), dtype=str)
+        np.savez(
+            chemin,
+            termes=termes,
+            terme_ptr=self.terme_ptr,
+            doc_ids=self.doc_ids,
+            poids=self.poids,
+            types_docs=self.types_docs,
+            refs_docs=self.refs_docs,
+            signature=np.array(self.signature),
+            **({"tf": self.tf, "empreintes_docs": self.empreintes_docs} if self.tf is not None else {})
+        )
+
+    @classmethod
+    def charger(cls, chemin=FICHIER_INDEX_BASE):
+        """Charge un index sauvegardé avec sauvegarder()"""
+        with np.load(chemin, allow_pickle=False) as donnees:
+            vocabulaire = {terme: i for i, terme in enumerate(donnees['termes'].tolist())}
+            return cls(
+                vocabulaire,
+                donnees['terme_ptr'],
+                donnees['doc_ids'],
+                donnees['poids'],
+                donnees['types_docs'],
+                donnees['refs_docs'],
+                str(donnees['signature']),
+                # Index sauvegardé sans fréquences brutes : il sera reconstruit entièrement
+                donnees['tf'] if 'tf' in donnees.files else None,
+                donnees['empreintes_docs'] if 'empreintes_docs' in donnees.files else None
+            )
+
+def indexer_textes(textes, types_docs, refs_docs, signature='', precedent=None):
+    """
+    Construit l'index TF-IDF de documents déjà mis en texte, avec leur type et leur référence.
+    precedent : index antérieur ; les documents dont l'empreinte du texte y figure reprennent ses fréquences
+    au lieu d'être retokenisés. Seuls les poids (qui dépendent de l'idf de tout le corpus) sont recalculés.
+    """
+    nb_docs = len(textes)
+    empreintes = np.fromiter((empreinte_texte(t) for t in textes), dtype=np.uint64, count=nb_docs)
+    reutilisable = precedent is not None and precedent.tf is not None and precedent.empreintes_docs is not None
+
+    a_tokeniser = range(nb_docs)
+    if reutilisable:
+        # Ancien document -> nouveau document au texte identique (-1 : supprimé ou modifié)
+        anciens = {}
+        for j, valeur in enumerate(precedent.empreintes_docs.tolist()):
+            anciens.setdefault(valeur, j)
+        reprise = np.full(precedent.nb_docs, -1, dtype=np.int64)
+        a_tokeniser = []
+        for i, valeur in enumerate(empreintes.tolist()):
+            j = anciens.pop(valeur, None)
+            if j is None:
+                a_tokeniser.append(i)
+            else:
+                reprise[j] = i
+
+    vocabulaire = dict(precedent.vocabulaire) if reutilisable else {}
+    termes_docs, ids_docs = [], []
+    for doc in a_tokeniser:
+        for terme in tokeniser(textes[doc]):
+            termes_docs.append(vocabulaire.setdefault(terme, len(vocabulaire)))
+            ids_docs.append(doc)
+
+    termes_docs = np.asarray(termes_docs, dtype=np.int32)
+    ids_docs = np.asarray(ids_docs, dtype=np.int32)
+
+    # Fréquences (terme, document) regroupées, triées par terme puis document
+    paires = np.unique(termes_docs.astype(np.int64) * max(nb_docs, 1) + ids_docs, return_counts=True)
+    cles, tf = paires
+    termes = (cles // max(nb_docs, 1)).astype(np.int32)
+    docs = (cles % max(nb_docs, 1)).astype(np.int32)
+    tf = tf.astype(np.int32)
+
+    if reutilisable:
+        anciens_termes = np.repeat(np.arange(len(precedent.vocabulaire), dtype=np.int32), np.diff(precedent.terme_ptr))
+        nouveaux_docs = reprise[precedent.doc_ids]
+        garder = nouveaux_docs >= 0
+        termes = np.concatenate([anciens_termes[garder], termes])
+        docs = np.concatenate([nouveaux_docs[garder].astype(np.int32), docs])
+        tf = np.concatenate([precedent.tf[garder].astype(np.int32), tf])
+
+        # Termes qui n'apparaissent plus dans aucun document : retirés du vocabulaire, identifiants renumérotés
+        utilises = np.unique(termes)
+        if len(utilises) < len(vocabulaire):
+            renumerotation = np.full(len(vocabulaire), -1, dtype=np.int32)
+            renumerotation[utilises] = np.arange(len(utilises), dtype=np.int32)
+            termes = renumerotation[termes]
+            noms = sorted(vocabulaire, key=vocabulaire.get)
+            vocabulaire = {noms[t]: i for i, t in enumerate(utilises.tolist())}
+        ordre = np.lexsort((docs, termes))
+        termes, docs, tf = termes[ordre], docs[ordre], tf[ordre]
+
+    df = np.bincount(termes, minlength=len(vocabulaire))
+    idf = np.log((1 + nb_docs) / (1 + df)) + 1.0
+    poids = (1.0 + np.log(tf)) * idf[termes]
+
+    # Normalisation L2 par document : le score devient une similarité cosinus
+    normes = np.sqrt(np.bincount(docs, weights=poids ** 2, minlength=nb_docs))
+    poids = (poids / normes[docs]).astype(np.float32)
+
+    terme_ptr = np.zeros(len(vocabulaire) + 1, dtype=np.int64)
+    np.cumsum(df, out=terme_ptr[1:])
+
+    return IndexCatalogue(
+        vocabulaire,
+        terme_ptr,
+        docs,
+        poids,
+        np.asarray(types_docs, dtype=np.int8),
+        np.asarray(refs_docs, dtype=np.int32).reshape(-1, 2),
+        signature,
+        tf,
+        empreintes
+    )
+
+def charger_ou_construire_index_base(base, chemin=FICHIER_INDEX_BASE):
+    """
+    Charge l'index de la base du catalogue (base_catalogue.BaseCatalogue) s'il est à jour, sinon le met à jour et le
+    sauvegarde : les documents sont lus en flux depuis la base et référencés par module_id / (position de la
+    catégorie, rang de l'exercice) ; seuls ceux dont le texte a changé depuis l'index sauvegardé sont retokenisés
+    """
+    signature = base.signature()
+    precedent = None
+    if os.path.exists(chemin):
+        try:
+            precedent = IndexCatalogue.charger(chemin)
+            if precedent.signature == signature:
+                return precedent
+        except (OSError, ValueError, KeyError):
+            precedent = None
+
+    textes, types_docs, refs_docs = [], [], []
+    for texte, type_doc, ref in base.documents():
+        textes.append(texte)
+        types_docs.append(type_doc)
+        refs_docs.append(ref)
+    index = indexer_textes(textes, types_docs, refs_docs, signature, precedent)
+    index.sauvegarder(chemin)
+    return index
+
+# =============================================================================
+# 3. SCRIPT D'EXÉCUTION
+# =============================================================================
+
+if __name__ == "__main__":
+    # Import local : base_catalogue dépend de ce module
+    import base_catalogue
+
+    print("🔎 Construction de l'index du catalogue...")
+    base = base_catalogue.BaseCatalogue()
+    if os.path.exists(FICHIER_INDEX_BASE):
+        os.remove(FICHIER_INDEX_BASE)
+
+    debut = time.perf_counter()
+    index = charger_ou_construire_index_base(base)
+    print(f"✅ Index construit en {time.perf_counter() - debut:.2f}s et sauvegardé dans '{FICHIER_INDEX_BASE}'")
+    print(f"📚 {index.nb_docs} documents, {len(index.vocabulaire)} termes")
+
+    requete = "Formation Pandas Data Science Intermediate"
+    debut = time.perf_counter()
+    resultats = index.rechercher(requete, k=5, type_doc=DOC_MODULE)
+    print(f"⏱️ Requête '{requete}' : {(time.perf_counter() - debut) * 1000:.2f} ms")
+    if resultats:
+        print(base.modules_par_ids([int(index.refs_docs[doc][0]) for doc, _ in resultats])[['titre', 'concepts_cles']])
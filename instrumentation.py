@@ -0,0 +1,278 @@
+"""
+Instrumentation des chemins critiques des deux applications
+Chaque génération (ou question) est une trace découpée en étapes chronométrées : chargement des données,
+contexte, rendu du prompt, appel au LLM, rendu Streamlit... avec les tokens du prompt et de la réponse et
+le résultat (hit ou miss) des caches consultés. Les agrégats (histogrammes de durée par étape, compteurs de
+tokens et de caches) couvrent toutes les traces et ne coûtent que quelques additions sous verrou ; seule une
+fraction des traces (INSTRUMENTATION_TAUX, 10 % par défaut) est écrite en détail dans instrumentation.jsonl.
+
+Les agrégats sont exposés au format texte de Prometheus sur /metrics si INSTRUMENTATION_PORT est défini.
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FICHIER_TRACES = os.environ.get("INSTRUMENTATION_FICHIER", "instrumentation.jsonl")
+TAUX_ECHANTILLONNAGE = float(os.environ.get("INSTRUMENTATION_TAUX", "0.1"))
+
+# Bornes des histogrammes de durée (secondes)
+BORNES_SECONDES = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Traces récentes gardées en mémoire pour les centiles affichés dans l'application
+TRACES_RECENTES = 200
+
+
+class Trace:
+    """Étapes chronométrées, tokens et caches d'une génération ; terminer() la transmet au registre"""
+
+    def __init__(self, registre, flux, echantillonnee, attributs):
+        self.registre = registre
+        self.flux = flux
+        self.echantillonnee = echantillonnee
+        self.attributs = attributs
+        self.horodatage = time.time()
+        self.debut = time.perf_counter()
+        self.durees = {}
+        self.etapes = []
+        self.tokens = {"prompt": 0, "completion": 0}
+        self.caches = {}
+        self.statut = "ok"
+
+    @contextmanager
+    def etape(self, nom):
+        """Chronomètre le bloc ; une étape répétée dans la trace cumule ses durées"""
+        debut = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.ajouter_duree(nom, time.perf_counter() - debut, debut)
+
+    def ajouter_duree(self, nom, duree, debut=None):
+        """Ajoute une durée mesurée ailleurs (debut : instant perf_counter du début, par défaut maintenant)"""
+        self.durees[nom] = self.durees.get(nom, 0.0) + duree
+        if self.echantillonnee:
+            debut = time.perf_counter() if debut is None else debut
+            self.etapes.append({
+                "etape": nom,
+                "debut_ms": round((debut - self.debut) * 1000, 2),
+                "duree_ms": round(duree * 1000, 2),
+            })
+
+    def mesurer_flux(self, nom, morceaux):
+        """
+        Enveloppe un générateur : seul le temps passé à produire les morceaux est compté dans l'étape `nom`
+        (le temps du consommateur, par exemple l'affichage au fil de l'eau, en est exclu)
+        """
+        debut_flux = time.perf_counter()
+        duree = 0.0
+        iterateur = iter(morceaux)
+        try:
+            while True:
+                debut = time.perf_counter()
+                try:
+                    morceau = next(iterateur)
+                except StopIteration:
+                    duree += time.perf_counter() - debut
+                    return
+                duree += time.perf_counter() - debut
+                yield morceau
+        finally:
+            self.ajouter_duree(nom, duree, debut_flux)
+
+    def compter_tokens(self, prompt=0, completion=0):
+        self.tokens["prompt"] += prompt or 0
+        self.tokens["completion"] += completion or 0
+
+    def cache(self, nom, hit):
+        self.caches[nom] = bool(hit)
+
+    def terminer(self):
+        self.duree_totale = time.perf_counter() - self.debut
+        self.registre.enregistrer(self)
+
+    def en_dict(self):
+        return {
+            "horodatage": self.horodatage,
+            "flux": self.flux,
+            "statut": self.statut,
+            "duree_ms": round(self.duree_totale * 1000, 2),
+            "etapes": self.etapes,
+            "tokens": self.tokens,
+            "caches": self.caches,
+            **({"attributs": self.attributs} if self.attributs else {}),
+        }
+
+
+class Registre:
+    """Agrégats de toutes les traces du processus et export JSONL des traces échantillonnées"""
+
+    def __init__(self, taux_echantillonnage=TAUX_ECHANTILLONNAGE, fichier=FICHIER_TRACES):
+        self.taux_echantillonnage = taux_echantillonnage
+        self.fichier = fichier
+        self._verrou = threading.Lock()
+        self._histogrammes = {}
+        self._tokens = {}
+        self._caches = {}
+        self._traces = {}
+        self._recentes = deque(maxlen=TRACES_RECENTES)
+        self.traces_ecrites = 0
+
+    def commencer(self, flux, **attributs):
+        """Démarre une trace à terminer explicitement avec trace.terminer()"""
+        return Trace(self, flux, random.random() < self.taux_echantillonnage, attributs)
+
+    @contextmanager
+    def trace(self, flux, **attributs):
+        """Trace d'une génération : `with mesures.trace("agent_generation") as trace: with trace.etape(...): ...`"""
+        trace = self.commencer(flux, **attributs)
+        try:
+            yield trace
+        except BaseException:
+            trace.statut = "erreur"
+            raise
+        finally:
+            trace.terminer()
+
+    def enregistrer(self, trace):
+        with self._verrou:
+            self._traces[(trace.flux, trace.statut)] = self._traces.get((trace.flux, trace.statut), 0) + 1
+            for etape, duree in list(trace.durees.items()) + [("total", trace.duree_totale)]:
+                histogramme = self._histogrammes.setdefault((trace.flux, etape), [0, 0.0, [0] * len(BORNES_SECONDES)])
+                histogramme[0] += 1
+                histogramme[1] += duree
+                for i, borne in enumerate(BORNES_SECONDES):
+                    if duree <= borne:
+                        histogramme[2][i] += 1
+            for genre, nombre in trace.tokens.items():
+                self._tokens[(trace.flux, genre)] = self._tokens.get((trace.flux, genre), 0) + nombre
+            for nom, hit in trace.caches.items():
+                compteurs = self._caches.setdefault(nom, [0, 0])
+                compteurs[0 if hit else 1] += 1
+            self._recentes.append((trace.flux, dict(trace.durees, total=trace.duree_totale), dict(trace.tokens)))
+
+        if trace.echantillonnee and self.fichier:
+            ligne = json.dumps(trace.en_dict(), ensure_ascii=False)
+            with self._verrou:
+                with open(self.fichier, 'a', encoding='utf-8') as f:
+                    f.write(ligne + "\n")
+                self.traces_ecrites += 1
+
+    def statistiques(self, flux=None):
+        """
+        Résumé des traces récentes (d'un flux, ou de tous) : durée moyenne et p95 par étape (ms), tokens
+        moyens par trace, et taux de hit de chaque cache depuis le démarrage
+        """
+        with self._verrou:
+            recentes = [(d, t) for f, d, t in self._recentes if flux is None or f == flux]
+            caches = {nom: list(c) for nom, c in self._caches.items()}
+            traces = sum(n for (f, _), n in self._traces.items() if flux is None or f == flux)
+
+        etapes = {}
+        for durees, _ in recentes:
+            for etape, duree in durees.items():
+                etapes.setdefault(etape, []).append(duree)
+        resume_etapes = {}
+        for etape, durees in etapes.items():
+            durees.sort()
+            resume_etapes[etape] = {
+                "moyenne_ms": round(sum(durees) / len(durees) * 1000, 1),
+                "p95_ms": round(durees[min(len(durees) - 1, int(len(durees) * 0.95))] * 1000, 1),
+                "traces": len(durees),
+            }
+        return {
+            "traces": traces,
+            "traces_recentes": len(recentes),
+            "traces_ecrites": self.traces_ecrites,
+            # Durée totale d'abord, puis les étapes de la plus coûteuse à la moins coûteuse
+            "etapes": dict(sorted(resume_etapes.items(), key=lambda e: (e[0] != "total", -e[1]["moyenne_ms"]))),
+            "tokens_prompt_moyen": round(sum(t["prompt"] for _, t in recentes) / len(recentes)) if recentes else 0,
+            "tokens_completion_moyen": round(sum(t["completion"] for _, t in recentes) / len(recentes)) if recentes else 0,
+            "caches": {nom: {"hits": h, "misses": m, "taux_hit": h / (h + m) if h + m else 0.0} for nom, (h, m) in caches.items()},
+        }
+
+    def texte_prometheus(self):
+        """Agrégats au format d'exposition texte de Prometheus"""
+        with self._verrou:
+            histogrammes = {cle: (n, s, list(b)) for cle, (n, s, b) in self._histogrammes.items()}
+            tokens = dict(self._tokens)
+            caches = {nom: list(c) for nom, c in self._caches.items()}
+            traces = dict(self._traces)
+
+        lignes = [
+            "# HELP app_traces_total Générations et questions instrumentées",
+            "# TYPE app_traces_total counter",
+        ]
+        lignes += [f'app_traces_total{{flux="{f}",statut="{s}"}} {n}' for (f, s), n in sorted(traces.items())]
+        lignes += [
+            "# HELP app_etape_duree_secondes Durée des étapes de chaque flux",
+            "# TYPE app_etape_duree_secondes histogram",
+        ]
+        for (flux, etape), (nombre, somme, compteurs) in sorted(histogrammes.items()):
+            etiquettes = f'flux="{flux}",etape="{etape}"'
+            for borne, compte in zip(BORNES_SECONDES, compteurs):
+                lignes.append(f'app_etape_duree_secondes_bucket{{{etiquettes},le="{borne}"}} {compte}')
+            lignes.append(f'app_etape_duree_secondes_bucket{{{etiquettes},le="+Inf"}} {nombre}')
+            lignes.append(f'app_etape_duree_secondes_sum{{{etiquettes}}} {somme:.6f}')
+            lignes.append(f'app_etape_duree_secondes_count{{{etiquettes}}} {nombre}')
+        lignes += [
+            "# HELP app_tokens_total Tokens des prompts et des réponses",
+            "# TYPE app_tokens_total counter",
+        ]
+        lignes += [f'app_tokens_total{{flux="{f}",type="{g}"}} {n}' for (f, g), n in sorted(tokens.items())]
+        lignes += [
+            "# HELP app_cache_requetes_total Consultations des caches par résultat",
+            "# TYPE app_cache_requetes_total counter",
+        ]
+        for nom, (hits, misses) in sorted(caches.items()):
+            lignes.append(f'app_cache_requetes_total{{cache="{nom}",resultat="hit"}} {hits}')
+            lignes.append(f'app_cache_requetes_total{{cache="{nom}",resultat="miss"}} {misses}')
+        return "\n".join(lignes) + "\n"
+
+
+# Registre partagé par toutes les sessions du processus
+mesures = Registre()
+
+# =============================================================================
+# EXPORT PROMETHEUS
+# =============================================================================
+
+_serveur = None
+_verrou_serveur = threading.Lock()
+
+class _GestionnaireMetriques(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        corps = self.server.registre.texte_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(corps)))
+        self.end_headers()
+        self.wfile.write(corps)
+
+    def log_message(self, format, *args):
+        pass
+
+def demarrer_serveur_prometheus(port=None, registre=mesures, hote="0.0.0.0"):
+    """
+    Démarre (une seule fois par processus) le serveur /metrics sur le port donné ou INSTRUMENTATION_PORT.
+    Retourne le serveur, ou None si aucun port n'est configuré.
+    """
+    global _serveur
+    if port is None:
+        port = os.environ.get("INSTRUMENTATION_PORT") or None
+    if port is None:
+        return None
+    with _verrou_serveur:
+        if _serveur is None:
+            _serveur = ThreadingHTTPServer((hote, int(port)), _GestionnaireMetriques)
+            _serveur.daemon_threads = True
+            _serveur.registre = registre
+            threading.Thread(target=_serveur.serve_forever, daemon=True, name="metriques-prometheus").start()
+        return _serveur
@@ -1,13 +1,16 @@
 import os
-from tempfile import template
+import sys
+import time
 import streamlit as st
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.prompts import ChatPromptTemplate, PromptTemplate
-from langchain_core.messages import HumanMessage, SystemMessage
-from langchain.chains import LLMChain, ConversationChain
-from langchain.memory import ConversationBufferMemory
-from langchain_community.chat_message_histories import StreamlitChatMessageHistory
-import pandas as pd
+import uuid
+import donnees_stress
+import cube_stress
+import clients_llm
+import instrumentation
+
+# La pile LLM (langchain et les modules qui en dépendent : memoire, cache_llm, coalescence,
+# historique_conversation) et pandas (requete_stress, profils_stress) ne sont importés qu'à la première
+# question : la page s'affiche sans les attendre. Vérifié par profil_demarrage.py.
 
 # --- Fonctions pour l'interaction avec le LLM via l'API Google Gemini ---
 # Fonction d'appel sans langchain
@@ -18,10 +21,11 @@ def get_gemini_response(prompt: str) -> str:
     try:
         # Obtenez votre clé d'API depuis les secrets Streamlit
         api_key = st.secrets["GEMINI_API_KEY"]
+        import coalescence
 
-        # Appelez le modèle Gemini 1.5 flash test via Langchain
-        model = ChatGoogleGenerativeAI(model="gemini-1.5-flash-latest", google_api_key=api_key)
-        response = model.invoke(prompt)
+        # Appelez le modèle Gemini 1.5 flash test via Langchain (client partagé par le processus)
+        model = clients_llm.obtenir_llm(api_key, modele="gemini-1.5-flash-latest")
+        response = coalescence.invoquer(model, prompt)
         return response.text()
     
     except Exception as e:
@@ -29,30 +33,25 @@ def get_gemini_response(prompt: str) -> str:
         st.error("Assurez-vous d'avoir une clé d'API valide et de l'avoir ajoutée à vos secrets Streamlit sous le nom 'GEMINI_API_KEY'.")
         return "Désolé, je ne peux pas générer de réponse pour le moment."
 
-# Fonction d'appel avec LangChain
-def get_gemini_response_with_langchain(prompt_template, memory) -> str:
+# Requête locale pour les questions chiffrées : le LLM produit un plan, pandas calcule le résultat
+def calculer_resultat_requete(question: str, jeux: dict):
     """
-    Appelle le LLM Gemini en utilisant une chaîne LangChain.
+    Traduit la question en plan de requête validé et l'exécute sur les DataFrames de stress.
+    Retourne le petit tableau de résultat (texte) ou None si la question ne demande pas de calcul
+    (sans mot-clé ni comparaison chiffrée, le LLM n'est pas appelé).
     """
+    import requete_stress
+    if not requete_stress.demande_calcul(question):
+        return None
+    import coalescence
     try:
-        # Initialisez le modèle avec la clé API
-        llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash-latest", google_api_key=st.secrets["GEMINI_API_KEY"], temperature=0)
-
-        # Créez la chaîne (Chain)
-        chain = LLMChain(
-            prompt=prompt_template,
-            llm=llm,
-            memory=memory
-        )
-        response = chain.invoke({
-        "dataframe_context": dataframe_context,
-        "user_question": user_question,
-        })
-        return response['text']
-
+        llm = clients_llm.obtenir_llm(st.secrets["GEMINI_API_KEY"], modele="gemini-1.5-flash-latest", temperature=0)
+        return requete_stress.repondre(question, lambda prompt: coalescence.invoquer(llm, prompt).content, jeux)
+    except requete_stress.PlanInvalide as e:
+        st.caption(f"Requête locale ignorée : {e}")
     except Exception as e:
-        st.error(f"Erreur lors de l'appel à l'API via LangChain: {e}")
-        return "Désolé, je ne peux pas générer de réponse pour le moment."
+        st.warning(f"Erreur lors du calcul de la requête locale: {e}")
+    return None
 
 # --- Prompt Generation ---
 
@@ -86,14 +85,63 @@ Answer:
     prompt = prompt_template.strip()
     return prompt
 
-def create_prompt_for_langchain(user_question: str, dataframe_context: str, chat_history: list) -> str:
-    # --- Prompt Generation avec LangChain ---
-    # Créez le modèle de prompt pour la chaîne
+
+# --- Cache persistant des réponses du LLM ---
+@st.cache_resource
+def obtenir_cache_llm():
+    """Installe le cache SQLite des réponses pour tous les appels LangChain du processus"""
+    from langchain_core.globals import set_llm_cache
+    import cache_llm
+    cache = cache_llm.CacheReponsesSQLite()
+    set_llm_cache(cache_llm.CacheLangChain(cache))
+    return cache
+
+# --- Chargement des données (format colonnaire, partagé entre les reruns et les sessions) ---
+@st.cache_resource
+def charger_donnees_stress(nom, signature):
+    """Charge un jeu de données Student Stress ; la signature (taille, mtime) du CSV invalide le cache"""
+    return donnees_stress.charger(nom)
+
+@st.cache_resource
+def charger_cube_stress(signature):
+    """Cube de statistiques précalculées sur StressLevelDataset (reconstruit quand le CSV change)"""
+    return cube_stress.charger_ou_construire_cube()
+
+@st.cache_resource
+def charger_index_profils(signature):
+    """Index des plus proches voisins sur les profils de StressLevelDataset"""
+    import profils_stress
+    return profils_stress.IndexProfils.depuis_dataframe(charger_donnees_stress(cube_stress.NOM_JEU, signature))
+
+@st.cache_resource
+def obtenir_stockage_historique():
+    """Historique des conversations persistant (SQLite), partagé entre les sessions"""
+    import historique_conversation
+    return historique_conversation.StockageHistorique()
+
+def construire_chaine_langchain(session_id):
+    """Historique, mémoire et chaîne LangChain de la session, construits à la première question"""
+    from langchain.prompts import ChatPromptTemplate
+    from langchain.chains import LLMChain
+    import historique_conversation
+    from memoire import MemoireResumee, resumeur_llm
+
+    st.session_state.chat_history_with_langchain = historique_conversation.HistoriqueSQLite(
+        f"chatbot-langchain:{session_id}", obtenir_stockage_historique()
+    )
+    # Derniers tours mot pour mot, tours plus anciens repliés dans un résumé : l'historique envoyé reste borné
+    memory = MemoireResumee(
+        chat_memory=st.session_state.chat_history_with_langchain,
+        memory_key="chat_history_with_langchain",
+        input_key="user_question",  # La clé de la question de l'utilisateur
+        resumeur=resumeur_llm(clients_llm.obtenir_llm(api_key, modele="gemini-1.5-flash-latest", temperature=0))
+    )
+    # Définir le template directement ici pour inclure l'historique
     template = """
 You are a helpful AI chat assistant. Answer the user's question based on the provided chat history and the context data from the <context> section.
 Use the data in the <context> section to inform your answer about customer reviews or sentiments if the question relates to it. If the question is general and not answerable from the context or chat history, answer naturally. Do not explicitly mention "based on the context" unless necessary for clarity.
 
-chat history : {chat_history}
+chat history : {chat_history_with_langchain}
 <context>
 {dataframe_context}
 </context>
@@ -102,17 +150,23 @@ user's question : '''{user_question}'''
 Answer:
 """
     prompt_template = ChatPromptTemplate.from_template(template)
-    return prompt_template
-
+    llm = clients_llm.obtenir_llm(st.secrets["GEMINI_API_KEY"], modele="gemini-1.5-flash-latest", temperature=0)
+    return LLMChain(
+        prompt=prompt_template,
+        llm=llm,
+        memory=memory
+    )
 
 # --- Configuration et variables d'état ---
 st.set_page_config(layout="wide")
 st.title("LLM with langchain")
 st.subheader("Chatbot utilisant Gemini pour analyser les données et fournir une réponse.")
 
-# Initialiser l'état de session sans langchain si ce n'est pas déjà fait
-if "chat_history" not in st.session_state:
-    st.session_state.chat_history = []
+# Identifiant de session conservé dans l'URL : l'historique est retrouvé après un rechargement ou un redémarrage
+if "session" not in st.query_params:
+    st.query_params["session"] = uuid.uuid4().hex
+session_id = st.query_params["session"]
+
 if "df_context" not in st.session_state:
     st.session_state.df_context = "Pas de données de contexte pour le moment."
 
@@ -124,52 +178,106 @@ except KeyError:
     st.stop() # Arrête l'exécution si la clé n'est pas trouvée
 
 
+# Export des métriques au format Prometheus si INSTRUMENTATION_PORT est défini
+instrumentation.demarrer_serveur_prometheus()
+
 # --- Interface utilisateur de streamlit ---
 user_question = st.text_input("Posez votre question:")
-dataframe_context = st.session_state.df_context
-df = pd.read_csv("C:/Users/ambre/Documents/GenAI APP/Student Stress Monitoring Datasets/Stress_Dataset.csv")
-st.session_state.df_context = df.head().to_string()  # Met à jour le contexte avec les lignes du DataFrame
-
-# --- Prompt Generation sans langchain ---
-prompt = create_prompt(user_question, dataframe_context, st.session_state.chat_history)
-st.session_state.chat_history.append({"role": "user", "content": user_question})
-st.write(get_gemini_response(prompt))
-
-
-# --- L'approche avec LangChain ---
-# Initialiser l'état de session avec langchain si ce n'est pas déjà fait
-if "chat_history_with_langchain" not in st.session_state:
-    st.session_state.chat_history_with_langchain = StreamlitChatMessageHistory()
-memory = ConversationBufferMemory(
-    chat_memory=st.session_state.chat_history_with_langchain,
-    memory_key="chat_history_with_langchain",
-    input_key="user_question"  # La clé de la question de l'utilisateur
-)
-# Créer la chaîne LangChain en dehors de la boucle d'interaction et la stocker dans l'état de la session Streamlit
-if "llm_chain" not in st.session_state:
-    # Définir le template directement ici pour inclure l'historique
-    template = """
-You are a helpful AI chat assistant. Answer the user's question based on the provided chat history and the context data from the <context> section.
-Use the data in the <context> section to inform your answer about customer reviews or sentiments if the question relates to it. If the question is general and not answerable from the context or chat history, answer naturally. Do not explicitly mention "based on the context" unless necessary for clarity.
+debut_chargement = time.perf_counter()
+cube = charger_cube_stress(donnees_stress.signature("niveau_stress"))
+duree_chargement_donnees = time.perf_counter() - debut_chargement
+# Contexte compact tiré du cube de statistiques : facteurs cités dans la question, ou résumé des corrélations
+debut_contexte = time.perf_counter()
+dataframe_context = cube_stress.bloc_contexte(cube, user_question)
+duree_contexte = time.perf_counter() - debut_contexte
+if user_question:
+    import profils_stress
+    import historique_conversation
+    import coalescence
+    from contexte_prompt import estimer_tokens
+    # Une trace par question, des données chargées jusqu'à la réponse de la chaîne LangChain. Les deux
+    # approches ont leurs propres étapes (suffixes _direct et _chaine) pour être comparées
+    with instrumentation.mesures.trace("chatbot_question") as trace:
+        trace.ajouter_duree("chargement_donnees", duree_chargement_donnees)
+        trace.ajouter_duree("contexte", duree_contexte)
+        # Seul le tableau de résultat calculé localement est ajouté au prompt, quelle que soit la taille des données
+        with trace.etape("chargement_donnees"):
+            jeux_stress = {nom: charger_donnees_stress(nom, donnees_stress.signature(nom)) for nom in donnees_stress.JEUX_DE_DONNEES}
+            index_profils = charger_index_profils(donnees_stress.signature(cube_stress.NOM_JEU))
+        with trace.etape("requete_locale"):
+            resultat_requete = calculer_resultat_requete(user_question, jeux_stress)
+        if resultat_requete:
+            dataframe_context += "\n\nComputed result for this question:\n" + resultat_requete
+        # Profils similaires (« students similar to student 42 », « similar to anxiety_level 15 »)
+        with trace.etape("contexte"):
+            voisins = profils_stress.bloc_voisins(index_profils, user_question)
+        if voisins:
+            dataframe_context += "\n\n" + voisins
 
-chat history : {chat_history_with_langchain}
-<context>
-{dataframe_context}
-</context>
+        # --- Prompt Generation sans langchain ---
+        # Seulement quand une question est posée : un rerun sans question n'appelle pas le LLM et n'ajoute rien à
+        # l'historique, et la pile LLM n'est importée qu'à ce moment-là
+        obtenir_cache_llm()
+        # Initialiser l'état de session sans langchain si ce n'est pas déjà fait
+        if "chat_history" not in st.session_state:
+            st.session_state.chat_history = historique_conversation.HistoriqueSQLite(f"chatbot:{session_id}", obtenir_stockage_historique())
+        historique_recent = [
+            {"role": "user" if message.type == "human" else "assistant", "content": message.content}
+            for message in st.session_state.chat_history.messages[-6:]
+        ]
+        with trace.etape("rendu_prompt_direct"):
+            prompt = create_prompt(user_question, dataframe_context, historique_recent)
+        with trace.etape("llm_direct"):
+            reponse = get_gemini_response(prompt)
+        trace.compter_tokens(prompt=estimer_tokens(prompt), completion=estimer_tokens(reponse))
+        with trace.etape("enregistrement_direct"):
+            st.session_state.chat_history.add_user_message(user_question)
+            st.session_state.chat_history.add_ai_message(reponse)
+        with trace.etape("rendu_streamlit_direct"):
+            st.write(reponse)
 
-user's question : '''{user_question}'''
-Answer:
-"""
-    prompt_template = ChatPromptTemplate.from_template(template)
-    llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash-latest", google_api_key=st.secrets["GEMINI_API_KEY"], temperature=0)
-    st.session_state.llm_chain = LLMChain(
-        prompt=prompt_template,
-        llm=llm,
-        memory=memory
-   )
-if user_question:
-    # Exécutez la chaîne avec les variables
-    st.write(st.session_state.llm_chain.invoke({
-        "dataframe_context": dataframe_context,
-        "user_question": user_question,
-    })["text"])
\ No newline at end of file
+        # --- L'approche avec LangChain ---
+        # Créer la chaîne LangChain une seule fois par session et la stocker dans l'état de la session Streamlit
+        if "llm_chain" not in st.session_state:
+            with trace.etape("construction_chaine"):
+                st.session_state.llm_chain = construire_chaine_langchain(session_id)
+        chaine = st.session_state.llm_chain
+        # Étapes de coalescence.invoquer_chaine, chronométrées séparément
+        with trace.etape("rendu_prompt_chaine"):
+            entrees = chaine.prep_inputs({"dataframe_context": dataframe_context, "user_question": user_question})
+            prompt_value = chaine.prompt.format_prompt(**{k: entrees[k] for k in chaine.prompt.input_variables})
+        with trace.etape("llm_chaine"):
+            reponse_chaine = coalescence.invoquer(chaine.llm, prompt_value).content
+        trace.compter_tokens(prompt=estimer_tokens(prompt_value.to_string()), completion=estimer_tokens(reponse_chaine))
+        with trace.etape("enregistrement_chaine"):
+            chaine.prep_outputs(entrees, {chaine.output_key: reponse_chaine})
+        with trace.etape("rendu_streamlit_chaine"):
+            st.write(reponse_chaine)
+st.session_state.df_context = dataframe_context
+
+# --- Statistiques des clients Gemini partagés ---
+stats_clients = clients_llm.statistiques()
+st.sidebar.caption(
+    f"Clients Gemini partagés : {stats_clients['clients']} client(s), {stats_clients['reutilisations']} réutilisation(s), "
+    f"~{stats_clients['temps_economise_s'] * 1000:.0f} ms de configuration évités"
+)
+# Statistiques de la pile LLM et de l'historique seulement une fois chargés par une question du processus
+if "coalescence" in sys.modules:
+    stats_coalescence = sys.modules["coalescence"].appels_llm.statistiques()
+    st.sidebar.caption(
+        f"Appels LLM : {stats_coalescence['appels']} envoyé(s), {stats_coalescence['coalesces']} requête(s) identique(s) regroupée(s)"
+    )
+    stats_historique = obtenir_stockage_historique().statistiques()
+    st.sidebar.caption(
+        f"Historique persistant : {stats_historique['sessions']} session(s), {stats_historique['messages']} message(s), "
+        f"{stats_historique['messages_par_lot']} message(s) par écriture"
+    )
+else:
+    st.sidebar.caption("Pile LLM non chargée : elle sera importée à la première question")
+stats_instrumentation = instrumentation.mesures.statistiques("chatbot_question")
+if stats_instrumentation['traces']:
+    etapes = ", ".join(f"{etape} {infos['moyenne_ms']:.0f} ms" for etape, infos in stats_instrumentation['etapes'].items())
+    st.sidebar.caption(
+        f"Étapes ({stats_instrumentation['traces_recentes']} dernières questions, moyenne) : {etapes} ; "
+        f"tokens moyens {stats_instrumentation['tokens_prompt_moyen']} (prompts) / {stats_instrumentation['tokens_completion_moyen']} (réponses)"
+    )
@@ -0,0 +1,158 @@
+"""
+Mémoires de conversation à taille bornée pour les chaînes LangChain
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+from pydantic import PrivateAttr
+from langchain.memory import ConversationBufferMemory
+import contexte_prompt
+
+# Un seul thread de résumé partagé par le processus : les résumés sont rares et courts
+_executeur_resumes = ThreadPoolExecutor(max_workers=1, thread_name_prefix="resume-memoire")
+
+
+class MemoireBornee(ConversationBufferMemory):
+    """
+    ConversationBufferMemory dont l'historique injecté dans le prompt est tronqué
+    de façon déterministe aux messages les plus récents tenant dans max_tokens_historique.
+    """
+
+    max_tokens_historique: int = 800
+
+    @property
+    def buffer_as_str(self) -> str:
+        return contexte_prompt.tronquer_historique(
+            self.chat_memory.messages,
+            self.max_tokens_historique,
+            self.human_prefix,
+            self.ai_prefix
+        )
+
+
+PROMPT_RESUME = """Update the running summary of a conversation with the new exchanges below.
+Keep the facts, user preferences and open questions; drop greetings and repeated content.
+Answer with the updated summary only, in at most {max_mots} words.
+
+Current summary:
+{resume}
+
+New exchanges:
+{nouvelles_lignes}
+
+Updated summary:"""
+
+def resumeur_llm(llm, max_mots=120):
+    """Fonction de résumé incrémental (résumé actuel, nouvelles lignes) -> nouveau résumé, appelant le LLM"""
+    import coalescence
+
+    def resumer(resume, nouvelles_lignes):
+        prompt = PROMPT_RESUME.format(max_mots=max_mots, resume=resume or "(empty)", nouvelles_lignes=nouvelles_lignes)
+        return coalescence.invoquer(llm, prompt).content.strip()
+    return resumer
+
+def resume_extractif(resume, nouvelles_lignes, caracteres_par_ligne=160):
+    """Résumé sans LLM : début de chaque nouvelle ligne ajouté au résumé existant"""
+    extraits = [ligne[:caracteres_par_ligne] for ligne in nouvelles_lignes.splitlines() if ligne.strip()]
+    return "\n".join(filter(None, [resume] + extraits))
+
+
+class MemoireResumee(MemoireBornee):
+    """
+    Mémoire qui garde les tours_verbatim derniers tours mot pour mot et replie les tours plus anciens
+    dans un résumé courant. Le résumé est mis à jour de façon incrémentale (résumé précédent + tours
+    nouvellement sortis de la fenêtre), en arrière-plan après chaque échange ; il n'est jamais recalculé
+    depuis le début. L'historique injecté (résumé + tours récents) reste borné par max_tokens_historique.
+    Si chat_memory sait le conserver (lire_resume / ecrire_resume, comme HistoriqueSQLite), le résumé est
+    relu à la création de la mémoire et enregistré à chaque mise à jour : il survit aux redémarrages.
+    """
+
+    tours_verbatim: int = 3
+    max_tokens_resume: int = 250
+    resumeur: Optional[Callable[[str, str], str]] = resume_extractif
+    resume: str = ""
+    # Nombre de messages de chat_memory déjà repliés dans le résumé
+    messages_resumes: int = 0
+
+    _verrou: Any = PrivateAttr(default_factory=threading.Lock)
+    _resume_en_cours: Any = PrivateAttr(default=None)
+
+    def model_post_init(self, contexte):
+        super().model_post_init(contexte)
+        if hasattr(self.chat_memory, "lire_resume"):
+            self.resume, self.messages_resumes = self.chat_memory.lire_resume()
+
+    def _ligne(self, message):
+        prefixe = self.human_prefix if message.type == "human" else self.ai_prefix if message.type == "ai" else message.type
+        return f"{prefixe}: {message.content}"
+
+    def _appliquer_resume(self, nouveau_resume, fin):
+        budget = self.max_tokens_resume * contexte_prompt.CARACTERES_PAR_TOKEN
+        with self._verrou:
+            self.resume = nouveau_resume if len(nouveau_resume) <= budget else "… " + nouveau_resume[-budget:]
+            self.messages_resumes = fin
+            resume = self.resume
+        if hasattr(self.chat_memory, "ecrire_resume"):
+            self.chat_memory.ecrire_resume(resume, fin)
+
+    def replier(self, attendre=False):
+        """
+        Replie dans le résumé les messages sortis de la fenêtre verbatim.
+        Les messages sont lus dans le thread appelant (l'historique Streamlit n'est accessible que depuis
+        le script) ; seul l'appel au résumeur part en arrière-plan, sauf si attendre=True.
+        """
+        with self._verrou:
+            if self._resume_en_cours is not None and not self._resume_en_cours.done():
+                return self._resume_en_cours
+            # Les historiques fenêtrés (HistoriqueSQLite) ne gardent que les derniers messages : decalage
+            # est la position absolue du premier message en mémoire
+            messages = self.chat_memory.messages
+            decalage = getattr(self.chat_memory, "decalage", 0)
+            fin = decalage + len(messages) - 2 * self.tours_verbatim
+            if fin <= self.messages_resumes:
+                return None
+            resume = self.resume
+            a_resumer = messages[max(self.messages_resumes - decalage, 0):fin - decalage]
+            nouvelles_lignes = "\n".join(self._ligne(m) for m in a_resumer)
+
+        def resumer():
+            self._appliquer_resume(self.resumeur(resume, nouvelles_lignes), fin)
+
+        if attendre:
+            resumer()
+            return None
+        self._resume_en_cours = _executeur_resumes.submit(resumer)
+        return self._resume_en_cours
+
+    def save_context(self, inputs, outputs):
+        super().save_context(inputs, outputs)
+        self.replier()
+
+    def clear(self):
+        super().clear()
+        with self._verrou:
+            self.resume = ""
+            self.messages_resumes = 0
+
+    @property
+    def buffer_as_str(self) -> str:
+        """Résumé des tours anciens puis messages non résumés les plus récents, dans le budget de tokens"""
+        with self._verrou:
+            resume, debut = self.resume, self.messages_resumes
+        messages = self.chat_memory.messages[max(debut - getattr(self.chat_memory, "decalage", 0), 0):]
+        if not resume:
+            return contexte_prompt.tronquer_historique(messages, self.max_tokens_historique, self.human_prefix, self.ai_prefix)
+
+        # Le résumé occupe au plus la moitié du budget, le reste va aux tours récents
+        budget_resume = min(self.max_tokens_resume, self.max_tokens_historique // 2) * contexte_prompt.CARACTERES_PAR_TOKEN
+        if budget_resume <= 0:
+            return ""
+        if len(resume) > budget_resume:
+            resume = "… " + resume[-budget_resume:]
+        entete = f"Summary of the earlier conversation: {resume}"
+        budget_restant = self.max_tokens_historique - contexte_prompt.estimer_tokens(entete) - 1
+        if budget_restant <= 0:
+            return entete
+        recents = contexte_prompt.tronquer_historique(messages, budget_restant, self.human_prefix, self.ai_prefix)
+        return "\n".join(filter(None, [entete, recents]))
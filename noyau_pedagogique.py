@@ -0,0 +1,254 @@
+"""
+Noyau de l'agent pédagogique, indépendant de Streamlit
+Template du prompt, chargement des données réelles et préparation d'une génération,
+partagés par l'application (agent_donnees_reelles.py) et la génération par lots (generation_lot.py).
+"""
+
+import os
+import json
+from datetime import datetime
+import pandas as pd
+import index_catalogue
+import contexte_prompt
+import base_catalogue
+
+# Fichiers CSV/JSON écrits par collecte_donnees.py, importés dans une base vide
+FICHIER_FORMATIONS = 'formations_reelles.csv'
+FICHIER_MODULES = 'modules_reels.csv'
+FICHIER_EXERCICES = 'exercices_reels.json'
+
+# Nombre de modules et d'exercices candidats, avant emballage dans le budget de tokens
+TOP_K_MODULES = 50
+TOP_K_EXERCICES = 10
+
+# =============================================================================
+# TEMPLATE POUR L'AGENT AVEC VRAIES DONNÉES
+# =============================================================================
+
+pedagogical_template_real = """
+Tu es un expert pédagogique qui génère des contenus de formation de haute qualité à partir de tes données.
+
+DONNÉES RÉELLES DISPONIBLES (tableaux séparés par des tabulations ; un code comme S1 remplace la valeur
+définie par la ligne « S1=valeur » en tête de son tableau):
+=== FORMATIONS ===
+{formations_data}
+
+=== MODULES DÉTAILLÉS ===
+{modules_data}
+
+=== EXERCICES PRATIQUES ===
+{exercises_data}
+
+PARAMÈTRES DE GÉNÉRATION:
+- Type de contenu: {generation_type}
+- Domaine: {domaine}
+- Niveau: {niveau}
+- Durée: {duree}h
+- Format: {format_sortie}
+
+HISTORIQUE: {chat_history}
+
+DEMANDE UTILISATEUR: {user_input}
+
+INSTRUCTIONS SPÉCIALES:
+1. Utilise tes données pour générer un contenu pédagogique précis et structuré.
+2. Cite les sources exactes (Kaggle Learn, Python Documentation, etc.)
+3. Intègre les exercices et exemples de code fournis
+4. Respecte les durées réelles des modules
+5. Mentionne les prérequis exacts des formations réelles
+6. Si tu génères un cours, base-toi sur les vrais modules de la base de données
+
+Si tu génères un COURS COMPLET, structure ainsi:
+# titre du cours basé sur les vraies données
+
+## 📋 Source et informations
+- **Source**: [Source exacte des données]
+- **Durée réelle**: durée basée sur les vraies données
+- **Niveau**: niveau des vraies données
+- **Prérequis**: prérequis réels
+
+## 🎯 Objectifs
+objectifs tirés des données réelles
+
+## 📚 Programme
+utilise les vrais modules avec leurs durées et concepts exacts
+
+## 💻 Exercices pratiques
+utilise les vrais exercices collectés
+
+## 🔗 Références
+- Basé sur les données de: sources utilisées
+
+GÉNÈRE LE CONTENU:
+"""
+
+# =============================================================================
+# CHARGEMENT DES DONNÉES RÉELLES
+# =============================================================================
+
+def lire_donnees_reelles(rapporter=lambda niveau, message: None):
+    """
+    Lit les fichiers produits par collecte_donnees.py.
+    rapporter(niveau, message) est appelé pour chaque fichier ('succes' ou 'avertissement').
+    Retourne (formations_df, modules_df, exercises_data), ou None si les formations sont absentes.
+    """
+    if os.path.exists(FICHIER_FORMATIONS):
+        formations_df = pd.read_csv(FICHIER_FORMATIONS)
+        rapporter('succes', f"Formations réelles chargées depuis {FICHIER_FORMATIONS}")
+    else:
+        rapporter('avertissement', f"Fichier {FICHIER_FORMATIONS} non trouvé. Exécutez d'abord le script de collecte.")
+        return None
+
+    if os.path.exists(FICHIER_MODULES):
+        modules_df = pd.read_csv(FICHIER_MODULES)
+        rapporter('succes', f"Modules réels chargés depuis {FICHIER_MODULES}")
+    else:
+        rapporter('avertissement', f"Fichier {FICHIER_MODULES} non trouvé.")
+        modules_df = pd.DataFrame()
+
+    if os.path.exists(FICHIER_EXERCICES):
+        with open(FICHIER_EXERCICES, 'r', encoding='utf-8') as f:
+            exercises_data = json.load(f)
+        rapporter('succes', f"Exercices réels chargés depuis {FICHIER_EXERCICES}")
+    else:
+        rapporter('avertissement', f"Fichier {FICHIER_EXERCICES} non trouvé.")
+        exercises_data = []
+
+    return formations_df, modules_df, exercises_data
+
+def ouvrir_base_catalogue(rapporter=lambda niveau, message: None):
+    """
+    Ouvre la base indexée du catalogue écrite par collecte_donnees.py.
+    Une base vide est d'abord remplie depuis les fichiers CSV/JSON d'une collecte antérieure s'ils existent,
+    sinon une base d'exemple est utilisée. Retourne (base, données réelles ou non).
+    """
+    base = base_catalogue.BaseCatalogue()
+    if base.compter() > 0:
+        rapporter('succes', f"Catalogue indexé ouvert depuis {base.chemin}")
+        return base, True
+
+    donnees = lire_donnees_reelles(rapporter)
+    if donnees is not None:
+        base.remplacer(*donnees)
+        rapporter('succes', f"Catalogue indexé créé dans {base.chemin} à partir des fichiers de la collecte")
+        return base, True
+
+    base = base_catalogue.BaseCatalogue(base_catalogue.FICHIER_CATALOGUE_EXEMPLE)
+    if base.compter() == 0:
+        base.remplacer(*donnees_exemple())
+    return base, False
+
+def donnees_exemple():
+    """Données d'exemple utilisées si les fichiers réels ne sont pas disponibles"""
+    sample_formations = pd.DataFrame([
+        {'formation_id': 1, 'titre': 'Python Basics', 'domaine': 'Programming', 'niveau': 'Beginner',
+         'duree_heures': 8, 'prerequis': 'None', 'source': 'Sample Data'},
+        {'formation_id': 2, 'titre': 'Pandas Data Analysis', 'domaine': 'Data Science', 'niveau': 'Intermediate',
+         'duree_heures': 6, 'prerequis': 'Python', 'source': 'Sample Data'},
+    ])
+
+    sample_modules = pd.DataFrame([
+        {'module_id': 1, 'formation_id': 1, 'ordre': 1, 'titre': 'Variables and Types',
+         'duree_minutes': 60, 'concepts_cles': 'int, float, string, boolean'},
+        {'module_id': 2, 'formation_id': 2, 'ordre': 1, 'titre': 'DataFrame Basics',
+         'duree_minutes': 90, 'concepts_cles': 'read_csv, head, info, describe'},
+    ])
+
+    sample_exercises = [
+        {'category': 'Python Basics', 'level': 'Beginner', 'exercises': [
+            {'title': 'Hello World', 'description': 'Create a program that prints Hello World'}
+        ]}
+    ]
+
+    return sample_formations, sample_modules, sample_exercises
+
+# =============================================================================
+# PRÉPARATION D'UNE GÉNÉRATION
+# =============================================================================
+
+def filtrer_formations(formations_df, domaine, niveau):
+    """Filtre les formations sur le domaine et le niveau demandés (s'ils existent dans les données)"""
+    filtered_formations = formations_df
+    if domaine and domaine in formations_df['domaine'].values:
+        filtered_formations = formations_df[formations_df['domaine'] == domaine]
+    if niveau and niveau in formations_df['niveau'].values:
+        filtered_formations = filtered_formations[filtered_formations['niveau'] == niveau]
+    return filtered_formations
+
+def requete_index(user_input, domaine, niveau):
+    """Texte de recherche utilisé pour sélectionner les modules et exercices pertinents"""
+    return f"{user_input} {domaine} {niveau}"
+
+def selectionner(index, base, domaine, niveau, requete):
+    """
+    Modules et exercices trouvés par l'index et filtres de formations retenus pour une génération, avec l'empreinte
+    du contenu de ces enregistrements (base_catalogue.BaseCatalogue.empreinte_selection) : deux sélections de même
+    empreinte donnent le même contexte, quels que soient les autres changements du catalogue
+    """
+    resultats_modules = index.rechercher(requete, k=TOP_K_MODULES, type_doc=index_catalogue.DOC_MODULE)
+    resultats_exercices = index.rechercher(requete, k=TOP_K_EXERCICES, type_doc=index_catalogue.DOC_EXERCICE)
+    selection = {
+        "filtres": base.filtres_formations(domaine, niveau),
+        "modules": [int(index.refs_docs[doc][0]) for doc, _ in resultats_modules],
+        "exercices": [[int(v) for v in index.refs_docs[doc]] for doc, _ in resultats_exercices],
+    }
+    selection["empreinte"] = base.empreinte_selection(selection)
+    return selection
+
+def preparer_selection(base, selection, generation_type, requete, formats=None):
+    """
+    Met en forme le contexte du prompt à partir d'une sélection (selectionner) : seuls les modules et exercices
+    sélectionnés et les formations du domaine et du niveau sont lus dans la base
+    """
+    modules_selectionnes = base.modules_par_ids(selection["modules"])
+    exercices_selectionnes = base.exercices_par_refs([tuple(ref) for ref in selection["exercices"]])
+    filtered_formations = base.formations(**selection["filtres"])
+
+    # Emballer le contexte dans le budget de tokens du type de contenu (formats : voir contexte_prompt.FORMATS_SECTIONS)
+    contexte, rapport_tokens = contexte_prompt.preparer_contexte(
+        generation_type, filtered_formations, modules_selectionnes, exercices_selectionnes, requete, formats
+    )
+
+    sources = {}
+    if not filtered_formations.empty and 'source' in filtered_formations.columns:
+        sources = {str(k): int(v) for k, v in filtered_formations['source'].value_counts(sort=False).items()}
+
+    return {
+        "contexte": contexte,
+        "rapport_tokens": rapport_tokens,
+        "sources": sources,
+        "nb_formations": len(filtered_formations),
+        "nb_modules_candidats": len(modules_selectionnes),
+        "nb_exercices_candidats": sum(len(c['exercises']) for c in exercices_selectionnes),
+        "selection": selection,
+    }
+
+def preparer_generation_base(index, base, generation_type, domaine, niveau, requete, formats=None):
+    """Sélectionne les enregistrements pertinents de la base indexée du catalogue et met en forme le contexte du prompt"""
+    return preparer_selection(base, selectionner(index, base, domaine, niveau, requete), generation_type, requete, formats)
+
+def variables_prompt(preparation, generation_type, domaine, niveau, duree, format_sortie, user_input):
+    """Variables de pedagogical_template_real (hors historique de conversation)"""
+    return {
+        **preparation["contexte"],
+        "generation_type": generation_type,
+        "domaine": domaine,
+        "niveau": niveau,
+        "duree": duree,
+        "format_sortie": format_sortie,
+        "user_input": user_input
+    }
+
+def creer_course_data(preparation, generation_type, domaine, niveau, duree, user_input, contenu):
+    """Enregistrement d'un contenu généré, tel que conservé dans l'historique et exporté en JSON"""
+    return {
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M"),
+        "type": generation_type,
+        "domaine": domaine,
+        "niveau": niveau,
+        "duree": duree,
+        "demande": user_input,
+        "contenu": contenu,
+        "sources_utilisees": list(preparation["sources"]),
+        "nb_formations_source": preparation["nb_formations"]
+    }
@@ -0,0 +1,147 @@
+"""
+Profil des imports au démarrage à froid des applications Streamlit
+Les imports de niveau module de chaque application (ceux exécutés avant le premier affichage) sont
+rejoués dans un interpréteur neuf avec `python -X importtime`. Le rapport donne le temps total, les
+imports les plus coûteux et les modules de la pile LLM chargés au démarrage alors qu'ils doivent
+l'être à la première génération. Le code de sortie est 1 en cas de régression (module différé importé
+au démarrage, ou budget de temps dépassé), pour servir de garde-fou en intégration continue.
+
+Usage : python profil_demarrage.py [app.py ...] [--budget-ms 1500] [--json profil.json]
+"""
+
+import argparse
+import ast
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+APPLICATIONS = ("agent_donnees_reelles.py", "llm_with_langchain.py")
+
+# Pile LLM : importée à la première génération, jamais au démarrage
+MODULES_DIFFERES = (
+    "langchain", "langchain_core", "langchain_community", "langchain_google_genai",
+    "langchain_text_splitters", "google.generativeai", "google.ai", "grpc",
+)
+
+REPETITIONS = 3
+NB_IMPORTS_AFFICHES = 10
+
+_LIGNE_IMPORTTIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)$")
+
+
+def imports_de_niveau_module(chemin):
+    """Modules importés au niveau module d'un script (hors imports placés dans des fonctions), dans l'ordre"""
+    with open(chemin, 'r', encoding='utf-8') as f:
+        arbre = ast.parse(f.read(), filename=chemin)
+    modules = []
+    for noeud in arbre.body:
+        if isinstance(noeud, ast.Import):
+            modules.extend(alias.name for alias in noeud.names)
+        elif isinstance(noeud, ast.ImportFrom) and noeud.module and noeud.level == 0:
+            modules.append(noeud.module)
+    return list(dict.fromkeys(modules))
+
+def est_differe(module, differes=MODULES_DIFFERES):
+    return any(module == d or module.startswith(d + ".") for d in differes)
+
+def mesurer_imports(modules, dossier=None):
+    """
+    Importe les modules dans un interpréteur neuf avec -X importtime.
+    Retourne la liste des imports [(module, profondeur, propre_us, cumule_us, import de premier niveau)].
+    """
+    code = "; ".join(f"import {m}" for m in modules) or "pass"
+    resultat = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=dossier, capture_output=True, text=True
+    )
+    if resultat.returncode != 0:
+        raise RuntimeError(f"Échec de l'import de {modules} :\n{resultat.stderr.strip().splitlines()[-1]}")
+
+    imports, en_attente = [], []
+    for ligne in resultat.stderr.splitlines():
+        correspondance = _LIGNE_IMPORTTIME.match(ligne)
+        if not correspondance:
+            continue
+        propre, cumule, espaces, module = correspondance.groups()
+        profondeur = (len(espaces) - 1) // 2
+        # -X importtime écrit un module après ses dépendances : un import imbriqué appartient au prochain
+        # import de premier niveau
+        en_attente.append([module, profondeur, int(propre), int(cumule), None])
+        if profondeur == 0:
+            for element in en_attente:
+                element[4] = module
+            imports.extend(tuple(element) for element in en_attente)
+            en_attente = []
+    return imports
+
+def profiler_application(chemin, repetitions=REPETITIONS, differes=MODULES_DIFFERES):
+    """Profil médian des imports de démarrage d'une application"""
+    modules = imports_de_niveau_module(chemin)
+    dossier = os.path.dirname(os.path.abspath(chemin))
+    # Modules chargés par l'interpréteur lui-même (site, encodings, ...) : hors du coût de l'application
+    amorce = {module for module, *_ in mesurer_imports([], dossier)}
+    mesures = [
+        [element for element in mesurer_imports(modules, dossier) if element[4] not in amorce]
+        for _ in range(repetitions)
+    ]
+
+    totaux = [sum(cumule for _, profondeur, _, cumule, _ in imports if profondeur == 0) for imports in mesures]
+    mediane = sorted(range(repetitions), key=lambda i: totaux[i])[repetitions // 2]
+    imports = mesures[mediane]
+
+    premiers_niveaux = sorted(
+        ((module, cumule) for module, profondeur, _, cumule, _ in imports if profondeur == 0),
+        key=lambda x: -x[1]
+    )
+    fautifs = {}
+    for module, _, _, _, racine in imports:
+        if est_differe(module, differes):
+            fautifs.setdefault(racine, []).append(module)
+
+    return {
+        "application": os.path.basename(chemin),
+        "imports_niveau_module": modules,
+        "total_ms": round(statistics.median(totaux) / 1000, 1),
+        "modules_importes": len(imports),
+        "plus_couteux": [{"module": m, "cumule_ms": round(c / 1000, 1)} for m, c in premiers_niveaux[:NB_IMPORTS_AFFICHES]],
+        # Import de premier niveau -> modules de la pile LLM qu'il entraîne au démarrage
+        "modules_differes_importes": {racine: sorted(set(m)) for racine, m in fautifs.items()},
+    }
+
+def afficher_rapport(profil, budget_ms=None):
+    print(f"\n🚀 {profil['application']} : {profil['total_ms']:.0f} ms d'imports au démarrage "
+          f"({profil['modules_importes']} modules)")
+    for element in profil["plus_couteux"]:
+        print(f"   {element['cumule_ms']:8.1f} ms  {element['module']}")
+
+    regression = False
+    if profil["modules_differes_importes"]:
+        regression = True
+        print("❌ Pile LLM importée au démarrage :")
+        for racine, modules in profil["modules_differes_importes"].items():
+            print(f"   • via '{racine}' : {', '.join(modules[:5])}{' …' if len(modules) > 5 else ''}")
+    if budget_ms is not None and profil["total_ms"] > budget_ms:
+        regression = True
+        print(f"❌ Budget de démarrage dépassé : {profil['total_ms']:.0f} ms > {budget_ms:.0f} ms")
+    if not regression:
+        print("✅ Aucun module différé importé au démarrage")
+    return regression
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Profil des imports au démarrage des applications Streamlit")
+    parser.add_argument("applications", nargs="*", default=list(APPLICATIONS))
+    parser.add_argument("--budget-ms", type=float, default=None, help="Temps d'import maximal au démarrage")
+    parser.add_argument("--repetitions", type=int, default=REPETITIONS)
+    parser.add_argument("--json", help="Écrire les profils dans ce fichier JSON")
+    arguments = parser.parse_args()
+
+    profils = [profiler_application(chemin, arguments.repetitions) for chemin in arguments.applications]
+    regressions = [afficher_rapport(profil, arguments.budget_ms) for profil in profils]
+    if arguments.json:
+        with open(arguments.json, 'w', encoding='utf-8') as f:
+            json.dump(profils, f, ensure_ascii=False, indent=2)
+    sys.exit(1 if any(regressions) else 0)
@@ -0,0 +1,298 @@
+"""
+Index des plus proches voisins sur les profils d'étudiants de StressLevelDataset
+Les 20 facteurs entiers sont centrés-réduits et stockés dans une matrice float32 contiguë ; les distances
+sont calculées par blocs (produit matriciel) pour rester bornées en mémoire sur des millions de lignes.
+Un mode approximatif IVF (k-moyennes + listes inversées, seules les nprobe cellules les plus proches sont
+parcourues) est disponible pour les gros volumes, avec un benchmark de rappel contre la recherche exacte.
+
+Usage (benchmark sur données synthétiques) :
+    python profils_stress.py --lignes 1000000 --k 10 --nprobe 8 16 32
+"""
+
+import re
+import time
+import argparse
+import threading
+import numpy as np
+import donnees_stress
+from cube_stress import CIBLE, NOM_JEU
+
+# Lignes traitées par bloc de calcul de distances (bloc x d float32)
+TAILLE_BLOC = 65536
+# Taille maximale d'une matrice de distances requêtes x bloc (16 M float32 = 64 Mo)
+ELEMENTS_MAX = 16 * 1024 * 1024
+# Au-delà de ce nombre de lignes, la recherche passe par défaut en mode approximatif
+SEUIL_APPROXIMATIF = 200_000
+NPROBE_DEFAUT = 16
+ITERATIONS_KMEANS = 10
+ECHANTILLON_KMEANS = 50_000
+
+# =============================================================================
+# 1. DISTANCES PAR BLOCS
+# =============================================================================
+
+def plus_proches(base, requetes, k, poids=None, normes=None, ids=None):
+    """
+    Top-k des distances euclidiennes (au carré) entre chaque requête et les lignes de base.
+    poids : masque (d,) des facteurs pris en compte ; normes : ||x||² précalculées (sans masque).
+    Retourne (indices (m, k), distances (m, k)) triés par distance croissante.
+    """
+    requetes = np.atleast_2d(requetes).astype(np.float32)
+    par_lot = max(1, ELEMENTS_MAX // max(1, min(len(base), TAILLE_BLOC)))
+    if len(requetes) > par_lot:
+        # Beaucoup de requêtes (affectation aux centres de l'IVF) : traitées par lots
+        resultats = [plus_proches(base, requetes[i:i + par_lot], k, poids, normes, ids) for i in range(0, len(requetes), par_lot)]
+        return np.concatenate([r[0] for r in resultats]), np.concatenate([r[1] for r in resultats])
+    if poids is not None:
+        requetes = requetes * poids
+    k = min(k, len(base))
+    meilleurs_d = np.full((len(requetes), 0), np.inf, dtype=np.float32)
+    meilleurs_i = np.empty((len(requetes), 0), dtype=np.int64)
+    normes_requetes = (requetes * requetes).sum(axis=1, keepdims=True)
+
+    for debut in range(0, len(base), TAILLE_BLOC):
+        bloc = base[debut:debut + TAILLE_BLOC]
+        if poids is None and normes is not None:
+            normes_bloc = normes[debut:debut + TAILLE_BLOC]
+        else:
+            normes_bloc = (bloc * bloc) @ (poids if poids is not None else np.ones(bloc.shape[1], dtype=np.float32))
+        distances = normes_bloc[None, :] - 2.0 * (requetes @ bloc.T) + normes_requetes
+        kb = min(k, bloc.shape[0])
+        if kb == 1:
+            partiel = distances.argmin(axis=1)[:, None]
+        else:
+            partiel = np.argpartition(distances, kb - 1, axis=1)[:, :kb]
+        candidats_d = np.concatenate([meilleurs_d, np.take_along_axis(distances, partiel, axis=1)], axis=1)
+        candidats_i = np.concatenate([meilleurs_i, partiel + debut], axis=1)
+        garde = np.argsort(candidats_d, axis=1, kind='stable')[:, :k]
+        meilleurs_d = np.take_along_axis(candidats_d, garde, axis=1)
+        meilleurs_i = np.take_along_axis(candidats_i, garde, axis=1)
+
+    if ids is not None:
+        meilleurs_i = ids[meilleurs_i]
+    return meilleurs_i, np.maximum(meilleurs_d, 0.0)
+
+def kmeans(matrice, nb_centres, iterations=ITERATIONS_KMEANS, graine=0):
+    """k-moyennes (Lloyd) entraîné sur un échantillon ; retourne les centres float32"""
+    rng = np.random.default_rng(graine)
+    echantillon = matrice[rng.choice(len(matrice), min(len(matrice), ECHANTILLON_KMEANS), replace=False)]
+    centres = echantillon[rng.choice(len(echantillon), nb_centres, replace=False)].copy()
+    for _ in range(iterations):
+        affectation = plus_proches(centres, echantillon, 1)[0][:, 0]
+        effectifs = np.bincount(affectation, minlength=nb_centres)
+        sommes = np.zeros_like(centres)
+        np.add.at(sommes, affectation, echantillon)
+        vides = effectifs == 0
+        centres[~vides] = sommes[~vides] / effectifs[~vides, None]
+        # Cellules vides : réinitialisées sur des points de l'échantillon
+        centres[vides] = echantillon[rng.choice(len(echantillon), int(vides.sum()), replace=False)]
+    return np.ascontiguousarray(centres, dtype=np.float32)
+
+# =============================================================================
+# 2. INDEX DES PROFILS
+# =============================================================================
+
+class IndexProfils:
+    """Matrice normalisée des profils, avec listes inversées IVF optionnelles"""
+
+    def __init__(self, facteurs, valeurs, cible):
+        self.facteurs = list(facteurs)
+        valeurs = np.asarray(valeurs, dtype=np.float32)
+        self.moyennes = valeurs.mean(axis=0)
+        self.ecarts = valeurs.std(axis=0)
+        self.ecarts[self.ecarts == 0] = 1.0
+        self.valeurs = valeurs
+        self.matrice = np.ascontiguousarray((valeurs - self.moyennes) / self.ecarts, dtype=np.float32)
+        self.normes = (self.matrice * self.matrice).sum(axis=1)
+        self.cible = np.asarray(cible)
+        # (centres, ordre des lignes par cellule, début de chaque cellule), publiés ensemble une fois construits :
+        # l'index est partagé entre les sessions (st.cache_resource)
+        self.ivf = None
+        self._verrou_ivf = threading.Lock()
+
+    @classmethod
+    def depuis_dataframe(cls, df, cible=CIBLE):
+        facteurs = [c for c in df.columns if c != cible]
+        return cls(facteurs, df[facteurs].to_numpy(), df[cible].to_numpy())
+
+    def __len__(self):
+        return len(self.matrice)
+
+    @property
+    def centres(self):
+        return self.ivf[0] if self.ivf is not None else None
+
+    def construire_ivf(self, nb_centres=None):
+        """Partitionne les lignes en cellules (k-moyennes) ; ~√n cellules par défaut"""
+        with self._verrou_ivf:
+            self.ivf = self._calculer_ivf(nb_centres)
+        return self
+
+    def _calculer_ivf(self, nb_centres=None):
+        nb_centres = nb_centres or int(min(4096, max(1, np.sqrt(len(self)))))
+        centres = kmeans(self.matrice, min(nb_centres, len(self)))
+        affectation = plus_proches(centres, self.matrice, 1)[0][:, 0]
+        ordre_cellules = np.argsort(affectation, kind='stable')
+        debut_cellules = np.concatenate([[0], np.cumsum(np.bincount(affectation, minlength=len(centres)))])
+        return centres, ordre_cellules, debut_cellules
+
+    def _obtenir_ivf(self):
+        """IVF construit au premier besoin, une seule fois même si plusieurs sessions cherchent en même temps"""
+        ivf = self.ivf
+        if ivf is None:
+            with self._verrou_ivf:
+                if self.ivf is None:
+                    self.ivf = self._calculer_ivf()
+                ivf = self.ivf
+        return ivf
+
+    def normaliser(self, profil):
+        """Profil brut {facteur: valeur} -> (vecteur normalisé, masque des facteurs renseignés)"""
+        vecteur = np.zeros(len(self.facteurs), dtype=np.float32)
+        poids = np.zeros(len(self.facteurs), dtype=np.float32)
+        for facteur, valeur in profil.items():
+            j = self.facteurs.index(facteur)
+            vecteur[j] = (valeur - self.moyennes[j]) / self.ecarts[j]
+            poids[j] = 1.0
+        return vecteur, poids
+
+    def rechercher(self, requetes, k=5, poids=None, approximatif=None, nprobe=NPROBE_DEFAUT):
+        """
+        Top-k voisins de requêtes déjà normalisées (m, d). Mode approximatif par défaut au-delà de
+        SEUIL_APPROXIMATIF lignes ; l'IVF est construit au premier besoin (sous verrou : l'index est partagé).
+        """
+        requetes = np.atleast_2d(requetes).astype(np.float32)
+        if poids is not None and poids.all():
+            poids = None
+        if approximatif is None:
+            approximatif = len(self) > SEUIL_APPROXIMATIF
+        if not approximatif:
+            return plus_proches(self.matrice, requetes, k, poids=poids, normes=self.normes)
+
+        centres, ordre_cellules, debut_cellules = self._obtenir_ivf()
+        cellules = plus_proches(centres, requetes, nprobe, poids=poids)[0]
+        # Moins de k candidats dans les cellules sondées : complété par -1 / inf
+        indices = np.full((len(requetes), k), -1, dtype=np.int64)
+        distances = np.full((len(requetes), k), np.inf, dtype=np.float32)
+        for r, (requete, sondees) in enumerate(zip(requetes, cellules)):
+            candidats = np.concatenate([ordre_cellules[debut_cellules[c]:debut_cellules[c + 1]] for c in sondees])
+            if len(candidats):
+                i, d = plus_proches(self.matrice[candidats], requete, k, poids=poids, ids=candidats)
+                indices[r, :i.shape[1]] = i[0]
+                distances[r, :d.shape[1]] = d[0]
+        return indices, distances
+
+# =============================================================================
+# 3. PROFIL CITÉ DANS LA QUESTION ET BLOC DE CONTEXTE
+# =============================================================================
+
+MOTS_SIMILARITE = ("similar", "similaire", "like this", "comme ce", "proche", "neighbo", "voisin")
+MOTIF_LIGNE = re.compile(r'\b(?:student|respondent|row|élève|etudiant|étudiant|ligne)\s*#?\s*(\d+)')
+
+def profil_depuis_question(index, question):
+    """
+    Profil de référence décrit dans la question : « student 42 » (profil complet d'une ligne) ou des
+    valeurs de facteurs (« anxiety_level 15, sleep quality = 2 »). Retourne (profil, ligne) ou (None, None).
+    """
+    texte = question.lower()
+    if not any(mot in texte for mot in MOTS_SIMILARITE):
+        return None, None
+    ligne = MOTIF_LIGNE.search(texte)
+    if ligne and int(ligne.group(1)) < len(index):
+        n = int(ligne.group(1))
+        return {f: float(v) for f, v in zip(index.facteurs, index.valeurs[n])}, n
+
+    texte = re.sub(r'[\s\-]+', '_', texte)
+    profil = {}
+    for facteur in index.facteurs:
+        valeur = re.search(re.escape(facteur) + r'_?(?:=|:|is|of|at)?_?(\d+(?:\.\d+)?)', texte)
+        if valeur:
+            profil[facteur] = float(valeur.group(1))
+    return (profil or None), None
+
+def bloc_voisins(index, question, k=5):
+    """Bloc de contexte listant les k profils les plus proches et leur stress_level, ou None"""
+    profil, ligne = profil_depuis_question(index, question)
+    if not profil:
+        return None
+    vecteur, poids = index.normaliser(profil)
+    # Sur une ligne existante, on écarte l'étudiant lui-même des résultats
+    indices, distances = index.rechercher(vecteur, k + (ligne is not None), poids=poids)
+    paires = [(i, d) for i, d in zip(indices[0], distances[0]) if i >= 0 and i != ligne][:k]
+
+    colonnes = [f for f in index.facteurs if f in profil] if ligne is None else index.facteurs
+    positions = [index.facteurs.index(f) for f in colonnes]
+    reference = f"student {ligne}" if ligne is not None else ", ".join(f"{f}={profil[f]:g}" for f in colonnes)
+    lignes = [
+        f"{len(paires)} most similar students to {reference} (distance on standardized factors):",
+        "row,distance," + ",".join(colonnes) + f",{CIBLE}",
+    ]
+    for i, d in paires:
+        lignes.append(f"{i},{np.sqrt(d):.2f}," + ",".join(f"{index.valeurs[i, j]:g}" for j in positions) + f",{index.cible[i]}")
+    niveaux, effectifs = np.unique(index.cible[[i for i, _ in paires]], return_counts=True)
+    lignes.append(f"{CIBLE} among them: " + ", ".join(f"{n}: {c}" for n, c in zip(niveaux, effectifs)))
+    return "\n".join(lignes)
+
+def charger_index(dossier=None):
+    """Index des profils construit sur StressLevelDataset (format colonnaire)"""
+    return IndexProfils.depuis_dataframe(donnees_stress.charger(NOM_JEU, dossier))
+
+# =============================================================================
+# 4. BENCHMARK DE RAPPEL DU MODE APPROXIMATIF
+# =============================================================================
+
+def donnees_synthetiques(index, nb_lignes, graine=0):
+    """Rééchantillonne les profils réels avec du bruit pour simuler un très grand nombre de répondants"""
+    rng = np.random.default_rng(graine)
+    tirage = rng.integers(0, len(index), nb_lignes)
+    bruit = rng.normal(0, 0.5, (nb_lignes, len(index.facteurs))).astype(np.float32)
+    valeurs = np.clip(np.rint(index.valeurs[tirage] + bruit * index.ecarts), 0, None)
+    return IndexProfils(index.facteurs, valeurs, index.cible[tirage])
+
+def benchmark_rappel(index, nb_requetes=100, k=10, nprobe=NPROBE_DEFAUT, graine=1):
+    """Rappel@k et temps moyens du mode IVF comparé à la recherche exacte"""
+    rng = np.random.default_rng(graine)
+    requetes = index.matrice[rng.choice(len(index), nb_requetes, replace=False)]
+
+    temps_construction = 0.0
+    if index.centres is None:
+        debut = time.perf_counter()
+        index.construire_ivf()
+        temps_construction = time.perf_counter() - debut
+
+    debut = time.perf_counter()
+    exacts = index.rechercher(requetes, k, approximatif=False)[0]
+    temps_exact = (time.perf_counter() - debut) / nb_requetes
+
+    debut = time.perf_counter()
+    approches = index.rechercher(requetes, k, approximatif=True, nprobe=nprobe)[0]
+    temps_approche = (time.perf_counter() - debut) / nb_requetes
+
+    rappel = np.mean([len(np.intersect1d(e, a)) / k for e, a in zip(exacts, approches)])
+    return {
+        "lignes": len(index),
+        "cellules": len(index.centres),
+        "nprobe": nprobe,
+        "rappel": round(float(rappel), 4),
+        "construction_ivf_s": round(temps_construction, 2),
+        "exact_ms": round(temps_exact * 1000, 2),
+        "approximatif_ms": round(temps_approche * 1000, 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de rappel de l'index des profils (IVF vs exact)")
+    parser.add_argument("--lignes", type=int, default=0, help="Nombre de lignes synthétiques (0 : données réelles)")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, NPROBE_DEFAUT, 32])
+    parser.add_argument("--requetes", type=int, default=100)
+    arguments = parser.parse_args()
+
+    index = charger_index()
+    if arguments.lignes:
+        index = donnees_synthetiques(index, arguments.lignes)
+    for nprobe in arguments.nprobe:
+        resultat = benchmark_rappel(index, arguments.requetes, arguments.k, nprobe)
+        print(f"📊 {resultat['lignes']} lignes, {resultat['cellules']} cellules, nprobe={nprobe} : "
+              f"rappel@{arguments.k}={resultat['rappel']:.3f}, exact {resultat['exact_ms']} ms/requête, "
+              f"IVF {resultat['approximatif_ms']} ms/requête (construction {resultat['construction_ivf_s']} s)")
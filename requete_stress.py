@@ -0,0 +1,273 @@
+"""
+Moteur de requêtes local pour les questions chiffrées sur les données de stress
+Le LLM traduit la question en un plan de requête JSON restreint (filtres, regroupements, agrégats :
+aucun code arbitraire). Le plan est validé puis exécuté localement avec pandas/NumPy, et seul le petit
+tableau de résultat est ajouté au prompt : la taille du prompt ne dépend pas de la taille des données.
+
+Exemple de plan pour « quelle fraction des étudiants avec bullying >= 4 ont un stress_level de 2 ? » :
+    {"dataset": "niveau_stress",
+     "filters": [{"column": "bullying", "op": ">=", "value": 4}],
+     "group_by": ["stress_level"],
+     "aggregates": [{"func": "count"}],
+     "normalize": true}
+"""
+
+import re
+import json
+import operator
+import numpy as np
+import pandas as pd
+from index_catalogue import normaliser_texte
+
+OPERATEURS = {
+    "==": operator.eq, "!=": operator.ne, "<": operator.lt,
+    "<=": operator.le, ">": operator.gt, ">=": operator.ge,
+}
+OPERATEURS_LISTE = {"in", "not_in", "between"}
+# Opérateurs applicables aux colonnes texte (catégories) : égalité et appartenance seulement
+OPERATEURS_TEXTE = {"==", "!=", "in", "not_in"}
+FONCTIONS = {"count", "mean", "sum", "min", "max", "median", "std", "nunique"}
+
+MAX_FILTRES = 8
+MAX_REGROUPEMENTS = 2
+MAX_AGREGATS = 5
+MAX_LIGNES = 50
+
+
+class PlanInvalide(ValueError):
+    """Plan de requête refusé par la validation"""
+
+# =============================================================================
+# 1. VALIDATION DU PLAN
+# =============================================================================
+
+def _verifier_colonne(colonne, df, contexte):
+    if not isinstance(colonne, str) or colonne not in df.columns:
+        raise PlanInvalide(f"{contexte} : colonne inconnue {colonne!r}")
+    return colonne
+
+def type_colonne(serie):
+    """Type d'une colonne tel que présenté au LLM : 'text', 'boolean', 'integer' ou 'number'"""
+    if isinstance(serie.dtype, pd.CategoricalDtype) or not pd.api.types.is_numeric_dtype(serie):
+        return "text"
+    if pd.api.types.is_bool_dtype(serie):
+        return "boolean"
+    return "integer" if pd.api.types.is_integer_dtype(serie) else "number"
+
+def _verifier_valeur(valeur, type_attendu, contexte):
+    """Une valeur de filtre doit être scalaire et du type de la colonne (texte ou nombre)"""
+    if isinstance(valeur, bool) and type_attendu != "boolean" or not isinstance(valeur, (int, float, str)):
+        raise PlanInvalide(f"{contexte} : valeur non scalaire {valeur!r}")
+    if (type_attendu == "text") != isinstance(valeur, str):
+        attendu = "du texte" if type_attendu == "text" else "un nombre"
+        raise PlanInvalide(f"{contexte} : la colonne attend {attendu}, pas {valeur!r}")
+    return valeur
+
+def valider_plan(plan, jeux):
+    """
+    Vérifie le plan contre les DataFrames disponibles (dictionnaire nom -> DataFrame).
+    Retourne un plan normalisé ne contenant que des clés et valeurs autorisées.
+    """
+    if not isinstance(plan, dict):
+        raise PlanInvalide("Le plan doit être un objet JSON")
+    nom = plan.get("dataset")
+    if nom not in jeux:
+        raise PlanInvalide(f"Jeu de données inconnu {nom!r} (disponibles : {sorted(jeux)})")
+    df = jeux[nom]
+
+    filtres = plan.get("filters") or []
+    if not isinstance(filtres, list) or len(filtres) > MAX_FILTRES:
+        raise PlanInvalide(f"'filters' doit être une liste d'au plus {MAX_FILTRES} éléments")
+    filtres_valides = []
+    for filtre in filtres:
+        if not isinstance(filtre, dict):
+            raise PlanInvalide("Chaque filtre doit être un objet")
+        colonne = _verifier_colonne(filtre.get("column"), df, "Filtre")
+        op = filtre.get("op")
+        valeur = filtre.get("value")
+        type_attendu = type_colonne(df[colonne])
+        if op not in OPERATEURS and op not in OPERATEURS_LISTE:
+            raise PlanInvalide(f"Filtre {colonne} : opérateur non autorisé {op!r}")
+        if type_attendu == "text" and op not in OPERATEURS_TEXTE:
+            raise PlanInvalide(f"Filtre {colonne} : '{op}' n'est pas applicable à une colonne texte")
+        if op in OPERATEURS:
+            valeur = _verifier_valeur(valeur, type_attendu, f"Filtre {colonne}")
+        else:
+            if not isinstance(valeur, list) or not valeur or (op == "between" and len(valeur) != 2):
+                raise PlanInvalide(f"Filtre {colonne} : '{op}' attend une liste de valeurs")
+            valeur = [_verifier_valeur(v, type_attendu, f"Filtre {colonne}") for v in valeur]
+        filtres_valides.append({"column": colonne, "op": op, "value": valeur})
+
+    regroupements = plan.get("group_by") or []
+    if not isinstance(regroupements, list) or len(regroupements) > MAX_REGROUPEMENTS:
+        raise PlanInvalide(f"'group_by' doit être une liste d'au plus {MAX_REGROUPEMENTS} colonnes")
+    regroupements = [_verifier_colonne(c, df, "Regroupement") for c in regroupements]
+
+    agregats = plan.get("aggregates") or [{"func": "count"}]
+    if not isinstance(agregats, list) or len(agregats) > MAX_AGREGATS:
+        raise PlanInvalide(f"'aggregates' doit être une liste d'au plus {MAX_AGREGATS} éléments")
+    agregats_valides = []
+    for agregat in agregats:
+        if not isinstance(agregat, dict) or agregat.get("func") not in FONCTIONS:
+            raise PlanInvalide(f"Agrégat non autorisé {agregat!r} (fonctions : {sorted(FONCTIONS)})")
+        if agregat["func"] == "count":
+            agregats_valides.append({"func": "count"})
+            continue
+        colonne = _verifier_colonne(agregat.get("column"), df, f"Agrégat {agregat['func']}")
+        if agregat["func"] != "nunique" and type_colonne(df[colonne]) not in ("integer", "number"):
+            raise PlanInvalide(f"Agrégat {agregat['func']} : la colonne {colonne!r} n'est pas numérique")
+        agregats_valides.append({"func": agregat["func"], "column": colonne})
+    # Deux agrégats identiques produiraient la même colonne de résultat
+    noms = [nom_agregat(agregat) for agregat in agregats_valides]
+    doublons = sorted({nom for nom in noms if noms.count(nom) > 1})
+    if doublons:
+        raise PlanInvalide(f"Agrégats en double : {doublons}")
+
+    limite = plan.get("limit", MAX_LIGNES)
+    if not isinstance(limite, int) or isinstance(limite, bool) or limite < 1:
+        raise PlanInvalide("'limit' doit être un entier positif")
+
+    return {
+        "dataset": nom,
+        "filters": filtres_valides,
+        "group_by": regroupements,
+        "aggregates": agregats_valides,
+        "normalize": bool(plan.get("normalize", False)),
+        "limit": min(limite, MAX_LIGNES),
+    }
+
+# =============================================================================
+# 2. EXÉCUTION LOCALE
+# =============================================================================
+
+def masque_filtres(df, filtres):
+    """Masque booléen vectorisé correspondant à la conjonction des filtres"""
+    masque = np.ones(len(df), dtype=bool)
+    for filtre in filtres:
+        colonne = df[filtre["column"]]
+        op, valeur = filtre["op"], filtre["value"]
+        if op in OPERATEURS:
+            masque &= np.asarray(OPERATEURS[op](colonne, valeur), dtype=bool)
+        elif op == "between":
+            masque &= np.asarray(colonne.between(valeur[0], valeur[1]), dtype=bool)
+        else:
+            dans = np.asarray(colonne.isin(valeur), dtype=bool)
+            masque &= dans if op == "in" else ~dans
+    return masque
+
+def nom_agregat(agregat):
+    """Nom de la colonne de résultat d'un agrégat validé"""
+    return "count" if agregat["func"] == "count" else f"{agregat['func']}_{agregat['column']}"
+
+def executer_plan(plan, jeux):
+    """Exécute un plan validé ; retourne (tableau de résultat, nombre de lignes filtrées, nombre total)"""
+    df = jeux[plan["dataset"]]
+    filtre = df[masque_filtres(df, plan["filters"])]
+
+    colonnes = {}
+    for agregat in plan["aggregates"]:
+        colonnes[nom_agregat(agregat)] = ("__ligne", "size") if agregat["func"] == "count" else (agregat["column"], agregat["func"])
+
+    if plan["group_by"]:
+        groupes = filtre.assign(__ligne=1).groupby(plan["group_by"], observed=True, sort=True)
+        resultat = groupes.agg(**colonnes).reset_index()
+    else:
+        resultat = pd.DataFrame([{
+            nom: len(filtre) if fonction == "size" else filtre[colonne].agg(fonction)
+            for nom, (colonne, fonction) in colonnes.items()
+        }])
+
+    if plan["normalize"] and "count" in resultat.columns:
+        resultat["fraction"] = (resultat["count"] / max(len(filtre), 1)).round(4)
+
+    return resultat.head(plan["limit"]), len(filtre), len(df)
+
+def formater_resultat(plan, resultat, nb_filtre, nb_total):
+    """Bloc de contexte compact : plan appliqué, effectifs et tableau CSV du résultat"""
+    conditions = " AND ".join(f"{f['column']} {f['op']} {f['value']}" for f in plan["filters"]) or "none"
+    return "\n".join([
+        f"Query on {plan['dataset']}: filters: {conditions}; group_by: {', '.join(plan['group_by']) or 'none'}",
+        f"Matching rows: {nb_filtre} of {nb_total}",
+        resultat.to_csv(index=False, float_format="%.4g").strip(),
+    ])
+
+# =============================================================================
+# 3. GÉNÉRATION DU PLAN PAR LE LLM
+# =============================================================================
+
+def decrire_schemas(jeux):
+    """Description compacte des colonnes de chaque jeu de données pour le prompt de planification"""
+    lignes = []
+    for nom, df in jeux.items():
+        lignes.append(f"dataset {nom} ({len(df)} rows):")
+        for colonne in df.columns:
+            serie = df[colonne]
+            type_serie = type_colonne(serie)
+            if serie.isna().all():
+                lignes.append(f"  - {colonne!r}: {type_serie}, all values missing")
+            elif type_serie == "text":
+                valeurs = serie.cat.categories if isinstance(serie.dtype, pd.CategoricalDtype) else serie.dropna().unique()
+                lignes.append(f"  - {colonne!r}: text, values {[str(v) for v in valeurs[:6]]}")
+            elif type_serie == "integer":
+                lignes.append(f"  - {colonne!r}: integer {serie.min()}..{serie.max()}")
+            else:
+                lignes.append(f"  - {colonne!r}: {type_serie} {serie.min():.4g}..{serie.max():.4g}")
+    return "\n".join(lignes)
+
+PROMPT_PLAN = """You translate questions about student stress survey data into a JSON query plan.
+Only output JSON, no explanation. If the question does not need a numeric computation on the data, output {{"dataset": null}}.
+
+Schema of the plan:
+{{"dataset": <dataset name>,
+ "filters": [{{"column": <column>, "op": one of == != < <= > >= in not_in between, "value": <scalar or list>}}],
+ "group_by": [<column>, ...] (at most 2),
+ "aggregates": [{{"func": one of count mean sum min max median std nunique, "column": <column, not needed for count>}}],
+ "normalize": <true to add the fraction of matching rows per group>}}
+Text columns only accept == != in not_in with the listed values; numeric columns take numbers and numeric aggregates.
+
+Available data:
+{schemas}
+
+Question: {question}
+JSON plan:"""
+
+def extraire_json(texte):
+    """Extrait le premier objet JSON d'une réponse du LLM (éventuellement entourée de ```json)"""
+    correspondance = re.search(r'\{.*\}', texte, re.DOTALL)
+    if not correspondance:
+        raise PlanInvalide("Aucun objet JSON dans la réponse du LLM")
+    try:
+        return json.loads(correspondance.group(0))
+    except ValueError as e:
+        raise PlanInvalide(f"JSON invalide : {e}")
+
+# Indices d'une question chiffrée (texte sans accents) : sans aucun d'eux, aucun plan n'est demandé au LLM
+MOTIF_CALCUL = re.compile(
+    r"\b(?:how many|how much|number of|count\w*|average|mean|median|sum|total|max\w*|min\w*|std|deviation|"
+    r"percent\w*|proportion|fraction|ratio|rate|share|distribution|breakdown|most|least|highest|lowest|"
+    r"more than|less than|above|below|greater|fewer|between|compar\w*|correlat\w*|per|"
+    r"combien|nombre|moyenne?|mediane|somme|pourcentage|taux|repartition|plus de|moins de|"
+    r"superieur\w*|inferieur\w*|entre|par)\b|%|[<>]=?|=="
+)
+
+def demande_calcul(question):
+    """Filtre peu coûteux : la question contient-elle un indice de calcul (mot-clé ou comparaison) ?"""
+    return MOTIF_CALCUL.search(normaliser_texte(question)) is not None
+
+def generer_plan(question, appeler_llm, jeux):
+    """
+    Demande un plan au LLM et le valide. appeler_llm(prompt) -> texte de réponse.
+    Retourne le plan validé, ou None si la question ne demande pas de calcul.
+    """
+    reponse = appeler_llm(PROMPT_PLAN.format(schemas=decrire_schemas(jeux), question=question))
+    plan = extraire_json(reponse)
+    if plan.get("dataset") is None:
+        return None
+    return valider_plan(plan, jeux)
+
+def repondre(question, appeler_llm, jeux):
+    """Pipeline complet : plan du LLM, exécution locale, bloc de contexte (ou None si pas de calcul)"""
+    plan = generer_plan(question, appeler_llm, jeux)
+    if plan is None:
+        return None
+    return formater_resultat(plan, *executer_plan(plan, jeux))
@@ -0,0 +1,331 @@
+"""
+Serveur LLM local qui rejoue des réponses enregistrées, pour les tests de charge hors-ligne
+Une cassette (JSONL) contient des réponses réelles de Gemini avec leur latence mesurée (temps jusqu'au
+premier token, durée totale). Le serveur les renvoie en flux, au même rythme : un prompt déjà enregistré
+reçoit sa réponse et sa latence d'origine, un prompt inconnu une réponse de la cassette et une latence
+tirée de la distribution enregistrée. En mode enregistrement, les prompts inconnus sont transmis à
+Gemini (clé dans GEMINI_API_KEY) et ajoutés à la cassette.
+
+Les applications s'y connectent via clients_llm quand la variable LLM_REJEU_URL est définie.
+
+Usage : python serveur_rejeu.py cassette_llm.jsonl --port 8765 [--enregistrer] [--facteur-latence 1.0]
+        python serveur_rejeu.py cassette_llm.jsonl --synthetique 50   (cassette générée, sans Gemini)
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from contexte_prompt import estimer_tokens
+
+FICHIER_CASSETTE = 'cassette_llm.jsonl'
+PORT_PAR_DEFAUT = 8765
+MODELE_PAR_DEFAUT = "gemini-1.5-flash-latest"
+
+# Taille des morceaux envoyés en flux (caractères)
+TAILLE_MORCEAU = 40
+# Latences des cassettes synthétiques (loi log-normale : médiane et dispersion)
+TTFT_MEDIAN_S = 0.8
+DUREE_MEDIANE_S = 4.0
+DISPERSION_LATENCE = 0.5
+
+
+def cle_prompt(modele, prompt):
+    return hashlib.sha256(f"{modele}\n{prompt}".encode('utf-8')).hexdigest()
+
+def morceaux(texte, taille=TAILLE_MORCEAU):
+    return [texte[i:i + taille] for i in range(0, len(texte), taille)] or [""]
+
+# =============================================================================
+# 1. CASSETTE
+# =============================================================================
+
+def lire_cassette(chemin):
+    """Enregistrements de la cassette (une ligne tronquée est ignorée)"""
+    enregistrements = []
+    if not os.path.exists(chemin):
+        return enregistrements
+    with open(chemin, 'r', encoding='utf-8') as f:
+        for ligne in f:
+            try:
+                enregistrements.append(json.loads(ligne))
+            except ValueError:
+                continue
+    return enregistrements
+
+def cassette_synthetique(chemin, nombre=50, graine=42):
+    """
+    Écrit une cassette de `nombre` réponses au format d'un cours, avec des latences log-normales : de quoi
+    faire tourner les tests de charge sans avoir enregistré de vraies réponses
+    """
+    aleatoire = random.Random(graine)
+    sujets = ['Python', 'Pandas', 'NumPy', 'SQL', 'Machine Learning', 'Visualisation', 'Statistiques', 'API']
+    with open(chemin, 'w', encoding='utf-8') as f:
+        for numero in range(nombre):
+            sujet = aleatoire.choice(sujets)
+            modules = "\n".join(
+                f"### Module {i} : {sujet} ({aleatoire.choice((30, 45, 60, 90))} min)\n"
+                f"Concepts : {', '.join(aleatoire.sample(sujets, 3))}.\n"
+                for i in range(1, aleatoire.randint(3, 8) + 1)
+            )
+            reponse = (
+                f"# Cours {sujet} n°{numero}\n\n## 📋 Source et informations\n- **Source**: Kaggle Learn\n\n"
+                f"## 🎯 Objectifs\nMaîtriser {sujet} pas à pas.\n\n## 📚 Programme\n{modules}\n"
+                f"## 💻 Exercices pratiques\nÉcrire une fonction qui utilise {sujet}.\n"
+            )
+            ttft = TTFT_MEDIAN_S * math.exp(aleatoire.gauss(0, DISPERSION_LATENCE))
+            duree = ttft + DUREE_MEDIANE_S * math.exp(aleatoire.gauss(0, DISPERSION_LATENCE))
+            f.write(json.dumps({
+                "cle": f"synthetique-{numero}",
+                "modele": MODELE_PAR_DEFAUT,
+                "reponse": reponse,
+                "ttft_s": round(ttft, 3),
+                "duree_s": round(duree, 3),
+                "tokens_sortie": estimer_tokens(reponse),
+            }, ensure_ascii=False) + "\n")
+    return chemin
+
+# =============================================================================
+# 2. SERVEUR
+# =============================================================================
+
+class _Gestionnaire(BaseHTTPRequestHandler):
+    """POST /generer {"prompt", "modele", "temperature"} -> lignes JSON {"texte"} puis {"fin", "tokens_sortie"}"""
+
+    def do_POST(self):
+        if self.path != "/generer":
+            self.send_error(404)
+            return
+        demande = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        try:
+            for ligne in self.server.rejeu.repondre(demande):
+                self.wfile.write((json.dumps(ligne, ensure_ascii=False) + "\n").encode('utf-8'))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def do_GET(self):
+        if self.path != "/statistiques":
+            self.send_error(404)
+            return
+        corps = json.dumps(self.server.rejeu.statistiques()).encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(corps)))
+        self.end_headers()
+        self.wfile.write(corps)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ServeurRejeu:
+    """Serveur HTTP de rejeu (un thread par requête), démarré en arrière-plan par demarrer()"""
+
+    def __init__(self, cassette=FICHIER_CASSETTE, hote="127.0.0.1", port=0, facteur_latence=1.0,
+                 enregistrer=False, api_key=None, graine=None):
+        self.cassette = cassette
+        self.enregistrements = lire_cassette(cassette)
+        if not self.enregistrements and not enregistrer:
+            raise ValueError(f"Cassette '{cassette}' vide ou absente : enregistrez-la ou générez-en une avec --synthetique")
+        if enregistrer and not api_key:
+            raise ValueError("Le mode enregistrement a besoin de la clé d'API Gemini (GEMINI_API_KEY)")
+        self.par_cle = {e["cle"]: e for e in self.enregistrements}
+        self.facteur_latence = facteur_latence
+        self.enregistrer = enregistrer
+        self.api_key = api_key
+        self._aleatoire = random.Random(graine)
+        self._verrou = threading.Lock()
+        self._stats = {"requetes": 0, "rejouees": 0, "substituees": 0, "enregistrees": 0, "en_cours": 0, "en_cours_max": 0}
+
+        self.serveur = ThreadingHTTPServer((hote, port), _Gestionnaire)
+        self.serveur.daemon_threads = True
+        self.serveur.rejeu = self
+        self._thread = None
+
+    @property
+    def url(self):
+        hote, port = self.serveur.server_address[:2]
+        return f"http://{hote}:{port}"
+
+    def demarrer(self):
+        self._thread = threading.Thread(target=self.serveur.serve_forever, daemon=True, name="serveur-rejeu")
+        self._thread.start()
+        return self.url
+
+    def arreter(self):
+        self.serveur.shutdown()
+        self.serveur.server_close()
+
+    def statistiques(self):
+        with self._verrou:
+            return dict(self._stats)
+
+    def _compter(self, cle, increment=1):
+        with self._verrou:
+            self._stats[cle] += increment
+            self._stats["en_cours_max"] = max(self._stats["en_cours_max"], self._stats["en_cours"])
+
+    def _choisir(self, cle):
+        """Enregistrement rejoué et latence (ttft, durée) : ceux du prompt s'il est connu, sinon tirés de la cassette"""
+        enregistrement = self.par_cle.get(cle)
+        if enregistrement is not None:
+            self._compter("rejouees")
+            return enregistrement, (enregistrement["ttft_s"], enregistrement["duree_s"])
+        self._compter("substituees")
+        with self._verrou:
+            reponse = self.enregistrements[int(cle, 16) % len(self.enregistrements)]
+            latence = self._aleatoire.choice(self.enregistrements)
+        return reponse, (latence["ttft_s"], latence["duree_s"])
+
+    def repondre(self, demande):
+        """Lignes de la réponse en flux, au rythme de la latence enregistrée"""
+        modele = demande.get("modele") or MODELE_PAR_DEFAUT
+        cle = cle_prompt(modele, demande["prompt"])
+        self._compter("requetes")
+        self._compter("en_cours")
+        try:
+            if self.enregistrer and cle not in self.par_cle:
+                yield from self._transmettre(cle, modele, demande)
+                return
+
+            enregistrement, (ttft, duree) = self._choisir(cle)
+            parties = morceaux(enregistrement["reponse"])
+            time.sleep(ttft * self.facteur_latence)
+            # Un intervalle entre deux morceaux : le dernier arrive à la durée enregistrée
+            intervalle = max(duree - ttft, 0) * self.facteur_latence / max(len(parties) - 1, 1)
+            for i, partie in enumerate(parties):
+                if i:
+                    time.sleep(intervalle)
+                yield {"texte": partie}
+            yield {"fin": True, "tokens_sortie": enregistrement.get("tokens_sortie") or estimer_tokens(enregistrement["reponse"])}
+        finally:
+            self._compter("en_cours", -1)
+
+    def _transmettre(self, cle, modele, demande):
+        """Mode enregistrement : appelle Gemini en flux, relaie les morceaux et ajoute la réponse à la cassette"""
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        parametres = {"model": modele, "google_api_key": self.api_key}
+        if demande.get("temperature") is not None:
+            parametres["temperature"] = demande["temperature"]
+        llm = ChatGoogleGenerativeAI(**parametres)
+
+        debut = time.perf_counter()
+        ttft, textes, tokens_sortie = None, [], None
+        for morceau in llm.stream(demande["prompt"]):
+            if getattr(morceau, 'usage_metadata', None):
+                tokens_sortie = morceau.usage_metadata.get('output_tokens')
+            if not morceau.content:
+                continue
+            if ttft is None:
+                ttft = time.perf_counter() - debut
+            textes.append(morceau.content)
+            yield {"texte": morceau.content}
+        reponse = ''.join(textes)
+        enregistrement = {
+            "cle": cle,
+            "modele": modele,
+            "reponse": reponse,
+            "ttft_s": round(ttft or 0.0, 3),
+            "duree_s": round(time.perf_counter() - debut, 3),
+            "tokens_sortie": tokens_sortie or estimer_tokens(reponse),
+        }
+        with self._verrou:
+            self.enregistrements.append(enregistrement)
+            self.par_cle[cle] = enregistrement
+            with open(self.cassette, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(enregistrement, ensure_ascii=False) + "\n")
+        self._compter("enregistrees")
+        yield {"fin": True, "tokens_sortie": enregistrement["tokens_sortie"]}
+
+# =============================================================================
+# 3. CLIENT LANGCHAIN
+# =============================================================================
+
+class LLMRejeu(BaseChatModel):
+    """Modèle de chat qui interroge un ServeurRejeu (même interface que ChatGoogleGenerativeAI pour l'application)"""
+
+    url: str
+    modele: str = MODELE_PAR_DEFAUT
+    temperature: Optional[float] = None
+    timeout_s: float = 300.0
+
+    @property
+    def _llm_type(self):
+        return "rejeu"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"url": self.url, "modele": self.modele, "temperature": self.temperature}
+
+    def _lignes(self, messages):
+        prompt = "\n".join(str(message.content) for message in messages)
+        requete = urllib.request.Request(
+            self.url.rstrip("/") + "/generer",
+            data=json.dumps({"prompt": prompt, "modele": self.modele, "temperature": self.temperature}).encode('utf-8'),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(requete, timeout=self.timeout_s) as reponse:
+            for ligne in reponse:
+                if ligne.strip():
+                    yield prompt, json.loads(ligne)
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        for prompt, ligne in self._lignes(messages):
+            if ligne.get("fin"):
+                tokens_entree = estimer_tokens(prompt)
+                usage = {"input_tokens": tokens_entree, "output_tokens": ligne["tokens_sortie"],
+                         "total_tokens": tokens_entree + ligne["tokens_sortie"]}
+                yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=usage))
+                continue
+            morceau = ChatGenerationChunk(message=AIMessageChunk(content=ligne["texte"]))
+            if run_manager:
+                run_manager.on_llm_new_token(ligne["texte"], chunk=morceau)
+            yield morceau
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        textes: List[str] = [ligne["texte"] for _, ligne in self._lignes(messages) if "texte" in ligne]
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=''.join(textes)))])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serveur LLM local de rejeu de réponses enregistrées")
+    parser.add_argument("cassette", nargs="?", default=FICHIER_CASSETTE, help="Fichier JSONL des réponses enregistrées")
+    parser.add_argument("--hote", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=PORT_PAR_DEFAUT)
+    parser.add_argument("--facteur-latence", type=float, default=1.0, help="Multiplie les latences rejouées (0 = sans attente)")
+    parser.add_argument("--enregistrer", action="store_true", help="Transmettre les prompts inconnus à Gemini et les enregistrer")
+    parser.add_argument("--synthetique", type=int, metavar="N", help="Générer une cassette de N réponses synthétiques puis servir")
+    arguments = parser.parse_args()
+
+    if arguments.synthetique:
+        cassette_synthetique(arguments.cassette, arguments.synthetique)
+        print(f"🧪 Cassette synthétique de {arguments.synthetique} réponses écrite dans '{arguments.cassette}'")
+    try:
+        serveur = ServeurRejeu(
+            arguments.cassette, arguments.hote, arguments.port, arguments.facteur_latence,
+            enregistrer=arguments.enregistrer, api_key=os.environ.get("GEMINI_API_KEY")
+        )
+    except ValueError as e:
+        print(f"❌ {e}")
+        raise SystemExit(1)
+    print(f"🎞️ {len(serveur.enregistrements)} réponses enregistrées, rejouées sur {serveur.url}"
+          f"{' (mode enregistrement)' if arguments.enregistrer else ''}")
+    print(f"   export LLM_REJEU_URL={serveur.url}")
+    try:
+        serveur.serveur.serve_forever()
+    except KeyboardInterrupt:
+        serveur.arreter()
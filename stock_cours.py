@@ -0,0 +1,159 @@
+"""
+Stock persistant (SQLite) des contenus pédagogiques générés
+Le texte complet de chaque contenu est compressé (zlib) et n'est relu qu'à la demande (affichage
+complet, téléchargement). En mémoire, l'application ne garde que des entrées légères : métadonnées et
+aperçu de 500 caractères. Les générations sont indexées par date, type, domaine et niveau, et le texte
+est indexé en plein texte (FTS5) pour la recherche dans les générations de toutes les sessions.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+FICHIER_STOCK_COURS = 'cours_generes.db'
+TAILLE_APERCU = 500
+NIVEAU_COMPRESSION = 6
+
+# Colonnes indexées, stockées à part des autres métadonnées
+COLONNES = ("type", "domaine", "niveau", "duree", "demande", "timestamp")
+
+
+def apercu(contenu, taille=TAILLE_APERCU):
+    return contenu[:taille] + "..." if len(contenu) > taille else contenu
+
+
+class StockCours:
+    """Contenus générés : métadonnées indexées, aperçu, corps compressé et index plein texte"""
+
+    def __init__(self, chemin=FICHIER_STOCK_COURS):
+        self.chemin = chemin
+        self._local = threading.local()
+
+        connexion = self._connexion()
+        connexion.execute("PRAGMA journal_mode=WAL")
+        connexion.execute("""
+            CREATE TABLE IF NOT EXISTS cours (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session TEXT,
+                cree_le REAL NOT NULL,
+                timestamp TEXT,
+                type TEXT,
+                domaine TEXT,
+                niveau TEXT,
+                duree INTEGER,
+                demande TEXT,
+                apercu TEXT NOT NULL,
+                metadonnees TEXT NOT NULL,
+                taille INTEGER NOT NULL,
+                contenu BLOB NOT NULL
+            )
+        """)
+        for colonne in ("cree_le", "type", "domaine", "niveau", "session"):
+            connexion.execute(f"CREATE INDEX IF NOT EXISTS idx_cours_{colonne} ON cours({colonne})")
+        # Index plein texte sans copie du contenu (content='') : seuls les termes sont stockés
+        connexion.execute("CREATE VIRTUAL TABLE IF NOT EXISTS cours_texte USING fts5(demande, contenu, content='')")
+        connexion.commit()
+
+    def _connexion(self):
+        """Une connexion SQLite par thread (les threads de script Streamlit ne partagent pas de connexion)"""
+        connexion = getattr(self._local, 'connexion', None)
+        if connexion is None:
+            connexion = sqlite3.connect(self.chemin, timeout=30)
+            connexion.row_factory = sqlite3.Row
+            self._local.connexion = connexion
+        return connexion
+
+    def ajouter(self, course_data, session=None):
+        """Enregistre un contenu généré (dictionnaire de creer_course_data) ; retourne son entrée légère"""
+        contenu = course_data.get("contenu", "")
+        metadonnees = {k: v for k, v in course_data.items() if k not in COLONNES and k != "contenu"}
+        connexion = self._connexion()
+        with connexion:
+            curseur = connexion.execute(
+                """INSERT INTO cours (session, cree_le, timestamp, type, domaine, niveau, duree, demande,
+                                      apercu, metadonnees, taille, contenu)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (session, time.time(), *(course_data.get(c) for c in ("timestamp", "type", "domaine", "niveau", "duree", "demande")),
+                 apercu(contenu), json.dumps(metadonnees, ensure_ascii=False), len(contenu.encode('utf-8')),
+                 zlib.compress(contenu.encode('utf-8'), NIVEAU_COMPRESSION))
+            )
+            connexion.execute("INSERT INTO cours_texte (rowid, demande, contenu) VALUES (?, ?, ?)",
+                              (curseur.lastrowid, course_data.get("demande") or "", contenu))
+        return self.entree(curseur.lastrowid)
+
+    @staticmethod
+    def _entree(ligne):
+        """Entrée légère : métadonnées et aperçu, sans le contenu complet"""
+        entree = {c: ligne[c] for c in ("id", "session", "timestamp", "type", "domaine", "niveau", "duree", "demande", "apercu", "taille")}
+        entree.update(json.loads(ligne["metadonnees"]))
+        return entree
+
+    _COLONNES_LEGERES = "id, session, timestamp, type, domaine, niveau, duree, demande, apercu, taille, metadonnees"
+
+    def entree(self, identifiant):
+        ligne = self._connexion().execute(
+            f"SELECT {self._COLONNES_LEGERES} FROM cours WHERE id = ?", (identifiant,)
+        ).fetchone()
+        return self._entree(ligne) if ligne else None
+
+    def contenu(self, identifiant):
+        """Texte complet d'un contenu, décompressé à la demande"""
+        ligne = self._connexion().execute("SELECT contenu FROM cours WHERE id = ?", (identifiant,)).fetchone()
+        return zlib.decompress(ligne["contenu"]).decode('utf-8') if ligne else None
+
+    def course_complet(self, identifiant):
+        """Enregistrement complet (format de creer_course_data) pour l'export JSON"""
+        entree = self.entree(identifiant)
+        if entree is None:
+            return None
+        course = {k: v for k, v in entree.items() if k not in ("id", "session", "apercu", "taille")}
+        course["contenu"] = self.contenu(identifiant)
+        return course
+
+    def rechercher(self, texte=None, session=None, type_contenu=None, domaine=None, niveau=None, limite=20):
+        """
+        Entrées légères les plus récentes correspondant aux filtres, toutes sessions confondues par défaut.
+        texte : requête plein texte sur la demande et le contenu (syntaxe FTS5, mots simples).
+        """
+        conditions, parametres = [], []
+        for colonne, valeur in (("session", session), ("type", type_contenu), ("domaine", domaine), ("niveau", niveau)):
+            if valeur is not None:
+                conditions.append(f"{colonne} = ?")
+                parametres.append(valeur)
+        if texte and texte.strip():
+            # Chaque mot est cité pour ne pas interpréter la saisie comme de la syntaxe FTS5
+            requete_fts = " ".join('"' + mot.replace('"', '""') + '"' for mot in texte.split())
+            conditions.append("id IN (SELECT rowid FROM cours_texte WHERE cours_texte MATCH ?)")
+            parametres.append(requete_fts)
+        clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        lignes = self._connexion().execute(
+            f"SELECT {self._COLONNES_LEGERES} FROM cours {clause} ORDER BY cree_le DESC, id DESC LIMIT ?",
+            parametres + [limite]
+        ).fetchall()
+        return [self._entree(ligne) for ligne in lignes]
+
+    def compter(self, session=None):
+        if session is None:
+            return self._connexion().execute("SELECT COUNT(*) FROM cours").fetchone()[0]
+        return self._connexion().execute("SELECT COUNT(*) FROM cours WHERE session = ?", (session,)).fetchone()[0]
+
+    def valeurs(self, colonne):
+        """Valeurs distinctes d'une colonne indexée (type, domaine, niveau) pour les filtres de recherche"""
+        if colonne not in ("type", "domaine", "niveau"):
+            raise ValueError(f"Colonne non indexée : {colonne}")
+        return [l[0] for l in self._connexion().execute(
+            f"SELECT DISTINCT {colonne} FROM cours WHERE {colonne} IS NOT NULL ORDER BY {colonne}"
+        )]
+
+    def statistiques(self):
+        entrees, octets, compresses = self._connexion().execute(
+            "SELECT COUNT(*), COALESCE(SUM(taille), 0), COALESCE(SUM(LENGTH(contenu)), 0) FROM cours"
+        ).fetchone()
+        return {
+            "entrees": entrees,
+            "octets": octets,
+            "octets_compresses": compresses,
+            "taux_compression": round(compresses / octets, 3) if octets else 0.0,
+        }
@@ -0,0 +1,79 @@
+import pandas as pd
+
+import base_catalogue
+import index_catalogue
+import noyau_pedagogique
+
+
+def creer_base(tmp_path):
+    base = base_catalogue.BaseCatalogue(str(tmp_path / "catalogue.db"))
+    formations = pd.DataFrame([
+        {"formation_id": 1, "titre": "Pandas", "domaine": "Data Science", "niveau": "Beginner", "duree_heures": 6,
+         "prerequis": "Python", "source": "Kaggle Learn"},
+        {"formation_id": 2, "titre": "Python os", "domaine": "Programming", "niveau": "Beginner", "duree_heures": 2,
+         "prerequis": "None", "source": "Python Documentation"},
+    ])
+    modules = pd.DataFrame([
+        {"module_id": 1, "formation_id": 1, "ordre": 1, "titre": "DataFrame", "duree_minutes": 60,
+         "concepts_cles": "pandas dataframe read_csv"},
+        {"module_id": 2, "formation_id": 2, "ordre": 1, "titre": "getcwd", "duree_minutes": 30,
+         "concepts_cles": "os getcwd repertoire"},
+    ])
+    exercices = [{"category": "Pandas", "level": "Beginner", "exercises": [{"title": "Lire un CSV avec pandas"}]}]
+    base.remplacer(formations, modules, exercices)
+    return base
+
+
+def test_empreinte_de_selection_ne_depend_que_des_enregistrements_utilises(tmp_path):
+    base = creer_base(tmp_path)
+    index = index_catalogue.charger_ou_construire_index_base(base, str(tmp_path / "index.npz"))
+    selection = noyau_pedagogique.selectionner(index, base, "Data Science", "Beginner", "pandas dataframe")
+    assert selection["modules"] == [1]
+    empreinte = selection["empreinte"]
+
+    # Un module d'une autre formation, hors de la sélection, change : l'empreinte est inchangée
+    base.appliquer("modules", "modifies", {"module_id": 2, "formation_id": 2, "ordre": 1, "titre": "getcwd",
+                                           "duree_minutes": 45, "concepts_cles": "os getcwd repertoire"})
+    assert base.empreinte_selection(selection) == empreinte
+
+    # Le module sélectionné change : les caches qui en dépendent sont invalidés
+    base.appliquer("modules", "modifies", {"module_id": 1, "formation_id": 1, "ordre": 1, "titre": "DataFrame",
+                                           "duree_minutes": 90, "concepts_cles": "pandas dataframe read_csv"})
+    assert base.empreinte_selection(selection) != empreinte
+
+
+def test_lectures_indexees_equivalentes_au_filtrage_pandas(tmp_path):
+    base = creer_base(tmp_path)
+    formations = base.formations()
+
+    for domaine, niveau in (("Data Science", "Beginner"), ("Inconnu", "Beginner"), (None, None), ("Programming", "Expert")):
+        attendu = noyau_pedagogique.filtrer_formations(formations, domaine, niveau)
+        assert base.filtrer_formations(domaine, niveau)["formation_id"].tolist() == attendu["formation_id"].tolist()
+
+    assert base.modules_par_ids([2, 1])["module_id"].tolist() == [2, 1]
+    assert base.exercices_par_refs([(0, 0), (0, 5), (3, 0)]) == [
+        {"category": "Pandas", "level": "Beginner", "exercises": [{"title": "Lire un CSV avec pandas"}]}
+    ]
+    assert base.statistiques()["modules"] == 2 and base.repartition("source").to_dict() == {
+        "Kaggle Learn": 1, "Python Documentation": 1
+    }
+    # Documents indexés : modules (avec leur formation) puis exercices
+    documents = list(base.documents())
+    assert [(type_doc, ref) for _, type_doc, ref in documents] == [
+        (index_catalogue.DOC_MODULE, (1, 0)), (index_catalogue.DOC_MODULE, (2, 0)), (index_catalogue.DOC_EXERCICE, (0, 0))
+    ]
+    assert "Data Science" in documents[0][0]
+
+
+def test_base_anterieure_aux_empreintes_migree(tmp_path):
+    chemin = str(tmp_path / "catalogue.db")
+    base = creer_base(tmp_path)
+    selection = {"filtres": {"domaine": None, "niveau": None}, "modules": [1, 2], "exercices": [[0, 0]]}
+    empreinte = base.empreinte_selection(selection)
+    connexion = base.connexion()
+    for table in ("formations", "modules", "exercices"):
+        connexion.execute(f"ALTER TABLE {table} DROP COLUMN empreinte")
+    connexion.commit()
+
+    # La colonne est recréée et remplie à l'ouverture, avec les mêmes empreintes
+    assert base_catalogue.BaseCatalogue(chemin).empreinte_selection(selection) == empreinte
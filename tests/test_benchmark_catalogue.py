@@ -0,0 +1,58 @@
+import benchmark_catalogue
+
+ETAPES = [
+    "collecte", "chargement_fichiers", "chargement_base", "statistiques_base", "filtrage_fichiers",
+    "filtrage_base", "index", "recherche", "contexte", "generation", "conversion_stress", "chargement_stress",
+]
+
+
+def test_catalogue_synthetique_deterministe():
+    cours = benchmark_catalogue.generer_cours(250)
+
+    assert sum(len(c["lessons"]) for c in cours) == 250
+    assert cours == benchmark_catalogue.generer_cours(250)
+    assert len(benchmark_catalogue.generer_exercices(250)) == 2
+
+
+def test_benchmark_mesure_toutes_les_etapes(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    lignes = []
+    resultats = benchmark_catalogue.executer_benchmark(100, str(tmp_path), afficher=lignes.append)
+
+    assert list(resultats) == ETAPES
+    assert len(lignes) == len(ETAPES)
+    for mesure in resultats.values():
+        assert mesure["temps_s"] >= 0 and mesure["memoire_mo"] >= 0
+    assert resultats["contexte"]["prompt_caracteres"] > 0
+    # Le prompt envoyé au LLM contient le contexte et le gabarit
+    assert resultats["generation"]["prompt_caracteres"] > resultats["contexte"]["prompt_caracteres"]
+    # Les collecteurs du benchmark ne restent pas enregistrés
+    assert "benchmark_formations" not in benchmark_catalogue.collecteurs.COLLECTEURS
+
+
+def test_comparer_signale_les_regressions_au_dela_du_bruit():
+    reference = {"100": {
+        "index": {"temps_s": 1.0, "memoire_mo": 10.0},
+        "recherche": {"temps_s": 0.01, "memoire_mo": 0.2},
+        "contexte": {"temps_s": 0.1, "memoire_mo": 1.0, "prompt_caracteres": 1000},
+    }}
+    resultats = {"100": {
+        "index": {"temps_s": 1.6, "memoire_mo": 11.0},
+        # Triplement d'une étape très courte : sous les écarts absolus minimaux
+        "recherche": {"temps_s": 0.03, "memoire_mo": 0.6},
+        "contexte": {"temps_s": 0.1, "memoire_mo": 1.0, "prompt_caracteres": 1100},
+        "generation": {"temps_s": 9.0, "memoire_mo": 90.0},
+    }}
+
+    assert benchmark_catalogue.comparer(resultats, reference) == [
+        ("100", "index", "temps_s", 1.6, 1.0),
+        ("100", "contexte", "prompt_caracteres", 1100, 1000),
+    ]
+    assert benchmark_catalogue.comparer(resultats, reference, tolerance_temps=1.0) == [
+        ("100", "contexte", "prompt_caracteres", 1100, 1000),
+    ]
+    assert benchmark_catalogue.comparer(resultats, {}) == []
+
+
+def test_charger_reference_absente(tmp_path):
+    assert benchmark_catalogue.charger_reference(str(tmp_path / "absente.json")) == {}
@@ -0,0 +1,18 @@
+import cache_contexte
+
+
+def test_eviction_des_moins_recemment_utilisees_au_dela_de_la_taille():
+    cache = cache_contexte.CacheLRU(taille_max_octets=10)
+    cache.ajouter("a", "aaaa")
+    cache.ajouter("b", "bbbb")
+    assert cache.obtenir("a") == "aaaa"
+
+    # « b » est la moins récemment utilisée : elle est évincée pour faire place à « c »
+    cache.ajouter("c", "cccc")
+    assert cache.obtenir("b") is None
+    assert cache.obtenir("a") == "aaaa" and cache.obtenir("c") == "cccc"
+    assert cache.statistiques()["octets"] == 8
+
+    # Une valeur plus grande que le cache n'est pas conservée
+    cache.ajouter("d", "d" * 11)
+    assert cache.obtenir("d") is None
@@ -0,0 +1,45 @@
+import time
+
+import cache_llm
+import generation_lot
+
+
+def test_cle_independante_des_blancs_et_de_la_casse_du_modele():
+    assert cache_llm.cle_requete("Gemini-1.5", 0, "Bonjour\n  le   monde") == cache_llm.cle_requete("gemini-1.5 ", 0.0, "Bonjour le monde")
+    assert cache_llm.cle_requete("gemini-1.5", 0.2, "Bonjour") != cache_llm.cle_requete("gemini-1.5", 0.7, "Bonjour")
+
+
+def test_expiration_et_eviction_des_moins_recemment_utilisees(tmp_path):
+    cache = cache_llm.CacheReponsesSQLite(str(tmp_path / "cache.db"), taille_max_octets=10)
+    cache.enregistrer("a", "aaaa")
+    time.sleep(0.01)
+    cache.enregistrer("b", "bbbb")
+    time.sleep(0.01)
+    assert cache.obtenir("a") == "aaaa"
+
+    # « b » est la moins récemment utilisée : évincée pour rester sous 10 octets
+    cache.enregistrer("c", "cccc")
+    assert cache.obtenir("b") is None
+    assert cache.statistiques()["entrees"] == 2
+
+    expire = cache_llm.CacheReponsesSQLite(str(tmp_path / "cache.db"), ttl_secondes=0)
+    assert expire.obtenir("a") is None
+
+
+class LLMCompteur(generation_lot.LLMBouchon):
+    appels: int = 0
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.appels += 1
+        return super()._generate(messages, stop, run_manager, **kwargs)
+
+
+def test_adaptateur_langchain_sert_la_reponse_depuis_le_disque(tmp_path):
+    chemin = str(tmp_path / "cache.db")
+    llm = LLMCompteur(delai_secondes=0, cache=cache_llm.CacheLangChain(cache_llm.CacheReponsesSQLite(chemin)))
+    premiere = llm.invoke("DEMANDE UTILISATEUR: quiz pandas")
+
+    # Un autre processus (nouvelle instance sur le même fichier) retrouve la réponse sans appeler le modèle
+    autre = LLMCompteur(delai_secondes=0, cache=cache_llm.CacheLangChain(cache_llm.CacheReponsesSQLite(chemin)))
+    assert autre.invoke("DEMANDE UTILISATEUR: quiz pandas").content == premiere.content
+    assert (llm.appels, autre.appels) == (1, 0)
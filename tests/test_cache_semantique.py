@@ -0,0 +1,60 @@
+import time
+
+import cache_semantique
+
+
+def parametres():
+    return cache_semantique.cle_parametres("Quiz", "Data Science", "Beginner", 2, "Markdown")
+
+
+def test_demande_equivalente_servie_depuis_le_cache(tmp_path):
+    cache = cache_semantique.CacheSemantique(str(tmp_path / "cache.db"))
+    cache.ajouter("Fais un quiz sur numpy", parametres(), {"contenu": "quiz numpy"})
+
+    resultat = cache.rechercher("fais un quizz sur numpy", parametres())
+    assert resultat["course_data"] == {"contenu": "quiz numpy"}
+
+
+def test_demandes_proches_mais_differentes_non_confondues(tmp_path):
+    cache = cache_semantique.CacheSemantique(str(tmp_path / "cache.db"))
+    cache.ajouter("Crée un quiz de 10 questions sur le ML", parametres(), {"contenu": "ML"})
+    cache.ajouter("Crée un quiz sur le machine learning sans exercices", parametres(), {"contenu": "sans"})
+
+    assert cache.rechercher("Crée un quiz de 10 questions sur le DL", parametres()) is None
+    assert cache.rechercher("Crée un quiz sur le machine learning avec exercices", parametres()) is None
+
+
+def test_dependances_modifiees_invalident_le_contenu(tmp_path):
+    cache = cache_semantique.CacheSemantique(str(tmp_path / "cache.db"))
+    cache.ajouter("Fais un quiz sur numpy", parametres(), {"contenu": "ancien"}, dependances={"empreinte": "a"})
+    cache.ajouter("Fais un quiz sur numpy !", parametres(), {"contenu": "actuel"}, dependances={"empreinte": "b"})
+    valider = lambda dependances: dependances["empreinte"] == "b"
+
+    # La candidate invalide est supprimée, la suivante est servie
+    assert cache.rechercher("Fais un quiz sur numpy", parametres(), valider=valider)["course_data"] == {"contenu": "actuel"}
+    assert cache.statistiques()["demandes"] == 1
+    assert cache.rechercher("Fais un quiz sur numpy", parametres(), valider=lambda d: False) is None
+    assert cache.statistiques()["demandes"] == 0
+
+
+def test_expiration(tmp_path):
+    cache = cache_semantique.CacheSemantique(str(tmp_path / "cache.db"), ttl_secondes=0.2)
+    cache.ajouter("cours pandas", parametres(), {"contenu": "pandas"})
+    time.sleep(0.3)
+
+    assert cache.rechercher("cours pandas", parametres()) is None
+    cache.ajouter("cours numpy", parametres(), {"contenu": "numpy"})
+    assert cache.rechercher("cours numpy", parametres()) is not None
+    assert cache.statistiques()["demandes"] == 1
+
+
+def test_eviction_des_moins_recemment_servies(tmp_path):
+    cache = cache_semantique.CacheSemantique(str(tmp_path / "cache.db"), max_demandes=2)
+    cache.ajouter("cours numpy", parametres(), {"contenu": "numpy"})
+    cache.ajouter("cours matplotlib", parametres(), {"contenu": "matplotlib"})
+    assert cache.rechercher("cours numpy", parametres()) is not None
+    cache.ajouter("cours seaborn", parametres(), {"contenu": "seaborn"})
+
+    assert cache.rechercher("cours matplotlib", parametres()) is None
+    assert cache.rechercher("cours numpy", parametres()) is not None
+    assert cache.statistiques()["demandes"] == 2
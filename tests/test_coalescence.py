@@ -0,0 +1,84 @@
+import threading
+import time
+
+import pytest
+from langchain_core.globals import set_llm_cache
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.prompt_values import StringPromptValue
+
+import coalescence
+import flux_llm
+
+
+def attendre_en_cours(single_flight, nombre=1):
+    for _ in range(200):
+        if single_flight.statistiques()["coalesces"] >= nombre:
+            return
+        time.sleep(0.01)
+    raise AssertionError("l'appel en attente n'a pas rejoint la clé")
+
+
+def test_responsable_interrompu_un_appel_en_attente_reprend():
+    single_flight = coalescence.SingleFlight()
+    demarre, liberer = threading.Event(), threading.Event()
+    resultats = []
+
+    def responsable():
+        demarre.set()
+        liberer.wait()
+        raise KeyboardInterrupt
+
+    def interrompu():
+        with pytest.raises(KeyboardInterrupt):
+            single_flight.executer("cle", responsable)
+
+    fil_responsable = threading.Thread(target=interrompu)
+    fil_responsable.start()
+    demarre.wait()
+    fil_attente = threading.Thread(target=lambda: resultats.append(single_flight.executer("cle", lambda: "reprise")))
+    fil_attente.start()
+    attendre_en_cours(single_flight)
+    liberer.set()
+    fil_responsable.join()
+    fil_attente.join()
+
+    assert resultats == ["reprise"]
+    assert single_flight.statistiques() == {"appels": 2, "coalesces": 1, "en_cours": 0}
+
+
+def test_erreur_du_responsable_transmise_aux_appels_en_attente():
+    single_flight = coalescence.SingleFlight()
+    appel, _ = single_flight.rejoindre("cle")
+    single_flight.terminer("cle", appel, erreur=ValueError("quota"))
+    with pytest.raises(ValueError):
+        coalescence.SingleFlight.attendre(appel)
+
+
+def test_attente_bornee():
+    single_flight = coalescence.SingleFlight()
+    appel, _ = single_flight.rejoindre("cle")
+    with pytest.raises(TimeoutError):
+        coalescence.SingleFlight.attendre(appel, delai=0.05)
+
+
+def test_flux_ferme_par_le_responsable_libere_la_cle(monkeypatch):
+    monkeypatch.setattr(coalescence, "appels_llm", coalescence.SingleFlight())
+    set_llm_cache(None)
+    llm = GenericFakeChatModel(messages=iter([AIMessage(content="un deux trois"), AIMessage(content="un deux trois")]))
+    prompt = StringPromptValue(text="cours")
+
+    # Le consommateur du responsable s'arrête après le premier morceau (arrêt du script Streamlit)
+    flux = flux_llm.generer_en_flux(llm, prompt, flux_llm.MesureFlux())
+    next(flux)
+    resultats = []
+    attente = threading.Thread(target=lambda: resultats.append(
+        "".join(flux_llm.generer_en_flux(llm, prompt, flux_llm.MesureFlux()))
+    ))
+    attente.start()
+    attendre_en_cours(coalescence.appels_llm)
+    flux.close()
+    attente.join(5)
+
+    assert resultats == ["un deux trois"]
+    assert coalescence.appels_llm.statistiques()["en_cours"] == 0
@@ -0,0 +1,113 @@
+import json
+import pathlib
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("bs4")
+pytest.importorskip("kaggle")
+
+import base_catalogue
+import collecte_donnees
+import collecteurs
+
+
+def module_python(nom, *fonctions):
+    return {
+        "module": nom,
+        "functions": [{"name": f, "description": f"{f} description", "example": f"{f}()", "level": "Beginner"} for f in fonctions],
+    }
+
+
+@pytest.fixture
+def sources(tmp_path, monkeypatch):
+    """Deux sources de formations et une d'exercices, modifiables entre les collectes"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(collecteurs, "COLLECTEURS", {})
+    donnees = {
+        "source_a": [module_python("os", "getcwd", "listdir"), module_python("sys", "exit")],
+        "source_b": [module_python("json", "loads", "dumps")],
+        "exercices": [{"category": "Basics", "level": "Beginner", "exercises": [{"title": "Hello"}]}],
+    }
+    echecs = set()
+
+    def collecteur(nom):
+        def collecter(client):
+            if nom in echecs:
+                raise ConnectionError(f"{nom} injoignable")
+            return iter(donnees[nom])
+        return collecter
+
+    collecteurs.enregistrer("source_a", collecteur("source_a"), normaliser=collecte_donnees.normaliser_module_python)
+    collecteurs.enregistrer("source_b", collecteur("source_b"), normaliser=collecte_donnees.normaliser_module_python)
+    collecteurs.enregistrer("exercices", collecteur("exercices"), genre="exercices")
+    return donnees, echecs
+
+
+def titres_modules():
+    return sorted(pd.read_csv(collecte_donnees.FICHIER_MODULES)["titre"])
+
+
+def test_source_en_echec_annule_la_collecte(sources):
+    donnees, echecs = sources
+    collecte_donnees.collect_all_real_data()
+    avant = base_catalogue.BaseCatalogue().statistiques()
+    with open(collecte_donnees.FICHIER_MODULES, "rb") as f:
+        export_avant = f.read()
+
+    # source_a a perdu un module, mais source_b est injoignable : rien n'est supprimé ni publié
+    donnees["source_a"] = donnees["source_a"][:1]
+    echecs.add("source_b")
+    with pytest.raises(collecteurs.CollecteurEnEchec):
+        collecte_donnees.collect_all_real_data()
+
+    assert base_catalogue.BaseCatalogue().statistiques() == avant
+    with open(collecte_donnees.FICHIER_MODULES, "rb") as f:
+        assert f.read() == export_avant
+    assert list(pathlib.Path(".").glob("*.tmp")) == []
+
+
+def test_collecte_partielle_ne_supprime_que_les_sources_executees(sources):
+    donnees, _ = sources
+    collecte_donnees.collect_all_real_data()
+    assert titres_modules() == ["dumps", "exit", "getcwd", "listdir", "loads"]
+
+    # Seule source_a est collectée : la formation « sys » disparue est supprimée, source_b est conservée
+    donnees["source_a"] = donnees["source_a"][:1]
+    donnees["source_b"] = []
+    collecte_donnees.collect_all_real_data(["source_a"])
+
+    base = base_catalogue.BaseCatalogue()
+    assert sorted(base.formations()["titre"]) == ["Python json", "Python os"]
+    assert titres_modules() == ["dumps", "getcwd", "listdir", "loads"]
+    with open(collecte_donnees.FICHIER_EXERCICES, encoding="utf-8") as f:
+        assert [c["category"] for c in json.load(f)] == ["Basics"]
+    resume = base.connexion().execute("SELECT resume FROM versions WHERE version = 2").fetchone()[0]
+    assert json.loads(resume)["formations"]["supprimes"] == 1
+
+    # Une collecte complète supprime ensuite les enregistrements disparus de source_b
+    collecte_donnees.collect_all_real_data()
+    assert sorted(base.formations()["titre"]) == ["Python os"]
+
+
+def test_premiere_collecte_en_echec_conserve_les_anciens_exports(sources):
+    _, echecs = sources
+    # Exports d'une version antérieure, sans catalogue.db : la collecte suivante est une première collecte
+    anciens = {}
+    for fichier in (collecte_donnees.FICHIER_FORMATIONS, collecte_donnees.FICHIER_MODULES, collecte_donnees.FICHIER_EXERCICES):
+        anciens[fichier] = f"ancien contenu de {fichier}\n"
+        pathlib.Path(fichier).write_text(anciens[fichier], encoding="utf-8")
+
+    echecs.add("source_b")
+    with pytest.raises(collecteurs.CollecteurEnEchec):
+        collecte_donnees.collect_all_real_data()
+
+    for fichier, contenu in anciens.items():
+        assert pathlib.Path(fichier).read_text(encoding="utf-8") == contenu
+    assert list(pathlib.Path(".").glob("*.tmp")) == []
+    assert base_catalogue.BaseCatalogue().compter() == 0
+
+    # Une fois la source rétablie, la collecte remplace les exports
+    echecs.clear()
+    collecte_donnees.collect_all_real_data()
+    assert titres_modules() == ["dumps", "exit", "getcwd", "listdir", "loads"]
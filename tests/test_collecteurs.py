@@ -0,0 +1,139 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import collecteurs
+
+
+class _Page(BaseHTTPRequestHandler):
+    """Page servie avec un ETag : 304 si le client présente l'ETag courant"""
+
+    def do_GET(self):
+        serveur = self.server
+        serveur.requetes.append(self.headers.get("If-None-Match"))
+        if self.headers.get("If-None-Match") == serveur.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        corps = serveur.corps.encode("utf-8")
+        self.send_response(200)
+        self.send_header("ETag", serveur.etag)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(corps)))
+        self.end_headers()
+        self.wfile.write(corps)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def serveur():
+    serveur = ThreadingHTTPServer(("127.0.0.1", 0), _Page)
+    serveur.etag, serveur.corps, serveur.requetes = '"v1"', "<p>version 1</p>", []
+    threading.Thread(target=serveur.serve_forever, daemon=True).start()
+    yield serveur
+    serveur.shutdown()
+    serveur.server_close()
+
+
+@pytest.fixture
+def client(tmp_path):
+    client = collecteurs.ClientHTTP(str(tmp_path / "cache_http"), limiteur=collecteurs.LimiteurDebit(1000))
+    yield client
+    client.fermer()
+
+
+@pytest.fixture
+def registre(monkeypatch):
+    monkeypatch.setattr(collecteurs, "COLLECTEURS", {})
+    return collecteurs
+
+
+def test_page_inchangee_relue_depuis_le_cache(serveur, client):
+    url = f"http://127.0.0.1:{serveur.server_port}/fonctions.html"
+
+    premiere = client.obtenir(url)
+    seconde = client.obtenir(url)
+    serveur.etag, serveur.corps = '"v2"', "<p>version 2</p>"
+    apres_modification = client.obtenir(url)
+
+    assert serveur.requetes == [None, '"v1"', '"v1"']
+    assert (premiere.depuis_cache, seconde.depuis_cache, apres_modification.depuis_cache) == (False, True, False)
+    assert seconde.texte == "<p>version 1</p>"
+    assert apres_modification.texte == "<p>version 2</p>"
+    assert client.statistiques["non_modifiees"] == 1
+    assert client.statistiques["telechargees"] == 2
+
+
+def test_elements_transmis_en_flux_par_une_file_bornee(registre, client, monkeypatch):
+    monkeypatch.setattr(collecteurs, "TAILLE_FILE_COLLECTEUR", 2)
+    produits = []
+
+    def collecter(client):
+        for i in range(10):
+            produits.append(i)
+            yield i
+
+    registre.enregistrer("exercices_test", collecter, genre="exercices")
+    with collecteurs.executer_collecteurs(client=client) as resultats:
+        [(collecteur, elements)] = resultats
+        premier = next(elements)
+        # Le producteur ne prend pas plus d'avance que la taille de la file (+ l'élément en cours de dépôt)
+        assert premier == 0
+        assert len(produits) <= 1 + 2 + 1
+        assert list(elements) == list(range(1, 10))
+
+
+def test_collecteur_en_echec_signale_au_consommateur(registre, client):
+    def en_echec(client):
+        yield {"category": "partiel"}
+        raise ConnectionError("réseau coupé")
+
+    registre.enregistrer("correct", lambda client: iter([{"category": "ok"}]), genre="exercices")
+    registre.enregistrer("en_echec", en_echec, genre="exercices")
+    with collecteurs.executer_collecteurs(client=client) as resultats:
+        (_, correct), (_, echec) = resultats
+        assert list(correct) == [{"category": "ok"}]
+        assert next(echec) == {"category": "partiel"}
+        with pytest.raises(collecteurs.CollecteurEnEchec) as erreur:
+            next(echec)
+    assert erreur.value.nom == "en_echec"
+    assert isinstance(erreur.value.erreur, ConnectionError)
+
+
+def test_sortie_anticipee_arrete_les_producteurs_bloques(registre, client, monkeypatch):
+    monkeypatch.setattr(collecteurs, "TAILLE_FILE_COLLECTEUR", 1)
+    registre.enregistrer("infini", lambda client: iter(int, 1), genre="exercices")
+
+    fin = threading.Event()
+
+    def collecte_interrompue():
+        with collecteurs.executer_collecteurs(client=client) as resultats:
+            next(resultats[0][1])
+        fin.set()
+
+    threading.Thread(target=collecte_interrompue, daemon=True).start()
+    assert fin.wait(5)
+
+
+def test_files_videes_dans_n_importe_quel_ordre(registre, client, monkeypatch):
+    # Plus de collecteurs que de workers, chacun produisant plus que sa file : consommer le dernier enregistré
+    # en premier ne doit pas bloquer les workers sur les files pleines des autres
+    monkeypatch.setattr(collecteurs, "TAILLE_FILE_COLLECTEUR", 2)
+    for n in range(5):
+        registre.enregistrer(f"exercices_{n}", lambda client, n=n: ({"category": f"{n}-{i}"} for i in range(10)), genre="exercices")
+
+    recus = []
+    fin = threading.Event()
+
+    def collecte_a_rebours():
+        with collecteurs.executer_collecteurs(client=client, max_workers=2) as resultats:
+            for _, elements in reversed(resultats):
+                recus.append([c["category"] for c in elements])
+        fin.set()
+
+    threading.Thread(target=collecte_a_rebours, daemon=True).start()
+    assert fin.wait(5)
+    assert recus == [[f"{n}-{i}" for i in range(10)] for n in reversed(range(5))]
@@ -0,0 +1,23 @@
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+import contexte_prompt
+import memoire
+
+
+MESSAGES = [HumanMessage(content="Crée un quiz pandas " * 20), AIMessage(content="Voici le quiz " * 40)]
+
+
+@pytest.mark.parametrize("budget", [0, -5])
+def test_budget_nul_ou_negatif_sans_historique(budget):
+    assert contexte_prompt.tronquer_historique(MESSAGES, budget) == ""
+    memoire_bornee = memoire.MemoireBornee(max_tokens_historique=budget)
+    memoire_bornee.chat_memory.add_messages(MESSAGES)
+    assert memoire_bornee.buffer_as_str == ""
+
+
+def test_dernier_message_coupe_dans_le_budget():
+    for budget in (1, 10, 50):
+        historique = contexte_prompt.tronquer_historique(MESSAGES, budget)
+        assert historique.startswith("AI") and historique.endswith(" …")
+        assert len(historique) <= max(budget * contexte_prompt.CARACTERES_PAR_TOKEN, 4)
@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+import cube_stress
+
+
+def jeu():
+    rng = np.random.default_rng(0)
+    sommeil = rng.integers(1, 6, 300)
+    anxiete = rng.integers(0, 22, 300)
+    stress = np.clip((anxiete // 8) + (sommeil < 2), 0, 2)
+    return pd.DataFrame({"anxiety_level": anxiete, "sleep_quality": sommeil, "noise_level": rng.integers(0, 6, 300),
+                         "stress_level": stress})
+
+
+def test_cube_identique_aux_calculs_pandas():
+    df = jeu()
+    cube = cube_stress.construire_cube(df)
+
+    for facteur in ("anxiety_level", "sleep_quality", "noise_level"):
+        infos = cube["facteurs"][facteur]
+        croise = pd.crosstab(df[facteur], df["stress_level"])
+        assert infos["valeurs"] == croise.index.tolist()
+        assert infos["tableau_croise"] == croise.to_numpy().tolist()
+        assert np.allclose(infos["stress_moyen"], df.groupby(facteur)["stress_level"].mean().round(3))
+        assert np.isclose(infos["spearman"], df[facteur].rank().corr(df["stress_level"].rank()), atol=1e-4)
+        assert np.isclose(infos["pearson"], df[facteur].corr(df["stress_level"]), atol=1e-4)
+    assert cube["classement"][0] == "anxiety_level"
+    assert np.isclose(sum(cube["distribution_cible"]), 1.0, atol=1e-3)
+
+
+def test_bloc_de_contexte_limite_aux_facteurs_cites():
+    cube = cube_stress.construire_cube(jeu())
+
+    bloc = cube_stress.bloc_contexte(cube, "Does sleep quality affect stress?")
+    assert "## sleep_quality" in bloc and "## anxiety_level" not in bloc
+    # Sans facteur cité : résumé des facteurs les plus corrélés
+    assert "Factors most correlated" in cube_stress.bloc_contexte(cube, "What drives stress?")
@@ -0,0 +1,46 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import donnees_stress
+
+
+def ecrire_csv(dossier, lignes):
+    pd.DataFrame(lignes).to_csv(dossier / donnees_stress.JEUX_DE_DONNEES["niveau_stress"], index=False)
+
+
+def projete(tableau):
+    while tableau is not None:
+        if isinstance(tableau, np.memmap):
+            return True
+        tableau = getattr(tableau, "base", None)
+    return False
+
+
+def test_format_colonnaire_compact_relu_et_reconverti_si_le_csv_change(tmp_path, monkeypatch):
+    ecrire_csv(tmp_path, {"anxiety_level": [14, 15, 12], "sleep_hours": [7.5, 6.0, None],
+                          "stress_type": ["Distress", None, "Eustress"]})
+    conversions = []
+    convertir = donnees_stress.convertir
+    monkeypatch.setattr(donnees_stress, "convertir", lambda nom, dossier=None: conversions.append(nom) or convertir(nom, dossier))
+
+    df = donnees_stress.charger("niveau_stress", str(tmp_path))
+    attendu = pd.read_csv(tmp_path / donnees_stress.JEUX_DE_DONNEES["niveau_stress"])
+    assert df["anxiety_level"].dtype == np.int8 and df["sleep_hours"].dtype == np.float32
+    assert list(df["stress_type"].astype(object).where(df["stress_type"].notna(), None)) == ["Distress", None, "Eustress"]
+    assert np.allclose(df["sleep_hours"], attendu["sleep_hours"], equal_nan=True)
+    # Colonnes projetées en mémoire depuis les fichiers .npy, sans copie
+    assert projete(df["anxiety_level"].to_numpy()) and projete(df["sleep_hours"].to_numpy())
+
+    # Même contenu, date de modification changée : pas de reconversion
+    chemin = tmp_path / donnees_stress.JEUX_DE_DONNEES["niveau_stress"]
+    os.utime(chemin, ns=(0, os.stat(chemin).st_mtime_ns + 10**9))
+    donnees_stress.charger("niveau_stress", str(tmp_path))
+    assert conversions == ["niveau_stress"]
+
+    ecrire_csv(tmp_path, {"anxiety_level": [1, 2, 3, 400], "sleep_hours": [1.0, 2.0, 3.0, 4.0],
+                          "stress_type": ["a", "b", "c", "d"]})
+    df = donnees_stress.charger("niveau_stress", str(tmp_path))
+    assert conversions == ["niveau_stress"] * 2
+    assert list(df["anxiety_level"]) == [1, 2, 3, 400] and df["anxiety_level"].dtype == np.int16
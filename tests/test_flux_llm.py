@@ -0,0 +1,61 @@
+import time
+
+import pytest
+from langchain.prompts import ChatPromptTemplate
+from langchain_core.globals import set_llm_cache
+from langchain_core.messages import AIMessageChunk
+from langchain_core.outputs import ChatGenerationChunk
+
+import cache_llm
+import flux_llm
+import generation_lot
+
+
+class LLMEnFlux(generation_lot.LLMBouchon):
+    """Premier morceau après delai_secondes, puis un morceau toutes les 10 ms"""
+
+    appels: int = 0
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        self.appels += 1
+        time.sleep(self.delai_secondes)
+        for mot in ["Cours ", "pandas ", "en ", "flux"]:
+            yield ChatGenerationChunk(message=AIMessageChunk(content=mot))
+            time.sleep(0.01)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    set_llm_cache(cache_llm.CacheLangChain(cache_llm.CacheReponsesSQLite(str(tmp_path / "cache.db"))))
+    yield
+    set_llm_cache(None)
+
+
+def test_premier_token_mesure_puis_reponse_servie_depuis_le_cache(cache):
+    llm = LLMEnFlux(delai_secondes=0.05)
+    prompt = ChatPromptTemplate.from_template("Génère un cours sur {sujet}").format_prompt(sujet="pandas")
+
+    mesure = flux_llm.MesureFlux()
+    assert list(flux_llm.generer_en_flux(llm, prompt, mesure)) == ["Cours ", "pandas ", "en ", "flux"]
+    metriques = mesure.en_dict()
+    assert 0.05 <= metriques["ttft_s"] < metriques["duree_s"]
+    assert metriques["tokens_sortie"] > 0 and metriques["tokens_par_seconde"] > 0
+    assert not metriques["depuis_cache"]
+
+    # Le même prompt est servi en un seul morceau depuis le cache, sans appeler le modèle
+    mesure = flux_llm.MesureFlux()
+    assert list(flux_llm.generer_en_flux(llm, prompt, mesure)) == ["Cours pandas en flux"]
+    assert mesure.en_dict()["depuis_cache"] and llm.appels == 1
+
+
+def test_flux_interrompu_libere_l_appel_partage(cache):
+    llm = LLMEnFlux(delai_secondes=0)
+    prompt = ChatPromptTemplate.from_template("Quiz sur {sujet}").format_prompt(sujet="numpy")
+
+    flux = flux_llm.generer_en_flux(llm, prompt, flux_llm.MesureFlux())
+    next(flux)
+    flux.close()
+    assert flux_llm.coalescence.appels_llm.statistiques()["en_cours"] == 0
+    # Rien n'a été mis en cache : l'appel suivant régénère la réponse complète
+    assert "".join(flux_llm.generer_en_flux(llm, prompt, flux_llm.MesureFlux())) == "Cours pandas en flux"
+    assert llm.appels == 2
@@ -0,0 +1,33 @@
+import pandas as pd
+import pytest
+
+import format_contexte
+
+
+def test_prefixes_uniques_quel_que_soit_le_nombre_de_collisions():
+    prefixes = format_contexte._prefixes(["station", "statut", "stage", "source"])
+
+    assert prefixes == {"station": "S", "statut": "St", "stage": "Sta", "source": "So"}
+
+
+@pytest.mark.parametrize("format_tableau", ["csv", "tsv", "dictionnaire"])
+def test_relecture_sans_perte(format_tableau):
+    df = pd.DataFrame({
+        "station": ["Gare du Nord", "Gare du Nord", "Gare de Lyon", "Gare de Lyon"],
+        "statut": ["ouvert", "ouvert", "ouvert", "fermé"],
+        "stage": ["Sta9", "St1", "S1", "module\tavancé"],
+        "duree": [1.5, 2.0, None, 4.0],
+    })
+
+    assert format_contexte.verifier_sans_perte(df, format_tableau)
+
+
+def test_seules_les_colonnes_codees_sont_decodees():
+    df = pd.DataFrame({
+        "source": ["Kaggle Learn"] * 3 + ["Python Documentation"] * 3,
+        "titre": ["S1", "S2", "Pandas", "Python os", "Python sys", "Python json"],
+    })
+    texte = format_contexte.formater_tableau(df, "dictionnaire")
+
+    assert texte.splitlines()[:2] == ["S1=Kaggle Learn", "S2=Python Documentation"]
+    assert [ligne["titre"] for ligne in format_contexte.decoder_tableau(texte, "dictionnaire")][:2] == ["S1", "S2"]
@@ -0,0 +1,64 @@
+import asyncio
+import json
+import threading
+
+import base_catalogue
+import generation_lot
+import noyau_pedagogique
+
+
+class LLMCompteur(generation_lot.LLMBouchon):
+    """LLM simulé qui compte les appels simultanés et échoue sur les demandes marquées ECHEC"""
+
+    en_cours: int = 0
+    max_en_cours: int = 0
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.en_cours += 1
+        self.max_en_cours = max(self.max_en_cours, self.en_cours)
+        try:
+            if "ECHEC" in messages[-1].content:
+                raise ConnectionError("LLM indisponible")
+            return await super()._agenerate(messages, stop, run_manager, **kwargs)
+        finally:
+            self.en_cours -= 1
+
+
+def demande(texte):
+    return {"generation_type": "Quiz", "domaine": "Data Science", "niveau": "Beginner", "duree": 2,
+            "format_sortie": "Markdown", "user_input": texte}
+
+
+def test_concurrence_echecs_et_reprise(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    base = base_catalogue.BaseCatalogue(str(tmp_path / "catalogue.db"))
+    base.remplacer(*noyau_pedagogique.donnees_exemple())
+    demandes = [demande(f"Quiz pandas numéro {i}") for i in range(8)] + [demande("Quiz ECHEC")]
+    sortie = tmp_path / "sortie.jsonl"
+
+    llm = LLMCompteur(delai_secondes=0.05)
+    generateur = generation_lot.GenerateurLot(llm, base, concurrence=3)
+    threads = set()
+    preparer = generateur.preparer
+    monkeypatch.setattr(generateur, "preparer", lambda d: threads.add(threading.get_ident()) or preparer(d))
+    asyncio.run(generateur.executer(demandes, str(sortie)))
+
+    assert (generateur.reussites, generateur.echecs) == (8, 1)
+    assert 1 < llm.max_en_cours <= 3
+    # La préparation (SQLite, index) ne s'exécute pas dans le thread de la boucle d'événements
+    assert threading.get_ident() not in threads
+
+    # Une ligne tronquée par une interruption est ignorée ; seule la demande en échec est relancée
+    with open(sortie, "a", encoding="utf-8") as f:
+        f.write('{"job_id": "tronq')
+    generateur = generation_lot.GenerateurLot(generation_lot.LLMBouchon(delai_secondes=0), base, concurrence=3)
+    asyncio.run(generateur.executer(demandes + [demande("Quiz pandas numéro 0")], str(sortie)))
+
+    assert (generateur.reussites, generateur.echecs) == (1, 0)
+    lignes = []
+    for ligne in sortie.read_text(encoding="utf-8").splitlines():
+        try:
+            lignes.append(json.loads(ligne))
+        except ValueError:
+            continue
+    assert sorted(l["job_id"] for l in lignes) == sorted(generation_lot.identifiant_demande(d) for d in demandes)
@@ -0,0 +1,70 @@
+from langchain_core.messages import AIMessage, HumanMessage
+
+import historique_conversation
+
+
+def echanges(debut, fin):
+    return [m for i in range(debut, fin) for m in (HumanMessage(content=f"question {i}"), AIMessage(content=f"réponse {i}"))]
+
+
+def contenus(messages):
+    return [m.content for m in messages]
+
+
+def test_pages_precedentes_relues_a_la_demande(tmp_path):
+    stockage = historique_conversation.StockageHistorique(str(tmp_path / "historique.db"))
+    stockage.ajouter("s", echanges(0, 25))
+    historique = historique_conversation.HistoriqueSQLite("s", stockage, fenetre=10)
+    fenetre = contenus(historique.messages)
+
+    assert historique.messages_anterieurs() == 40
+    assert contenus(historique.charger_page_precedente(taille=15)) == contenus(echanges(0, 25))[25:40]
+    assert contenus(historique.charger_page_precedente(taille=30)) == contenus(echanges(0, 25))[:25]
+    assert historique.messages_anterieurs() == 0
+    assert historique.charger_page_precedente() == []
+    # La fenêtre transmise au LLM ne change pas
+    assert contenus(historique.messages) == fenetre
+    assert contenus(historique.anciens + historique.messages) == contenus(echanges(0, 25))
+
+
+def test_messages_sortis_de_la_fenetre_restent_affiches(tmp_path):
+    stockage = historique_conversation.StockageHistorique(str(tmp_path / "historique.db"))
+    stockage.ajouter("s", echanges(0, 10))
+    historique = historique_conversation.HistoriqueSQLite("s", stockage, fenetre=6)
+    historique.charger_page_precedente(taille=4)
+
+    historique.add_messages(echanges(10, 12))
+    historique.charger_page_precedente(taille=100)
+
+    assert contenus(historique.anciens + historique.messages) == contenus(echanges(0, 12))
+    assert historique.messages_anterieurs() == 0
+
+
+def test_resume_conserve_a_cote_de_l_historique(tmp_path):
+    import memoire
+
+    stockage = historique_conversation.StockageHistorique(str(tmp_path / "historique.db"))
+    premiere = memoire.MemoireResumee(chat_memory=historique_conversation.HistoriqueSQLite("s", stockage), tours_verbatim=2)
+    for i in range(5):
+        premiere.chat_memory.add_messages(echanges(i, i + 1))
+    premiere.replier(attendre=True)
+    assert premiere.messages_resumes == 6
+
+    # Nouvelle mémoire sur la même session (redémarrage) : le résumé est relu, pas recalculé
+    reprise = memoire.MemoireResumee(chat_memory=historique_conversation.HistoriqueSQLite("s", stockage), tours_verbatim=2)
+    assert (reprise.resume, reprise.messages_resumes) == (premiere.resume, 6)
+    assert "question 0" in reprise.buffer_as_str and "question 4" in reprise.buffer_as_str
+
+    reprise.clear()
+    assert stockage.lire_resume("s") == ("", 0)
+
+
+def test_retention_decale_la_position_du_resume(tmp_path):
+    stockage = historique_conversation.StockageHistorique(str(tmp_path / "historique.db"), max_messages_session=6)
+    stockage.ajouter("s", echanges(0, 2))
+    stockage.ecrire_resume("s", "résumé", 2)
+    stockage.ajouter("s", echanges(2, 5))
+    stockage.vider_tampon()
+
+    # Les 4 messages les plus anciens ont été supprimés, dont les 2 déjà résumés
+    assert stockage.lire_resume("s") == ("résumé", 0)
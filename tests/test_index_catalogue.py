@@ -0,0 +1,68 @@
+import numpy as np
+
+import index_catalogue
+
+
+TEXTES = [
+    "pandas dataframe read_csv groupby",
+    "numpy array broadcasting vectorisation",
+    "python boucles listes dictionnaires",
+    "pandas serie index selection",
+    "scikit learn regression modele",
+]
+
+
+def indexer(textes, precedent=None):
+    return index_catalogue.indexer_textes(
+        textes, [index_catalogue.DOC_MODULE] * len(textes), [(i, 0) for i in range(len(textes))], "", precedent
+    )
+
+
+def test_mise_a_jour_equivalente_a_une_reconstruction(monkeypatch):
+    precedent = indexer(TEXTES)
+    textes = TEXTES[:2] + ["python fonctions generateurs"] + TEXTES[3:4] + ["pandas merge jointures"]
+
+    tokenises = []
+    tokeniser = index_catalogue.tokeniser
+    monkeypatch.setattr(index_catalogue, "tokeniser", lambda texte: tokenises.append(texte) or tokeniser(texte))
+    mis_a_jour = indexer(textes, precedent)
+    # Seuls les documents ajoutés ou modifiés sont retokenisés
+    assert tokenises == [textes[2], textes[4]]
+
+    monkeypatch.setattr(index_catalogue, "tokeniser", tokeniser)
+    reconstruit = indexer(textes)
+    # Les termes des documents retirés (« boucles », « scikit ») ne restent pas dans le vocabulaire
+    assert sorted(mis_a_jour.vocabulaire) == sorted(reconstruit.vocabulaire)
+    for requete in ("pandas", "python generateurs", "numpy array", "scikit"):
+        attendus = reconstruit.rechercher(requete, k=5)
+        obtenus = mis_a_jour.rechercher(requete, k=5)
+        assert [doc for doc, _ in obtenus] == [doc for doc, _ in attendus]
+        assert np.allclose([score for _, score in obtenus], [score for _, score in attendus])
+
+
+def test_index_sauvegarde_relu_pour_la_mise_a_jour(tmp_path):
+    chemin = str(tmp_path / "index.npz")
+    indexer(TEXTES).sauvegarder(chemin)
+    relu = index_catalogue.IndexCatalogue.charger(chemin)
+
+    assert relu.tf is not None and list(relu.empreintes_docs) == [index_catalogue.empreinte_texte(t) for t in TEXTES]
+    assert indexer(TEXTES, relu).rechercher("pandas", k=5) == indexer(TEXTES).rechercher("pandas", k=5)
+
+
+def test_classement_par_pertinence_et_type():
+    textes = ["pandas dataframe groupby", "pandas introduction lecture fichiers csv", "numpy array", "exercice pandas groupby agregation"]
+    index = index_catalogue.indexer_textes(
+        textes, [index_catalogue.DOC_MODULE] * 3 + [index_catalogue.DOC_EXERCICE], [(i, 0) for i in range(4)]
+    )
+
+    resultats = index.rechercher("Formation pandas groupby", k=10)
+    # Les documents qui contiennent les deux termes passent devant celui qui ne contient que « pandas »
+    assert [doc for doc, _ in resultats][:2] in ([0, 3], [3, 0])
+    assert [doc for doc, _ in resultats][2] == 1 and 2 not in [doc for doc, _ in resultats]
+    assert all(a >= b for (_, a), (_, b) in zip(resultats, resultats[1:]))
+
+    assert [doc for doc, _ in index.rechercher("pandas groupby", type_doc=index_catalogue.DOC_EXERCICE)] == [3]
+    assert len(index.rechercher("pandas", k=1)) == 1
+    # Accents et mots vides sont ignorés
+    assert index.rechercher("Données de la base") == []
+    assert index.rechercher("NUMPY ârray")[0][0] == 2
@@ -0,0 +1,114 @@
+import json
+import time
+import urllib.request
+
+import pytest
+
+import instrumentation
+
+
+def test_etapes_tokens_caches_et_echantillonnage(tmp_path):
+    fichier = tmp_path / "traces.jsonl"
+    registre = instrumentation.Registre(taux_echantillonnage=1.0, fichier=str(fichier))
+
+    with registre.trace("agent_generation", generation_type="Quiz") as trace:
+        with trace.etape("contexte"):
+            time.sleep(0.01)
+        with trace.etape("contexte"):
+            time.sleep(0.01)
+        trace.ajouter_duree("appel_llm", 0.3)
+        trace.compter_tokens(prompt=120, completion=None)
+        trace.compter_tokens(completion=40)
+        trace.cache("semantique", False)
+        trace.cache("contexte", True)
+
+    with pytest.raises(RuntimeError):
+        with registre.trace("agent_generation"):
+            raise RuntimeError("LLM indisponible")
+
+    # Une étape répétée cumule ses durées
+    assert trace.durees["contexte"] >= 0.02
+    statistiques = registre.statistiques("agent_generation")
+    assert (statistiques["traces"], statistiques["traces_ecrites"]) == (2, 2)
+    assert list(statistiques["etapes"])[:2] == ["total", "appel_llm"]
+    assert statistiques["etapes"]["contexte"]["traces"] == 1
+    assert statistiques["tokens_prompt_moyen"] == 60
+    assert statistiques["caches"] == {
+        "semantique": {"hits": 0, "misses": 1, "taux_hit": 0.0},
+        "contexte": {"hits": 1, "misses": 0, "taux_hit": 1.0},
+    }
+    assert registre.statistiques("stress_chat")["traces"] == 0
+
+    lignes = [json.loads(ligne) for ligne in fichier.read_text(encoding="utf-8").splitlines()]
+    assert [ligne["statut"] for ligne in lignes] == ["ok", "erreur"]
+    assert [e["etape"] for e in lignes[0]["etapes"]] == ["contexte", "contexte", "appel_llm"]
+    assert lignes[0]["attributs"] == {"generation_type": "Quiz"}
+    assert lignes[0]["tokens"] == {"prompt": 120, "completion": 40}
+
+
+def test_traces_non_echantillonnees_agregees_sans_ecriture(tmp_path):
+    fichier = tmp_path / "traces.jsonl"
+    registre = instrumentation.Registre(taux_echantillonnage=0.0, fichier=str(fichier))
+    for _ in range(5):
+        with registre.trace("stress_chat") as trace:
+            trace.ajouter_duree("requete", 0.002)
+
+    assert registre.statistiques()["traces"] == 5
+    assert trace.etapes == []
+    assert not fichier.exists()
+
+
+def test_mesurer_flux_exclut_le_temps_du_consommateur():
+    registre = instrumentation.Registre(taux_echantillonnage=0.0, fichier=None)
+
+    def producteur():
+        for morceau in ("a", "b", "c"):
+            time.sleep(0.01)
+            yield morceau
+
+    with registre.trace("agent_generation") as trace:
+        for _ in trace.mesurer_flux("appel_llm", producteur()):
+            time.sleep(0.05)
+
+    assert 0.03 <= trace.durees["appel_llm"] < 0.1
+    assert trace.duree_totale >= 0.15
+
+
+def test_export_prometheus(monkeypatch):
+    registre = instrumentation.Registre(taux_echantillonnage=0.0, fichier=None)
+    for duree in (0.003, 0.2, 45.0):
+        with registre.trace("agent_generation") as trace:
+            trace.ajouter_duree("appel_llm", duree)
+            trace.compter_tokens(prompt=10, completion=5)
+            trace.cache("semantique", duree < 1)
+
+    texte = registre.texte_prometheus()
+    lignes = texte.splitlines()
+    etiquettes = 'flux="agent_generation",etape="appel_llm"'
+    # Histogramme cumulatif : chaque borne compte les durées inférieures ou égales
+    assert f'app_etape_duree_secondes_bucket{{{etiquettes},le="0.005"}} 1' in lignes
+    assert f'app_etape_duree_secondes_bucket{{{etiquettes},le="0.25"}} 2' in lignes
+    assert f'app_etape_duree_secondes_bucket{{{etiquettes},le="30.0"}} 2' in lignes
+    assert f'app_etape_duree_secondes_bucket{{{etiquettes},le="60.0"}} 3' in lignes
+    assert f'app_etape_duree_secondes_bucket{{{etiquettes},le="+Inf"}} 3' in lignes
+    assert f'app_etape_duree_secondes_count{{{etiquettes}}} 3' in lignes
+    assert 'app_traces_total{flux="agent_generation",statut="ok"} 3' in lignes
+    assert 'app_tokens_total{flux="agent_generation",type="prompt"} 30' in lignes
+    assert 'app_cache_requetes_total{cache="semantique",resultat="hit"} 2' in lignes
+    assert 'app_cache_requetes_total{cache="semantique",resultat="miss"} 1' in lignes
+
+    # Sans port configuré, aucun serveur n'est démarré
+    monkeypatch.delenv("INSTRUMENTATION_PORT", raising=False)
+    monkeypatch.setattr(instrumentation, "_serveur", None)
+    assert instrumentation.demarrer_serveur_prometheus(registre=registre) is None
+
+    serveur = instrumentation.demarrer_serveur_prometheus(0, registre=registre, hote="127.0.0.1")
+    try:
+        assert instrumentation.demarrer_serveur_prometheus(0, registre=registre) is serveur
+        url = f"http://127.0.0.1:{serveur.server_address[1]}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as reponse:
+            assert reponse.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            assert reponse.read().decode("utf-8") == texte
+    finally:
+        serveur.shutdown()
+        serveur.server_close()
@@ -0,0 +1,25 @@
+import os
+
+import pytest
+
+import profil_demarrage
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.parametrize("application", profil_demarrage.APPLICATIONS)
+def test_pile_llm_absente_des_imports_de_demarrage(application):
+    profil = profil_demarrage.profiler_application(os.path.join(RACINE, application), repetitions=1)
+
+    assert profil["modules_differes_importes"] == {}
+
+
+def test_import_indirect_de_la_pile_llm_detecte(tmp_path):
+    (tmp_path / "outil.py").write_text("import langchain_core.messages\n", encoding="utf-8")
+    (tmp_path / "app.py").write_text("import json\nimport outil\n\ndef plus_tard():\n    import langchain\n", encoding="utf-8")
+
+    assert profil_demarrage.imports_de_niveau_module(str(tmp_path / "app.py")) == ["json", "outil"]
+    profil = profil_demarrage.profiler_application(str(tmp_path / "app.py"), repetitions=1)
+    assert list(profil["modules_differes_importes"]) == ["outil"]
+    assert "langchain_core.messages" in profil["modules_differes_importes"]["outil"]
+    assert profil_demarrage.afficher_rapport(profil) is True
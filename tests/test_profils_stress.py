@@ -0,0 +1,41 @@
+import threading
+import time
+
+import numpy as np
+
+import profils_stress
+
+
+def test_ivf_construit_une_seule_fois_par_des_recherches_concurrentes(monkeypatch):
+    rng = np.random.default_rng(0)
+    index = profils_stress.IndexProfils([f"f{j}" for j in range(4)], rng.integers(0, 10, (500, 4)), np.zeros(500))
+    constructions = []
+    kmeans = profils_stress.kmeans
+
+    def kmeans_lent(*args, **kwargs):
+        constructions.append(threading.get_ident())
+        time.sleep(0.1)
+        return kmeans(*args, **kwargs)
+
+    monkeypatch.setattr(profils_stress, "kmeans", kmeans_lent)
+    depart = threading.Barrier(8)
+    resultats, erreurs = [], []
+
+    def rechercher():
+        depart.wait()
+        try:
+            resultats.append(index.rechercher(index.matrice[:3], k=5, approximatif=True, nprobe=1000)[0])
+        except Exception as e:
+            erreurs.append(e)
+
+    threads = [threading.Thread(target=rechercher) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert erreurs == [] and len(constructions) == 1
+    # Toutes les cellules sondées : même résultat que la recherche exacte
+    exacts = index.rechercher(index.matrice[:3], k=5, approximatif=False)[0]
+    for indices in resultats:
+        assert (np.sort(indices, axis=1) == np.sort(exacts, axis=1)).all()
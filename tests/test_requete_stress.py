@@ -0,0 +1,98 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import requete_stress
+from requete_stress import PlanInvalide
+
+
+@pytest.fixture
+def jeux():
+    df = pd.DataFrame({
+        "stress_level": np.array([0, 1, 2, 2, 1, 2], dtype=np.int8),
+        "bullying": np.array([1, 4, 5, 4, 2, 5], dtype=np.int8),
+        "sleep_hours": np.array([7.5, 6.0, 4.5, 5.0, np.nan, 4.0], dtype=np.float32),
+        "stress_type": pd.Categorical(["No Stress", "Eustress", "Distress", "Distress", "Eustress", "Distress"]),
+        "vide": np.full(6, np.nan, dtype=np.float32),
+    })
+    return {"niveau_stress": df}
+
+
+def plan(**cles):
+    return {"dataset": "niveau_stress", **cles}
+
+
+def test_plan_du_llm_valide_et_execute_localement(jeux):
+    prompts = []
+
+    def appeler_llm(prompt):
+        prompts.append(prompt)
+        return "```json\n" + json.dumps(plan(
+            filters=[{"column": "bullying", "op": ">=", "value": 4}],
+            group_by=["stress_level"],
+            aggregates=[{"func": "count"}, {"func": "mean", "column": "sleep_hours"}],
+            normalize=True,
+        )) + "\n```"
+
+    contexte = requete_stress.repondre("fraction of bullied students per stress level?", appeler_llm, jeux)
+
+    assert "Matching rows: 4 of 6" in contexte
+    assert contexte.splitlines()[2:] == [
+        "stress_level,count,mean_sleep_hours,fraction",
+        "1,1,6,0.25",
+        "2,3,4.5,0.75",
+    ]
+    assert "'stress_type': text, values ['Distress', 'Eustress', 'No Stress']" in prompts[0]
+
+
+def test_question_sans_calcul(jeux):
+    assert requete_stress.repondre("what is stress?", lambda prompt: '{"dataset": null}', jeux) is None
+
+
+@pytest.mark.parametrize("plan_refuse", [
+    plan(filters=[{"column": "bullying", "op": "==", "value": "high"}]),
+    plan(filters=[{"column": "stress_type", "op": "==", "value": 2}]),
+    plan(filters=[{"column": "stress_type", "op": ">", "value": "Distress"}]),
+    plan(filters=[{"column": "bullying", "op": "in", "value": [4, "5"]}]),
+    plan(aggregates=[{"func": "mean", "column": "stress_type"}]),
+    plan(filters=[{"column": "inconnue", "op": "==", "value": 1}]),
+    plan(filters=[{"column": "bullying", "op": "like", "value": 1}]),
+    plan(aggregates=[{"func": "count"}, {"func": "count"}]),
+    plan(aggregates=[{"func": "mean", "column": "bullying"}, {"func": "mean", "column": "bullying"}]),
+])
+def test_plans_incompatibles_avec_les_types_refuses(jeux, plan_refuse):
+    with pytest.raises(PlanInvalide):
+        requete_stress.valider_plan(plan_refuse, jeux)
+
+
+def test_valeurs_texte_acceptees_sur_colonne_categorielle(jeux):
+    plan_valide = requete_stress.valider_plan(
+        plan(filters=[{"column": "stress_type", "op": "in", "value": ["Distress"]}],
+             aggregates=[{"func": "nunique", "column": "stress_type"}]),
+        jeux
+    )
+    resultat, nb_filtre, _ = requete_stress.executer_plan(plan_valide, jeux)
+    assert nb_filtre == 3
+    assert resultat.iloc[0, 0] == 1
+
+
+def test_schema_avec_les_types_reels(jeux):
+    schema = requete_stress.decrire_schemas(jeux)
+
+    assert "'stress_level': integer 0..2" in schema
+    assert "'sleep_hours': number 4..7.5" in schema
+    assert "'vide': number, all values missing" in schema
+
+
+@pytest.mark.parametrize("question, calcul", [
+    ("fraction of bullied students per stress level?", True),
+    ("Combien d'élèves ont un bullying >= 4 ?", True),
+    ("moyenne des heures de sommeil", True),
+    ("What is the average sleep of distressed students", True),
+    ("what is stress?", False),
+    ("Explique-moi le stress chronique", False),
+])
+def test_filtre_des_questions_chiffrees(question, calcul):
+    assert requete_stress.demande_calcul(question) is calcul
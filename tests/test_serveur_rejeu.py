@@ -0,0 +1,92 @@
+import json
+import time
+
+import pytest
+
+import clients_llm
+import serveur_rejeu
+
+
+@pytest.fixture
+def cassette(tmp_path):
+    """Une réponse enregistrée pour le prompt « Cours pandas », puis une ligne tronquée"""
+    chemin = tmp_path / "cassette.jsonl"
+    reponse = "# Cours pandas\n\n" + "Les DataFrame en pratique. " * 10
+    with open(chemin, "w", encoding="utf-8") as f:
+        f.write(json.dumps({
+            "cle": serveur_rejeu.cle_prompt(serveur_rejeu.MODELE_PAR_DEFAUT, "Cours pandas"),
+            "modele": serveur_rejeu.MODELE_PAR_DEFAUT,
+            "reponse": reponse,
+            "ttft_s": 0.2,
+            "duree_s": 0.4,
+            "tokens_sortie": 77,
+        }, ensure_ascii=False) + "\n")
+        f.write('{"cle": "tronq')
+    return str(chemin), reponse
+
+
+@pytest.fixture
+def serveur(cassette):
+    serveur = serveur_rejeu.ServeurRejeu(cassette[0], facteur_latence=0, graine=1)
+    serveur.demarrer()
+    yield serveur
+    serveur.arreter()
+
+
+def test_morceaux_et_cassette_synthetique(tmp_path):
+    assert serveur_rejeu.morceaux("abcdefg", 3) == ["abc", "def", "g"]
+    assert serveur_rejeu.morceaux("") == [""]
+
+    chemin = serveur_rejeu.cassette_synthetique(str(tmp_path / "synthetique.jsonl"), nombre=5)
+    enregistrements = serveur_rejeu.lire_cassette(chemin)
+    assert len(enregistrements) == 5
+    assert all(0 < e["ttft_s"] < e["duree_s"] and e["tokens_sortie"] > 0 for e in enregistrements)
+
+
+def test_cassette_absente_refusee(tmp_path):
+    with pytest.raises(ValueError):
+        serveur_rejeu.ServeurRejeu(str(tmp_path / "absente.jsonl"))
+
+
+def test_prompt_enregistre_rejoue_en_flux(serveur, cassette):
+    llm = serveur_rejeu.LLMRejeu(url=serveur.url)
+    morceaux = list(llm.stream("Cours pandas"))
+
+    assert "".join(m.content for m in morceaux) == cassette[1]
+    assert len(morceaux) == len(serveur_rejeu.morceaux(cassette[1])) + 1
+    assert morceaux[-1].usage_metadata["output_tokens"] == 77
+    assert llm.invoke("Cours pandas").content == cassette[1]
+    assert serveur.statistiques()["rejouees"] == 2
+
+
+def test_prompt_inconnu_recoit_une_reponse_de_la_cassette(serveur, cassette):
+    assert serveur_rejeu.LLMRejeu(url=serveur.url).invoke("Quiz SQL").content == cassette[1]
+
+    statistiques = serveur.statistiques()
+    assert (statistiques["requetes"], statistiques["substituees"], statistiques["en_cours"]) == (1, 1, 0)
+
+
+def test_latence_enregistree_respectee(cassette):
+    serveur = serveur_rejeu.ServeurRejeu(cassette[0], facteur_latence=1.0)
+    serveur.demarrer()
+    try:
+        llm = serveur_rejeu.LLMRejeu(url=serveur.url)
+        debut = time.perf_counter()
+        flux = llm.stream("Cours pandas")
+        next(flux)
+        ttft = time.perf_counter() - debut
+        list(flux)
+        duree = time.perf_counter() - debut
+    finally:
+        serveur.arreter()
+
+    assert 0.2 <= ttft < 0.4
+    assert 0.4 <= duree < 1.0
+
+
+def test_clients_llm_utilise_le_serveur_de_rejeu(serveur, monkeypatch):
+    monkeypatch.setenv("LLM_REJEU_URL", serveur.url)
+    llm = clients_llm.obtenir_llm("cle-de-test-rejeu", temperature=0.3)
+
+    assert isinstance(llm, serveur_rejeu.LLMRejeu)
+    assert llm.url == serveur.url and llm.temperature == 0.3
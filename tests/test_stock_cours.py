@@ -0,0 +1,32 @@
+import stock_cours
+
+
+def cours(demande, contenu, **champs):
+    return {"timestamp": "2026-01-01 10:00", "type": "Quiz", "domaine": "Data Science", "niveau": "Beginner",
+            "duree": 2, "demande": demande, "contenu": contenu, "sources_utilisees": ["Kaggle Learn"], **champs}
+
+
+def test_entrees_legeres_contenu_relu_a_la_demande(tmp_path):
+    stock = stock_cours.StockCours(str(tmp_path / "cours.db"))
+    contenu = "# Quiz pandas\n" + "Question sur groupby. " * 200
+    entree = stock.ajouter(cours("Quiz pandas", contenu), session="s1")
+
+    assert "contenu" not in entree and entree["apercu"] == contenu[:stock_cours.TAILLE_APERCU] + "..."
+    assert entree["sources_utilisees"] == ["Kaggle Learn"]
+    assert stock.contenu(entree["id"]) == contenu
+    assert stock.course_complet(entree["id"]) == cours("Quiz pandas", contenu)
+    assert stock.statistiques()["taux_compression"] < 0.2
+
+
+def test_recherche_plein_texte_et_filtres_toutes_sessions(tmp_path):
+    stock = stock_cours.StockCours(str(tmp_path / "cours.db"))
+    stock.ajouter(cours("Quiz pandas", "groupby et merge"), session="s1")
+    stock.ajouter(cours("Cours numpy", "broadcasting", type="Cours"), session="s2")
+    stock.ajouter(cours("Quiz numpy", "tableaux et broadcasting"), session="s2")
+
+    assert [e["demande"] for e in stock.rechercher("broadcasting")] == ["Quiz numpy", "Cours numpy"]
+    assert [e["demande"] for e in stock.rechercher("broadcasting", type_contenu="Cours")] == ["Cours numpy"]
+    assert [e["demande"] for e in stock.rechercher(session="s1")] == ["Quiz pandas"]
+    # La saisie n'est pas interprétée comme de la syntaxe FTS5
+    assert stock.rechercher('merge" OR "numpy') == []
+    assert stock.valeurs("type") == ["Cours", "Quiz"] and stock.compter("s2") == 2